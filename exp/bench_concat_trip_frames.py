@@ -0,0 +1,67 @@
+# Package imports
+import numpy as np
+import pandas as pd
+import time
+
+# allow import of own scripts
+import sys, os
+module_path = os.path.abspath(os.path.join('..'))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# import own functions
+from src.load_taxi_data import FEATURES_COMMON_FHV, FLEETS
+
+# variables
+ROWS_PER_FILE = 20000
+N_FILES = [4, 8, 16, 32, 64, 128]
+
+
+# synthetic standardized trip data of one file (schema of load_taxi_data())
+def synthetic_trip_frame(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    pickup = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 31 * 86400, n_rows), unit='s')
+    return pd.DataFrame({'pickup_datetime': pickup,
+                         'dropoff_datetime': pickup + pd.to_timedelta(rng.integers(60, 3600, n_rows), unit='s'),
+                         'PULocationID': pd.array(rng.integers(1, 266, n_rows), dtype='Int16'),
+                         'DOLocationID': pd.array(rng.integers(1, 266, n_rows), dtype='Int16'),
+                         'fleet': pd.Categorical(rng.choice(FLEETS, n_rows), categories=FLEETS)})
+
+
+# previous implementation: grow the result inside the fleet x year x month loop
+def concat_accumulated(frames):
+    df_trips = pd.DataFrame(columns=FEATURES_COMMON_FHV)
+    for df in frames:
+        df_trips = pd.concat([df_trips, df], axis=0)
+    return df_trips
+
+
+# current implementation: collect all files and concatenate once
+def concat_batched(frames):
+    return pd.concat(frames, axis=0, ignore_index=True)
+
+
+def main():
+    frames = [synthetic_trip_frame(ROWS_PER_FILE, seed) for seed in range(max(N_FILES))]
+
+    print('{:>8} {:>16} {:>16} {:>20} {:>20}'.format('files', 'accumulated (s)', 'batched (s)', 'accumulated/file (ms)', 'batched/file (ms)'))
+    for n_files in N_FILES:
+        start = time.perf_counter()
+        concat_accumulated(frames[:n_files])
+        t_accumulated = time.perf_counter() - start
+
+        start = time.perf_counter()
+        concat_batched(frames[:n_files])
+        t_batched = time.perf_counter() - start
+
+        # A constant time per file means linear cost in the number of files.
+        print('{:>8} {:>16.3f} {:>16.3f} {:>20.2f} {:>20.2f}'.format(n_files, t_accumulated, t_batched,
+                                                                   1000 * t_accumulated / n_files, 1000 * t_batched / n_files))
+
+    # The accumulated frame also loses the schema (every column becomes object).
+    print(concat_accumulated(frames[:2]).dtypes)
+    print(concat_batched(frames[:2]).dtypes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Package imports
+import numpy as np
+import pandas as pd
+import time
+
+# allow import of own scripts
+import sys, os
+module_path = os.path.abspath(os.path.join('..'))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# import own functions
+from src.keep_correct_year import correct_year_mask
+from src.keep_correct_month import correct_month_mask
+
+# variables
+N_ROWS = 7000000  # about one month of yellow taxi trips
+YEAR = 2019
+MONTH = '01'
+
+
+# synthetic month of trips with string timestamps (layout of the TLC csv files), including trips across month and year boundaries
+def synthetic_month_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    pickup = np.datetime64('2019-01-01') + rng.integers(-6 * 3600, 31 * 86400 + 6 * 3600, n_rows).astype('timedelta64[s]')
+    dropoff = pickup + rng.integers(60, 3 * 3600, n_rows).astype('timedelta64[s]')
+    # read_csv() returns python strings (object columns)
+    return pd.DataFrame({'pickup_datetime': pd.Series(pickup).dt.strftime('%Y-%m-%d %H:%M:%S').astype(object),
+                         'dropoff_datetime': pd.Series(dropoff).dt.strftime('%Y-%m-%d %H:%M:%S').astype(object)})
+
+
+# previous implementation: substring search on the strings
+def correct_year_mask_substring(df_taxi_data, year):
+    year = str(year)
+    return (df_taxi_data['pickup_datetime'].str.contains(year) | df_taxi_data['dropoff_datetime'].str.contains(year)).to_numpy()
+
+
+def correct_month_mask_substring(df_taxi_data, month):
+    month = "-" + str(month) + "-"
+    return (df_taxi_data['pickup_datetime'].str.contains(month) & df_taxi_data['dropoff_datetime'].str.contains(month)).to_numpy()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main(n_rows=N_ROWS):
+    df_strings = synthetic_month_frame(n_rows)
+    df_datetimes = df_strings.apply(pd.to_datetime, format='%Y-%m-%d %H:%M:%S')
+
+    print('{:>8} {:>16} {:>16} {:>16} {:>10}'.format('filter', 'substring (s)', 'bytes (s)', 'datetime64 (s)', 'equal'))
+    # The substring filters combined the year with "or" => compared with by='either' (the new default is 'both')
+    for name, substring, mask, value, by in [('year', correct_year_mask_substring, correct_year_mask, YEAR, 'either'),
+                                             ('month', correct_month_mask_substring, correct_month_mask, MONTH, 'both')]:
+        mask_substring, t_substring = timed(substring, df_strings, value)
+        mask_bytes, t_bytes = timed(mask, df_strings, value, by)
+        mask_datetime, t_datetime = timed(mask, df_datetimes, value, by)
+        equal = np.array_equal(mask_substring, mask_bytes) and np.array_equal(mask_bytes, mask_datetime)
+        print('{:>8} {:>16.3f} {:>16.3f} {:>16.3f} {:>10}'.format(name, t_substring, t_bytes, t_datetime, str(equal)))
+
+    # Boundary semantics of the new filters on trips across new year's eve
+    print('Trips that start in 2018 and end in 2019:', np.count_nonzero(correct_year_mask(df_datetimes, YEAR, 'dropoff') & ~correct_year_mask(df_datetimes, YEAR, 'pickup')))
+    for by in ['pickup', 'dropoff', 'both', 'either']:
+        print('Rows kept for {} (by={!r}): {:.4f}%'.format(YEAR, by, 100 * np.mean(correct_year_mask(df_datetimes, YEAR, by))))
+
+
+if __name__ == "__main__":
+    main()
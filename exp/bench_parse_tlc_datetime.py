@@ -0,0 +1,58 @@
+# Package imports
+import numpy as np
+import pandas as pd
+import time
+
+# allow import of own scripts
+import sys, os
+module_path = os.path.abspath(os.path.join('..'))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# import own functions
+from src.parse_tlc_datetime import parse_tlc_datetime, DATETIME_FORMAT
+
+# variables
+N_ROWS = 7000000  # about one month of yellow taxi trips
+REPEATS = 3
+
+
+# synthetic month of pick-up timestamps as strings (layout of the TLC csv files) with a few malformed and missing values
+def synthetic_timestamps(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    pickup = np.datetime64('2019-01-01') + rng.integers(0, 31 * 86400, n_rows).astype('timedelta64[s]')
+    timestamps = pd.Series(pickup).dt.strftime(DATETIME_FORMAT).astype(object)
+    timestamps[rng.integers(0, n_rows, 100)] = None
+    timestamps[rng.integers(0, n_rows, 100)] = '2019-02-30 00:00:00'
+    timestamps[rng.integers(0, n_rows, 100)] = '2019-1-5 7:00:00'
+    return timestamps
+
+
+def best_time(function, *args):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main(n_rows=N_ROWS):
+    timestamps = synthetic_timestamps(n_rows)
+
+    # previous implementation
+    parsed_pandas, t_pandas = best_time(lambda values: pd.to_datetime(values, format=DATETIME_FORMAT, errors='coerce'), timestamps)
+    # fixed-width parser
+    parsed_fixed, t_fixed = best_time(parse_tlc_datetime, timestamps)
+    # columns that were parsed at ingest (load_taxi_data()) are not parsed again
+    _, t_parsed = best_time(parse_tlc_datetime, parsed_fixed)
+
+    print('{:>24} {:>10}'.format('parser', 'time (s)'))
+    print('{:>24} {:>10.3f}'.format('pd.to_datetime', t_pandas))
+    print('{:>24} {:>10.3f}'.format('parse_tlc_datetime', t_fixed))
+    print('{:>24} {:>10.3f}'.format('already datetime64', t_parsed))
+    print('Identical results:', parsed_fixed.equals(parsed_pandas.astype('datetime64[ns]')))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# Package imports
+import numpy as np
+import pandas as pd
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+# allow import of own scripts
+import sys, os
+module_path = os.path.abspath(os.path.join('..'))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# import own functions
+from src.synthetic_trips import synthetic_trips, write_synthetic_tlc_files
+from src.load_taxi_data import load_taxi_data
+from src.preprocess_data import preprocess_data
+from src.remove_routes import remove_routes
+from src.keep_correct_year import keep_correct_year
+from src.keep_correct_month import keep_correct_month
+from src.temporal_preprocessing import temporal_preprocessing
+from src.compact_trip_data import compact_trip_data
+from src.daily_fleet_counts import daily_fleet_counts
+from src.od_matrix import od_matrix
+from src.temporal_profile import temporal_profile_sketch
+from src.quantile_sketch import quantile_sketch, iqr_outlier_mask
+
+# variables
+N_ROWS = [10**5, 10**6, 10**7]  # add 10**8 for the scale of a year of yellow taxi trips (needs about 32 GB of memory)
+CSV_MAX_ROWS = 10**6            # larger csv files are not written, parsing costs the same per row
+FLEETS = ['yellow', 'green']    # fleets with fare columns => all columns of load_taxi_data()
+YEAR = 2019
+MONTH = 1
+REPEATS = 3
+# Raw file layouts that load_taxi_data() handles: (fleet, year) => zones, coordinates or only the pick-up date
+CSV_LAYOUTS = [('yellow', 2019), ('yellow', 2015), ('green', 2019), ('fhv', 2019), ('fhv', 2015), ('fhvhv', 2019)]
+
+BENCH_PATH = '../dat/bench/'
+BASELINE_PATH = None  # e.g. BENCH_PATH + 'pipeline-1a2b3c4.json' => print the change of every measurement
+
+
+def measure(function, *args):
+    '''
+    Best wall time of REPEATS runs and peak of the memory allocated by python and numpy during one run (tracemalloc).
+    The output of the functions (percentage of removed rows) is suppressed.
+    '''
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            result = function(*args)
+            times.append(time.perf_counter() - start)
+        # Separate run => tracing does not slow down the timed runs
+        del result
+        tracemalloc.start()
+        result = function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, min(times), peak
+
+
+def record(results, name, n_rows, function, *args):
+    result, seconds, peak = measure(function, *args)
+    rows_out = len(result) if isinstance(result, pd.DataFrame) else None
+    results.append({'name': name, 'n_rows': n_rows, 'seconds': seconds, 'peak_bytes': peak, 'rows_out': rows_out})
+    print('{:>34} {:>12,} {:>10.3f} {:>12.1f} {:>12}'.format(name, n_rows, seconds, peak / 2**20, '' if rows_out is None else '{:,}'.format(rows_out)))
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def bench_cleaning_and_aggregations(results, n_rows):
+    df_taxi = synthetic_trips(FLEETS, YEAR, MONTH, n_rows)
+
+    # cleaning steps of clean_trip_data(), every step on the output of the previous one
+    df_taxi = record(results, 'preprocess_data', n_rows, preprocess_data, df_taxi)
+    df_taxi = record(results, 'remove_routes', n_rows, remove_routes, df_taxi)
+    df_taxi = record(results, 'keep_correct_year', n_rows, keep_correct_year, df_taxi, YEAR)
+    df_taxi = record(results, 'keep_correct_month', n_rows, keep_correct_month, df_taxi, MONTH)
+    df_temporal = record(results, 'temporal_preprocessing', n_rows, temporal_preprocessing, df_taxi)
+    record(results, 'temporal_preprocessing[2 columns]', n_rows, temporal_preprocessing, df_taxi, ['trip_duration_minutes', 'pickup_hour'])
+
+    # aggregations of the scripts
+    record(results, 'daily_fleet_counts', n_rows, daily_fleet_counts, df_taxi, YEAR, MONTH)                      # fig_taxi_rides_over_time
+    record(results, 'od_matrix', n_rows, od_matrix, df_temporal)                                                # fig_pickups_per_zone, fig_average_travel_time_from_JFK
+    record(results, 'temporal_profile_sketch', n_rows, temporal_profile_sketch, df_temporal, 'trip_duration_minutes')  # fig_travel_time_from_JFK_to_LGA
+    durations = df_temporal['trip_duration_minutes']
+    record(results, 'iqr_outlier_mask', n_rows, lambda values: iqr_outlier_mask(quantile_sketch(values), values), durations)  # fig_travel_time_from_JFK_to_LGA
+    record(results, 'compact_trip_data', n_rows, compact_trip_data, df_temporal)                                # fig_feature_distributions, fig_correlations_...
+
+
+def bench_load_taxi_data(results, n_rows):
+    with tempfile.TemporaryDirectory(prefix='tlc_bench_') as directory:
+        for fleet, year in CSV_LAYOUTS:
+            url_prefix = write_synthetic_tlc_files(directory, [fleet], [year], [MONTH], n_rows)
+            record(results, 'load_taxi_data[{} {}]'.format(fleet, year), n_rows, lambda: load_taxi_data([fleet], [year], [MONTH], url_prefix=url_prefix))
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        baseline = {(result['name'], result['n_rows']): result for result in json.load(file)['results']}
+    print('Change compared to {}:'.format(baseline_path))
+    print('{:>34} {:>12} {:>10} {:>12}'.format('', 'rows', 'time', 'peak memory'))
+    for result in results:
+        old = baseline.get((result['name'], result['n_rows']))
+        if old is not None:
+            print('{:>34} {:>12,} {:>+9.0f}% {:>+11.0f}%'.format(result['name'], result['n_rows'], 100 * (result['seconds'] / old['seconds'] - 1),
+                                                               100 * (result['peak_bytes'] / max(old['peak_bytes'], 1) - 1)))
+
+
+def main(n_rows=N_ROWS, baseline_path=BASELINE_PATH):
+    results = []
+    print('{:>34} {:>12} {:>10} {:>12} {:>12}'.format('function', 'rows', 'time (s)', 'peak (MiB)', 'rows out'))
+    for n in n_rows:
+        bench_cleaning_and_aggregations(results, n)
+        if n <= CSV_MAX_ROWS:
+            bench_load_taxi_data(results, n)
+
+    # Before writing => the baseline may be the output file of an earlier run of the same commit
+    if baseline_path is not None:
+        compare(results, baseline_path)
+
+    # machine-readable results => compare them between versions of the code
+    commit = git_commit()
+    report = {'commit': commit,
+              'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'python': platform.python_version(),
+              'numpy': np.__version__,
+              'pandas': pd.__version__,
+              'repeats': REPEATS,
+              'results': results}
+    os.makedirs(BENCH_PATH, exist_ok=True)
+    file_path = BENCH_PATH + 'pipeline-{}.json'.format(commit)
+    with open(file_path, 'w') as file:
+        json.dump(report, file, indent=1)
+    print('Results were written to', file_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Package imports
+import numpy as np
+from sklearn import linear_model, preprocessing
+from sklearn.model_selection import KFold, cross_val_score
+from sklearn.pipeline import Pipeline
+
+# allow import of own scripts
+import sys, os
+module_path = os.path.abspath(os.path.join('..'))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# import own functions
+from src.ridge_path import ridge_path_degrees, ALPHAS
+from src.ridge_regression_bf import ridge_regression_bf
+
+# variables
+N_ROWS = 6000
+N_TEST = 1000
+DEGREES = [1, 2, 3]
+# Number of folds => N_ROWS - N_TEST is divisible by it, so the mean of the fold errors of cross_val_score() is the
+# mean over all observations, as in ridge_path()
+K = 5
+TOLERANCE = 1e-6
+
+
+# trip features in the ranges of the repo (unscaled): day of month, weekday, hour, minute => trip duration
+def synthetic_features(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.integers(1, 32, n_rows), rng.integers(0, 7, n_rows),
+                         rng.integers(0, 24, n_rows), rng.integers(0, 60, n_rows)]).astype(float)
+    y = 20 + 0.1 * X[:, 2] + 3 * np.sin(X[:, 2] / 4) + 0.02 * X[:, 3] + rng.normal(0, 3, n_rows)
+    return X, y
+
+
+# Leave-one-out mean squared error of every alpha from sklearn's RidgeCV (efficient LOO of the same model)
+def sklearn_loo_mse(X_train, y_train, deg):
+    P_train = preprocessing.PolynomialFeatures(degree=deg).fit_transform(X_train)
+    model = linear_model.RidgeCV(alphas=ALPHAS, store_cv_results=True).fit(P_train, y_train)
+    return model.cv_results_.mean(axis=0)
+
+
+# k-fold mean squared error of every alpha from sklearn's cross_val_score with KFold (consecutive folds)
+def sklearn_kfold_mse(X_train, y_train, deg):
+    mse = []
+    for alpha in ALPHAS:
+        model = Pipeline([('poly', preprocessing.PolynomialFeatures(degree=deg)), ('linear', linear_model.Ridge(alpha))])
+        mse.append(-cross_val_score(model, X_train, y_train, cv=KFold(K), scoring='neg_mean_squared_error').mean())
+    return np.array(mse)
+
+
+def main():
+    X, y = synthetic_features(N_ROWS)
+    X_test, X_train, y_train = X[:N_TEST], X[N_TEST:], y[N_TEST:]
+    paths_loo = ridge_path_degrees(X_test, X_train, y_train, DEGREES, ALPHAS, cv='loo')
+    paths_kfold = ridge_path_degrees(X_test, X_train, y_train, DEGREES, ALPHAS, cv=K)
+
+    print('{:>4} {:>22} {:>22} {:>22} {:>22}'.format('deg', 'max rel. diff weights', 'max |y_pred - ref|',
+                                                     'max rel. diff LOO', 'max rel. diff k-fold'))
+    passed = True
+    for deg in DEGREES:
+        # Weights and predictions of every alpha against ridge_regression_bf() (offset column of sklearn has weight 0)
+        error_weights, error_pred = 0, 0
+        for i, alpha in enumerate(ALPHAS):
+            weights_ref, y_ref = ridge_regression_bf(X_test, X_train, y_train, deg, alpha)
+            weights = paths_loo[deg]['weights'][i]
+            error_weights = max(error_weights, np.abs(weights - weights_ref).max() / np.abs(weights_ref).max())
+            error_pred = max(error_pred, np.abs(paths_loo[deg]['y_pred'][i] - y_ref).max())
+        loo_ref, kfold_ref = sklearn_loo_mse(X_train, y_train, deg), sklearn_kfold_mse(X_train, y_train, deg)
+        error_loo = np.abs(paths_loo[deg]['cv_mse'] - loo_ref).max() / loo_ref.max()
+        error_kfold = np.abs(paths_kfold[deg]['cv_mse'] - kfold_ref).max() / kfold_ref.max()
+        passed &= max(error_weights, error_pred, error_loo, error_kfold) < TOLERANCE
+        passed &= paths_loo[deg]['best_alpha'] == ALPHAS[np.argmin(loo_ref)]
+        passed &= paths_kfold[deg]['best_alpha'] == ALPHAS[np.argmin(kfold_ref)]
+        print('{:>4} {:>22.3e} {:>22.3e} {:>22.3e} {:>22.3e}'.format(deg, error_weights, error_pred, error_loo, error_kfold))
+    print('Same as sklearn:', passed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Package imports
+import numpy as np
+import pandas as pd
+
+# allow import of own scripts
+import sys, os
+module_path = os.path.abspath(os.path.join('..'))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# import own functions
+from src.route_models import fit_route_models, predict_route_models
+from src.streaming_regression import streaming_regression
+from src.sklearn_regression import sklearn_regression
+from src.sklearn_regression_bf import sklearn_regression_bf
+from src.ridge_regression_bf import ridge_regression_bf
+
+# variables
+N_ROUTES = 40
+FEATURES = ['pickup_day_of_month', 'pickup_hour', 'pickup_minute']
+DEG = 3
+ALPHA = 1
+TOLERANCE = 1e-6
+
+
+# trips of routes with very different numbers of trips (down to a few more than the weights of deg=3), features in
+# the ranges of the repo (unscaled). On the first route all trips start on the same day => column without variance.
+def synthetic_trips(seed=0):
+    rng = np.random.default_rng(seed)
+    n_trips = np.geomspace(22, 5000, N_ROUTES).astype(int)
+    frames = []
+    for i, n in enumerate(n_trips):
+        hour = rng.integers(0, 24, n)
+        minute = rng.integers(0, 60, n)
+        day = np.full(n, 15) if i == 0 else rng.integers(1, 32, n)
+        duration = 10 + i + 0.2 * hour + 4 * np.sin(hour / 3) + 0.03 * minute + 0.05 * day + rng.normal(0, 3, n)
+        frames.append(pd.DataFrame({'PULocationID': 1 + 6 * i, 'DOLocationID': 265 - 3 * i, 'pickup_day_of_month': day,
+                                    'pickup_hour': hour, 'pickup_minute': minute, 'trip_duration_minutes': duration}))
+    return pd.concat(frames, ignore_index=True)
+
+
+# largest difference of the predictions of the route models and of a model fitted to the trips of every route alone
+def max_difference(df_trips, y_pred, fit):
+    difference = 0
+    for _, df_route in df_trips.groupby(['PULocationID', 'DOLocationID']):
+        X = df_route[FEATURES].to_numpy(dtype=float)
+        y_ref = fit(X, X, df_route['trip_duration_minutes'].to_numpy())[1]
+        difference = max(difference, np.abs(y_pred[df_route.index] - y_ref).max())
+    return difference
+
+
+def main():
+    df_trips = synthetic_trips()
+    checks = [('sklearn_regression', None, 0, sklearn_regression),
+              ('sklearn_regression_bf', DEG, 0, lambda X_test, X, y: sklearn_regression_bf(X_test, X, y, DEG)),
+              ('streaming_regression', DEG, 0, lambda X_test, X, y: streaming_regression(X_test, [(X, y)], DEG)),
+              ('ridge_regression_bf', DEG, ALPHA, lambda X_test, X, y: ridge_regression_bf(X_test, X, y, DEG, ALPHA)),
+              ('streaming_regression', DEG, ALPHA, lambda X_test, X, y: streaming_regression(X_test, [(X, y)], DEG, ALPHA))]
+
+    n_trips = df_trips.groupby(['PULocationID', 'DOLocationID']).size()
+    print('{} routes with {} ... {} trips'.format(len(n_trips), n_trips.min(), n_trips.max()))
+    print('{:>22} {:>5} {:>6} {:>20}'.format('reference', 'deg', 'alpha', 'max |y_pred - ref|'))
+    passed = True
+    for reference, deg, alpha, fit in checks:
+        df_models = fit_route_models(df_trips, FEATURES, deg=deg, alpha=alpha)
+        y_pred = predict_route_models(df_models, df_trips, FEATURES, deg)
+        passed &= len(df_models) == len(n_trips) and not np.isnan(y_pred).any()
+        difference = max_difference(df_trips, y_pred, fit)
+        passed &= difference < TOLERANCE
+        print('{:>22} {:>5} {:>6} {:>20.3e}'.format(reference, str(deg), alpha, difference))
+    print('Same predictions:', passed)
+
+
+if __name__ == "__main__":
+    main()
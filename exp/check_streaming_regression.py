@@ -0,0 +1,64 @@
+# Package imports
+import numpy as np
+
+# allow import of own scripts
+import sys, os
+module_path = os.path.abspath(os.path.join('..'))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# import own functions
+from src.streaming_regression import streaming_regression, polynomial_features
+from src.sklearn_regression_bf import sklearn_regression_bf
+from src.ridge_regression_bf import ridge_regression_bf
+
+# variables
+N_ROWS = 20000
+N_TEST = 2000
+N_CHUNKS = 4
+DEGREES = [2, 3, 4, 5]
+# sklearn_regression_bf() solves the unscaled basis functions => it is only accurate up to this degree
+MAX_SKLEARN_DEGREE = 3
+TOLERANCE = 1e-6
+
+
+# trip features in the ranges of the repo (unscaled): day of month, weekday, hour, minute => trip duration
+def synthetic_features(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.integers(1, 32, n_rows), rng.integers(0, 7, n_rows),
+                         rng.integers(0, 24, n_rows), rng.integers(0, 60, n_rows)]).astype(float)
+    y = 20 + 0.1 * X[:, 2] + 3 * np.sin(X[:, 2] / 4) + 0.02 * X[:, 3] + rng.normal(0, 3, n_rows)
+    return X, y
+
+
+# OLS predictions of the standardized basis functions (reference for degrees where sklearn is inaccurate)
+def standardized_regression(X_test, X_train, y_train, deg):
+    P_train = polynomial_features(X_train, deg)[:, 1:]
+    mean, std = P_train.mean(axis=0), P_train.std(axis=0)
+    weights = np.linalg.lstsq((P_train - mean) / std, y_train - y_train.mean(), rcond=None)[0]
+    return ((polynomial_features(X_test, deg)[:, 1:] - mean) / std) @ weights + y_train.mean()
+
+
+def main():
+    X, y = synthetic_features(N_ROWS)
+    X_test, X_train, y_train = X[:N_TEST], X[N_TEST:], y[N_TEST:]
+    chunks = list(zip(np.array_split(X_train, N_CHUNKS), np.array_split(y_train, N_CHUNKS)))
+
+    print('{:>4} {:>12} {:>24} {:>24}'.format('deg', 'reference', 'max |y_pred - ref| OLS', 'max |y_pred - ref| ridge'))
+    passed = True
+    for deg in DEGREES:
+        _, y_pred = streaming_regression(X_test, chunks, deg)
+        _, y_pred_ridge = streaming_regression(X_test, chunks, deg, alpha=1)
+        if deg <= MAX_SKLEARN_DEGREE:
+            reference, y_ref = 'sklearn', sklearn_regression_bf(X_test, X_train, y_train, deg)[1]
+        else:
+            reference, y_ref = 'standardized', standardized_regression(X_test, X_train, y_train, deg)
+        error = np.abs(y_pred - y_ref).max()
+        error_ridge = np.abs(y_pred_ridge - ridge_regression_bf(X_test, X_train, y_train, deg, 1)[1]).max()
+        passed &= error < TOLERANCE and error_ridge < TOLERANCE
+        print('{:>4} {:>12} {:>24.3e} {:>24.3e}'.format(deg, reference, error, error_ridge))
+    print('Same predictions:', passed)
+
+
+if __name__ == "__main__":
+    main()
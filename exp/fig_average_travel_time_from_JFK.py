@@ -1,6 +1,4 @@
 # Package imports
-import numpy as np
-import pandas as pd
 import geopandas as gpd
 import ssl
 import datetime
@@ -24,10 +22,10 @@ if module_path not in sys.path:
 # import own functions
 from src.load_taxi_data import load_taxi_data
 from src.taxi_zones_loader import taxi_zones_loader
-from src.preprocess_data import preprocess_data
-from src.keep_correct_year import keep_correct_year
-from src.keep_correct_month import keep_correct_month
-from src.remove_routes import remove_routes
+from src.parse_tlc_datetime import parse_tlc_datetime
+from src.trip_cache import has_trip_cache, write_trip_cache
+from src.trip_pipeline import TripPipeline
+from src.od_matrix import od_matrix, od_summary
 
 # disable_certificate_check
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -40,6 +38,7 @@ MONTH = "01"
 PICKUP_ZONE = 132 # JFK
 
 DATA_PATH = '../dat/'
+CACHE_PATH = DATA_PATH + 'trips/'
 FIG_PATH = '../doc/fig/'
 
 
@@ -75,15 +74,12 @@ def fill_empty_rows(dataframe):
 
 
 # get average ride time
-def get_average_ride_time(df_taxi, geodf_nyc, pickup_zone):
-    # get subset of all rides startng in given pickup zone
-    subset = df_taxi[df_taxi["PULocationID"] == pickup_zone]
+def get_average_ride_time(od, geodf_nyc, pickup_zone):
+    # mean trip duration of all rides starting in given pickup zone per drop-off zone (read from the OD matrix)
+    df_summary = od_summary(od, origin=pickup_zone, by='destination')
 
-    gdf_average_ride_time = subset.groupby(['DOLocationID'])['trip_duration'].mean()
-
-    # gdf_average_ride_time = fill_empty_rows(gdf_average_ride_time)
-    gdf_average_ride_time.reindex(list(range(gdf_average_ride_time.index.min(), gdf_average_ride_time.index.max() + 1)),
-                                  fill_value=np.nan)
+    # only zones that were reached
+    gdf_average_ride_time = df_summary.loc[df_summary['count'] > 0, 'mean']
 
     # fix column names
     gdf_average_ride_time = gdf_average_ride_time.rename_axis('DOLocationID').reset_index(name='AverageRideTime')
@@ -96,30 +92,26 @@ def get_average_ride_time(df_taxi, geodf_nyc, pickup_zone):
 
 def main():
     # get taxi data
-    if os.path.isfile(DATA_PATH + 'df_taxi_%s_%s.csv' % (YEAR, MONTH)):
-        print("Dataset %s already downloaded." % 'df_taxi_%s_%s.csv' % (YEAR, MONTH))
+    if has_trip_cache(CACHE_PATH, YEAR, MONTH):
+        print("Dataset %s/%s already downloaded." % (MONTH, YEAR))
     else:
         # download taxi data for given month and year
         df_taxi = load_taxi_data(['yellow', 'green', 'fhv', 'fhvhv'], [int(YEAR)], [int(MONTH)])
-        # save data as csv on disk
-        df_taxi.to_csv(DATA_PATH + 'df_taxi_%s_%s.csv' % (YEAR, MONTH), encoding='utf-8')
-
-    # read previously saved dataframe from csv file from disk
-    df_taxi_raw = pd.read_csv(DATA_PATH + 'df_taxi_%s_%s.csv' % (YEAR, MONTH))
-    print(df_taxi_raw.head())
+        # save data as compressed parquet files on disk
+        write_trip_cache(df_taxi, CACHE_PATH, YEAR, MONTH)
+        del df_taxi
 
-    # preprocessing
-    df_taxi = preprocess_data(df_taxi_raw)
-    # remove rides outside nyc
-    df_taxi = remove_routes(df_taxi)
-    # remove wrong years from data set
-    df_taxi = keep_correct_year(df_taxi, YEAR)
+    # rides starting in the pickup zone without nan values, rides outside nyc and wrong years
+    # => the route filter and the columns are pushed down into the cache, all rules are applied in one pass
+    pipeline = TripPipeline(['yellow', 'green', 'fhv', 'fhvhv'], [int(YEAR)], [int(MONTH)], cache_path=CACHE_PATH)
+    pipeline = pipeline.route(pickup_id=PICKUP_ZONE).clean().select(['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID'])
+    print(pipeline.explain())
+    df_taxi = pipeline.collect()
 
     print(df_taxi.head())
 
     # get trip duration (target variable)
-    trip_duration = (pd.to_datetime(df_taxi['dropoff_datetime'], format='%Y-%m-%d %H:%M:%S')) - (
-        pd.to_datetime(df_taxi['pickup_datetime'], format='%Y-%m-%d %H:%M:%S'))
+    trip_duration = parse_tlc_datetime(df_taxi['dropoff_datetime']) - parse_tlc_datetime(df_taxi['pickup_datetime'])
     # add trip duration to dataframe
     df_taxi.insert(len(df_taxi.columns), 'trip_duration', trip_duration.astype('timedelta64[m]'))
     # filter negative values out
@@ -135,7 +127,9 @@ def main():
     print(geodf_nyc.head())
 
     rcParams['font.family'] = 'Times'
-    gdf_average_ride_time = get_average_ride_time(df_taxi, geodf_nyc, PICKUP_ZONE)
+    # count, sum and sum of squares of the trip duration per route, hour and weekday in one pass
+    od = od_matrix(df_taxi, value='trip_duration')
+    gdf_average_ride_time = get_average_ride_time(od, geodf_nyc, PICKUP_ZONE)
     plot_advanced_map(gdf_average_ride_time, "AverageRideTime", "Average travel time from JFK to other Zones in %s/%s"%(MONTH, YEAR))
 
 
@@ -5,8 +5,6 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
-from scipy import stats
-
 # Allow import of own scripts #
 import sys, os
 module_path = os.path.abspath(os.path.join('..'))
@@ -17,48 +15,58 @@ if module_path not in sys.path:
 # Own functions
 from src.load_taxi_data import load_taxi_data
 from src.taxi_zones_loader import taxi_zones_loader
-from src.preprocess_data import preprocess_data
-from src.keep_correct_year import keep_correct_year
-from src.remove_routes import remove_routes
+from src.clean_trip_data import clean_trip_data
 from src.temporal_preprocessing import temporal_preprocessing
-from src.keep_correct_month import keep_correct_month
+from src.compact_trip_data import compact_trip_data
+from src.route_index import has_route_index, build_route_index, read_route
+from src.gaussianize import Gaussianizer
 
-''' Retrieve data '''
-# Read previously saved dataframe from csv file from disk (if available)
-# df_taxi_2019_01 = pd.read_csv('df_taxi_2019_01.csv')
+# Location of the route index
+ROUTE_INDEX_PATH = '../dat/routes/'
+# Location of the fitted transforms of the route
+GAUSSIANIZER_PATH = '../dat/gaussianizer_route_132_138.json'
+
+''' Route: JFK Airport (Queens) to LaGuardia Airport (Queens) '''
+pickup_id  = 132   # JFK Airport (Queens)
+dropoff_id = 138   # LaGuardia Airport (Queens)
 
-# Download data from TLC
-df_taxi_2019_01 = load_taxi_data(['yellow', 'green', 'fhv'], [2019], [1])
+''' Retrieve data '''
+if not has_route_index(ROUTE_INDEX_PATH, 2019, 1):
+    # Read previously saved dataframe from csv file from disk (if available)
+    # df_taxi_2019_01 = pd.read_csv('df_taxi_2019_01.csv')
 
-# Save to disk (if desired)
-# df_taxi_2019_01.to_csv('df_taxi_2019_01.csv', encoding='utf-8')
+    # Download data from TLC (only once, afterwards the files are read from the download cache)
+    df_taxi_2019_01 = load_taxi_data(['yellow', 'green', 'fhv'], [2019], [1], cache_dir='../dat/downloads/')
 
-''' Pre-processing '''
-# Remove invalid data
-df_taxi_2019_01 = preprocess_data(df_taxi_2019_01)
+    # Save to disk (if desired)
+    # df_taxi_2019_01.to_csv('df_taxi_2019_01.csv', encoding='utf-8')
 
-# Remove rows with the wrong year
-df_taxi_2019_01 = keep_correct_year(df_taxi_2019_01, 2019)
+    ''' Pre-processing '''
+    # Remove invalid data, routes that come from or go to locations outside the city and rows with the wrong year or month
+    df_taxi_2019_01 = clean_trip_data(df_taxi_2019_01, 2019, '01')
 
-# Remove rows with wrong month
-df_taxi_2019_01 = keep_correct_month(df_taxi_2019_01, '01')
+    print('Number of entries in the data set after pre-processing: {} rows'.format(df_taxi_2019_01.shape[0]))
 
-# Remove routes that come from or go to locations outside the city
-df_taxi_2019_01 = remove_routes(df_taxi_2019_01)
+    # Sort the pre-processed trips by route (only once), afterwards every route is read as one slice
+    build_route_index(df_taxi_2019_01, ROUTE_INDEX_PATH, 2019, 1)
+    del df_taxi_2019_01
 
-print('Number of entries in the data set after pre-processing: {} rows'.format(df_taxi_2019_01.shape[0]))
+# Only the trips of the route are read from the route index
+df_taxi_2019_01 = read_route(ROUTE_INDEX_PATH, 2019, 1, pickup_id, dropoff_id)
 
 ''' Extract temporal features '''
-df_taxi_2019_01 = temporal_preprocessing(df_taxi_2019_01)
+# 'trip_duration' duplicates 'trip_duration_minutes' and 'pickup_month' is constant because we only have data of January 2019
+# => both are not computed at all.
+df_taxi_2019_01 = temporal_preprocessing(df_taxi_2019_01, columns=['trip_duration_minutes', 'pickup_day_of_month', 'pickup_weekday', 'pickup_hour', 'pickup_minute'])
+
+''' Compact dtypes => About a third of the memory '''
+df_taxi_2019_01 = compact_trip_data(df_taxi_2019_01)
 
 ''' Drop columns of wrong datatype which cannot be used in the calculation of the correlation matrix: '''
-# 'pickup_month' is dropped because we only have data of January 2019.
-excluded_clms = ['pickup_datetime', 'dropoff_datetime', 'fleet', 'trip_duration', 'pickup_month']
+excluded_clms = ['pickup_datetime', 'dropoff_datetime', 'fleet']
 df_taxi_2019_01 = df_taxi_2019_01.drop(columns=excluded_clms, inplace=False)
 
 ''' Restrict to single route: JFK Airport (Queens) to LaGuardia Airport (Queens) '''
-pickup_id  = 132   # JFK Airport (Queens)
-dropoff_id = 138   # LaGuardia Airport (Queens)
 
 # Set route fixed but leave all other columns the way they are
 df_taxi_2019_01_unfiltered = df_taxi_2019_01[(df_taxi_2019_01['PULocationID'] == pickup_id) &
@@ -78,6 +86,14 @@ df_one_route_filtered = df_taxi_2019_01[(df_taxi_2019_01['PULocationID'] == pick
                                         
 df_one_route_filtered = df_one_route_filtered.drop(columns=['PULocationID', 'DOLocationID'], inplace=False)
 
+# Transformations: "Gaussianization" => lambdas are fitted once and reused by all figures of this route
+if os.path.isfile(GAUSSIANIZER_PATH):
+    gaussianizer = Gaussianizer.load(GAUSSIANIZER_PATH)
+else:
+    gaussianizer = Gaussianizer().fit(df_one_route_filtered)
+    gaussianizer.save(GAUSSIANIZER_PATH)
+df_one_route_gaussian = gaussianizer.transform(df_one_route_filtered)
+
 ''' Plot histograms of filtered data and filtere data after gaussianization '''
 fsize_title = 25    # Subtitle font size
 fsize_label = 19    # Label font size
@@ -106,14 +122,14 @@ axs1[4].hist(df_one_route_filtered['pickup_hour'], bins='scott', color='tab:oran
 
 # Plot second row: Partly Gaussianized features
 subfig2.suptitle('Distribution of filtered and partially gaussianized features', fontsize=fsize_title, **font)
-axs2[0].hist( stats.yeojohnson(np.cbrt(df_one_route_filtered['pickup_day_of_month']))[0], color='tab:purple', bins='scott', edgecolor='#303030')
+axs2[0].hist( df_one_route_gaussian['pickup_day_of_month'], color='tab:purple', bins='scott', edgecolor='#303030')
 axs2[0].set_ylabel('Frequency', fontsize=fsize_label, **font)
 axs2[0].set_xlabel('pickup_day_of_month', fontsize=fsize_label, **font)
 
 axs2[1].hist( df_one_route_filtered['pickup_minute'], bins='scott', color='tab:purple', edgecolor='#303030')
 axs2[1].set_xlabel('pickup_minute *', fontsize=fsize_label, labelpad=label_vert_pad, **font)
 
-axs2[2].hist( stats.boxcox(df_one_route_filtered['trip_duration_minutes'], -0.42) , bins='scott', color='tab:purple', edgecolor='#303030')
+axs2[2].hist( df_one_route_gaussian['trip_duration_minutes'], bins='scott', color='tab:purple', edgecolor='#303030')
 axs2[2].set_xlabel('trip_duration_minutes', fontsize=fsize_label, **font)
 
 axs2[3].hist( df_one_route_filtered['pickup_weekday'], bins='scott', color='tab:purple', edgecolor='#303030')
@@ -1,6 +1,5 @@
 # Package imports
 import numpy as np
-import pandas as pd
 import geopandas as gpd
 import ssl
 import datetime
@@ -23,10 +22,11 @@ if module_path not in sys.path:
 # import own functions
 from src.load_taxi_data import load_taxi_data
 from src.taxi_zones_loader import taxi_zones_loader
-from src.preprocess_data import preprocess_data
-from src.keep_correct_year import keep_correct_year
-from src.keep_correct_month import keep_correct_month
-from src.remove_routes import remove_routes
+from src.clean_trip_data import clean_trip_data
+from src.parse_tlc_datetime import parse_tlc_datetime
+from src.trip_cache import has_trip_cache, write_trip_cache, read_trip_cache
+from src.trip_store import has_trip_store_month, append_trip_store, read_trip_store
+from src.od_matrix import od_matrix, od_summary
 
 # disable_certificate_check
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -39,6 +39,8 @@ MONTH = "01"
 PICKUP_ZONE = 132
 
 DATA_PATH = '../dat/'
+CACHE_PATH = DATA_PATH + 'trips/'
+STORE_PATH = DATA_PATH + 'store/'
 FIG_PATH = '../doc/fig/'
 
 
@@ -93,22 +95,18 @@ def fill_empty_rows(dataframe):
     return (dataframe.reindex(list(range(dataframe.index.min(),dataframe.index.max()+1)),fill_value=0))
 
 
-# get zone averges by taxi dataframe
-def get_zone_stats(df_taxi, geodf_nyc):
-    # count number of dropouts for each taxi zone
-    df_dropouts = df_taxi.groupby('DOLocationID')['DOLocationID'].count()
-    # fill empty rows with zero
-    df_dropouts = fill_empty_rows(df_dropouts)
+# get zone averges by OD matrix
+def get_zone_stats(od, geodf_nyc):
+    # count number of dropouts for each taxi zone (zones without dropouts are included with zero)
+    df_dropouts = od_summary(od, by='destination')['count']
     # fix column names
     df_dropouts = df_dropouts.rename_axis('DOLocationID').reset_index(name='Dropouts')
     # merge datasets
     gdf_zone_stats = geodf_nyc.merge(left_on='LocationID', right=df_dropouts, right_on='DOLocationID')
     del df_dropouts
 
-    # count number of pickups for each taxi zone
-    df_pickups = df_taxi.groupby('PULocationID')['PULocationID'].count()
-    # fill empty rows with zero
-    df_pickups = fill_empty_rows(df_pickups)
+    # count number of pickups for each taxi zone (zones without pickups are included with zero)
+    df_pickups = od_summary(od, by='origin')['count']
     # fix column names
     df_pickups = df_pickups.rename_axis('PULocationID').reset_index(name='Pickups')
     # merge datasets
@@ -124,30 +122,33 @@ def get_zone_stats(df_taxi, geodf_nyc):
 
 def main():
     # get taxi data
-    if os.path.isfile(DATA_PATH + 'df_taxi_%s_%s.csv' % (YEAR, MONTH)):
-        print("Dataset %s already downloaded." % 'df_taxi_%s_%s.csv' % (YEAR, MONTH))
+    if has_trip_cache(CACHE_PATH, YEAR, MONTH):
+        print("Dataset %s/%s already downloaded." % (MONTH, YEAR))
     else:
         # download taxi data for given month and year
         df_taxi = load_taxi_data(['yellow', 'green', 'fhv', 'fhvhv'], [int(YEAR)], [int(MONTH)])
-        # save data as csv on disk
-        df_taxi.to_csv(DATA_PATH + 'df_taxi_%s_%s.csv' % (YEAR, MONTH), encoding='utf-8')
+        # save data as compressed parquet files on disk
+        write_trip_cache(df_taxi, CACHE_PATH, YEAR, MONTH)
+        del df_taxi
 
-    # read previously saved dataframe from csv file from disk
-    df_taxi_raw = pd.read_csv(DATA_PATH + 'df_taxi_%s_%s.csv' % (YEAR, MONTH))
-    print(df_taxi_raw.head())
+    if not has_trip_store_month(STORE_PATH, YEAR, MONTH):
+        # read previously saved trips from the cache => only the columns needed for the map are read
+        df_taxi_raw = read_trip_cache(CACHE_PATH, years=[int(YEAR)], months=[int(MONTH)], columns=['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID'])
+        print(df_taxi_raw.head())
 
-    # preprocessing
-    df_taxi = preprocess_data(df_taxi_raw)
-    # remove rides outside nyc
-    df_taxi = remove_routes(df_taxi)
-    # remove wrong years from data set
-    df_taxi = keep_correct_year(df_taxi, YEAR)
+        # preprocessing: remove nan values, rides outside nyc and wrong years from data set in one pass
+        df_taxi = clean_trip_data(df_taxi_raw, YEAR)
+        # append cleaned trips to the column store
+        append_trip_store(df_taxi, STORE_PATH, YEAR, MONTH)
+        del df_taxi_raw, df_taxi
+
+    # memory-map the cleaned trips => only the pages that are used are read from disk
+    df_taxi = read_trip_store(STORE_PATH, columns=['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID'], years=[int(YEAR)], months=[int(MONTH)])
 
     print(df_taxi.head())
 
     # get trip duration (target variable)
-    trip_duration = (pd.to_datetime(df_taxi['dropoff_datetime'], format='%Y-%m-%d %H:%M:%S')) - (
-        pd.to_datetime(df_taxi['pickup_datetime'], format='%Y-%m-%d %H:%M:%S'))
+    trip_duration = parse_tlc_datetime(df_taxi['dropoff_datetime']) - parse_tlc_datetime(df_taxi['pickup_datetime'])
     # add trip duration to dataframe
     df_taxi.insert(len(df_taxi.columns), 'trip_duration', trip_duration.astype('timedelta64[m]'))
     # filter negative values out
@@ -159,7 +160,9 @@ def main():
     # rest index to later get interpretable results
     geodf_nyc.set_index('LocationID', inplace=True);
 
-    gdf_zone_stats = get_zone_stats(df_taxi, geodf_nyc)
+    # count, sum and sum of squares of the trip duration per route, hour and weekday in one pass
+    od = od_matrix(df_taxi, value='trip_duration')
+    gdf_zone_stats = get_zone_stats(od, geodf_nyc)
     plot_interactive_map(gdf_zone_stats, "Pickups", "Pickups per Zone in %s/%s"%(MONTH, YEAR))
 
 if __name__ == "__main__":
@@ -1,8 +1,6 @@
 # package imports
-import pandas as pd
 import ssl
 from tqdm import tqdm
-from calendar import monthrange
 
 # from IPython.display import set_matplotlib_formats
 import matplotlib_inline.backend_inline
@@ -20,6 +18,9 @@ if module_path not in sys.path:
 
 # import own functions
 from src.load_taxi_data import load_taxi_data
+from src.trip_cache import has_trip_cache, write_trip_cache, read_trip_cache, trip_cache_files
+from src.daily_fleet_counts import read_daily_fleet_counts, daily_fleet_counts, write_month_counts
+from src.process_months import pending_months, process_months
 
 # disable_certificate_check
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -29,87 +30,76 @@ matplotlib_inline.backend_inline.set_matplotlib_formats("pdf", "svg")
 
 # variables
 DATA_PATH = '../dat/'
+CACHE_PATH = DATA_PATH + 'trips/'
+SUMMARY_PATH = DATA_PATH + 'daily_fleet_counts.csv'
+MANIFEST_PATH = DATA_PATH + 'daily_fleet_counts.json'
+# increase after changes of count_trips_of_month() => all months are counted again
+COUNT_VERSION = 1
+# months are counted in parallel processes, each with a memory limit in bytes
+MAX_WORKERS = 4
+MEMORY_LIMIT = 8 * 1024**3
 FIG_PATH = '../doc/fig/'
 
 
-# function to download all necessary data
+# months of the figure
+def all_months():
+    # data for years between 2015 and 2021, skip months after june 2021, because data is not available
+    return [(year, month) for year in range(2015, 2022) for month in range(1, 13) if not (year == 2021 and month >= 7)]
+
+
+# cached parquet files of a month (empty if the month has not been downloaded)
+def cache_files(year, month):
+    return trip_cache_files(CACHE_PATH, year, month) if has_trip_cache(CACHE_PATH, year, month) else []
+
+
+# function to download all necessary data => only months that have not been counted with the current data
 def download_all_taxi_data():
-    # download data for years between 2015 and 2021
-    for year in range(2015, 2022):
-        # download data for months between 01 and 12
-        for month in tqdm(range(1, 13), desc="Downloading data from the year: %s"%(year)):
-            # skip months after june 2021, because data is not available
-            if not (year == 2021 and month >= 7):
-                # leading zero if number as only one digit
-                month = "%02d" % (month,)
-                if os.path.isfile(DATA_PATH + 'df_taxi_%s_%s.csv'%(year, month)):
-                    print("Dataset %s already downloaded."%'df_taxi_%s_%s.csv'%(year, month))
-                else:
-                    # download taxi data for given month and year
-                    df_taxi = load_taxi_data(['yellow', 'green', 'fhv', 'fhvhv'], [int(year)], [int(month)])
-                    # save data as csv on disk
-                    df_taxi.to_csv('../dat/df_taxi_%s_%s.csv'%(year, month), encoding='utf-8')
-
-
-# calculate number of all trips over time
+    for year, month in tqdm(pending_months(MANIFEST_PATH, all_months(), cache_files, COUNT_VERSION), desc="Downloading data"):
+        # leading zero if number as only one digit
+        month = "%02d" % (month,)
+        if has_trip_cache(CACHE_PATH, year, month):
+            print("Dataset %s/%s already downloaded."%(month, year))
+        else:
+            # download taxi data for given month and year (all fleets in parallel)
+            df_taxi = load_taxi_data(['yellow', 'green', 'fhv', 'fhvhv'], [int(year)], [int(month)], max_workers=4)
+            # save data as compressed parquet files on disk
+            write_trip_cache(df_taxi, CACHE_PATH, year, month)
+
+
+# count the trips of one month (runs in a worker process, returns only the daily counts)
+def count_trips_of_month(year, month):
+    # read dataframe => only pick-up time and fleet are needed
+    df_taxi = read_trip_cache(CACHE_PATH, years=[year], months=[month], columns=['pickup_datetime', 'fleet'])
+    # count trips per day and fleet in one pass
+    return daily_fleet_counts(df_taxi, year, month), len(df_taxi)
+
+
+# add the counts of one month to the summary table (runs in the main process in the order of the months)
+def store_trips_of_month(year, month, result):
+    df_month_counts, rows_in = result
+    write_month_counts(SUMMARY_PATH, df_month_counts, year, month)
+    return {'output': SUMMARY_PATH, 'rows_in': rows_in, 'rows_out': df_month_counts.to_numpy().sum()}
+
+
+# calculate number of all trips over time => only new months and months whose data has changed are processed,
+# every counted month is recorded in the manifest
 def calculate_number_of_all_trips_over_time():
-    # create empty dataframe
-    rides_df = pd.DataFrame(columns = ["time_period", "Yellow Taxi", "Green Taxi", "For-Hire Vehicle"])
-    rides_ratio_df = pd.DataFrame(columns = ["time_period", "Yellow Taxi", "Green Taxi", "For-Hire Vehicle"])
-
-    # download data for years between 2015 and 2021
-    for year in range(2015, 2022): #for year in range(2015, 2022):
-        # download data for months between 01 and 12
-        for month in tqdm(range(1, 13), desc="Loading data from disk of year: %s"%(year)):
-            # skip months after june 2021, because data is not available
-            if not (year == 2021 and month >= 7):
-                # leading zero if number as only one digit
-                month = "%02d" % (month,)
-                if os.path.isfile('../dat/df_taxi_%s_%s.csv'%(year, month)):
-                    # read dataframe
-                    df_taxi = pd.read_csv("../dat/df_taxi_%s_%s.csv"%(str(year), str(month)))
-                    # get amount of days of month X in year Y
-                    days = monthrange(int(year),int(month))[1]
-                    # convert string into datetime format to only keep date
-                    df_taxi['pickup_datetime'] = pd.to_datetime(df_taxi['pickup_datetime'], format='%Y-%m-%d').dt.date
-                    # store date as string
-                    df_taxi['pickup_datetime'] = df_taxi['pickup_datetime'].astype(str)
-                    # for every day in the month
-                    for day in range(1, days + 1):
-                        # leading zero if number as only one digit
-                        day = "%02d" % (day,)
-                        # composite date from loop
-                        date = '%s-%s-%s'%(year, month, day)
-                        # filter by single day
-                        df_taxi_subset = df_taxi[df_taxi['pickup_datetime'] == date]
-
-                        # get total amount of rides
-                        total = len(df_taxi_subset)
-                        # get amount of yellow taxi rides
-                        yellow_rides = df_taxi_subset.loc[df_taxi_subset.fleet == 'yellow', 'fleet'].count()
-                        # get ratio of yellow taxi rides
-                        yellow_rides_ratio = yellow_rides / total
-                        # get amount of green taxi rides
-                        green_rides = df_taxi_subset.loc[df_taxi_subset.fleet == 'green', 'fleet'].count()
-                        # get ratio of green taxi rides
-                        green_rides_ratio = green_rides / total
-                        # get amount of vfh taxi rides
-                        fhv_rides = df_taxi_subset.loc[df_taxi_subset.fleet == 'fhv', 'fleet'].count()
-                        # get ratio of vfh taxi rides
-                        fhv_rides_ratio = fhv_rides / total
-
-                        rides_df = rides_df.append({'time_period': "%s/%s/%s"%(str(day), str(month), str(year)), 'Yellow Taxi': yellow_rides,
-                                                    'Green Taxi': green_rides, 'For-Hire Vehicle': fhv_rides}, ignore_index=True)
-                        rides_ratio_df = rides_ratio_df.append({'time_period': "%s/%s/%s"%(str(day), str(month), str(year)), 'Yellow Taxi': yellow_rides_ratio,
-                                                    'Green Taxi': green_rides_ratio, 'For-Hire Vehicle': fhv_rides_ratio}, ignore_index=True)
-
-                        del df_taxi_subset
-                else:
-                    print("File does not exist!")
-
-    # save dataframes as csv
-    rides_df.to_csv(DATA_PATH + 'rides_df.csv', encoding='utf-8')
-    rides_ratio_df.to_csv(DATA_PATH + 'rides_ratio_df.csv', encoding='utf-8')
+    process_months(MANIFEST_PATH, all_months(), cache_files, count_trips_of_month, COUNT_VERSION,
+                   commit=store_trips_of_month, max_workers=MAX_WORKERS, memory_limit=MEMORY_LIMIT)
+
+
+# number and ratio of rides per day and provider
+def get_rides_over_time():
+    df_counts = read_daily_fleet_counts(SUMMARY_PATH)
+    df_counts = df_counts.rename(columns={'yellow': 'Yellow Taxi', 'green': 'Green Taxi', 'fhv': 'For-Hire Vehicle'})
+    # ratio of the rides of every provider per day
+    rides_ratio_df = df_counts.div(df_counts.sum(axis=1), axis=0)
+    # day/month/year as label
+    rides_df = df_counts.reset_index(drop=True)
+    rides_df.insert(0, 'time_period', df_counts.index.strftime('%d/%m/%Y'))
+    rides_ratio_df = rides_ratio_df.reset_index(drop=True)
+    rides_ratio_df.insert(0, 'time_period', df_counts.index.strftime('%d/%m/%Y'))
+    return rides_df, rides_ratio_df
 
 
 # create and save plots
@@ -162,17 +152,16 @@ def create_and_save_plots(rides_df, rides_ratio_df):
 
 def main():
     # prepare plotting
-    if os.path.isfile(DATA_PATH + 'rides_df.csv') and os.path.isfile(DATA_PATH + 'rides_ratio_df.csv'):
+    if not pending_months(MANIFEST_PATH, all_months(), cache_files, COUNT_VERSION):
         print("Necessary calculations have already been made.")
     else:
         download_all_taxi_data()
         print("All necessary data are available.")
 
         calculate_number_of_all_trips_over_time()
-        print("Number of all trips over time was calculated and were dataframes stored on disk.")
+        print("Number of all trips over time was calculated and stored on disk.")
 
-    rides_df = pd.read_csv(DATA_PATH + 'rides_df.csv', index_col=0)
-    rides_ratio_df = pd.read_csv(DATA_PATH + 'rides_ratio_df.csv', index_col=0)
+    rides_df, rides_ratio_df = get_rides_over_time()
 
     create_and_save_plots(rides_df, rides_ratio_df)
 
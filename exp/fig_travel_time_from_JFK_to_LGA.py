@@ -1,11 +1,10 @@
 # Package imports
+import numpy as np
 import pandas as pd
 import ssl
 import matplotlib.pyplot as plt
 from tqdm import tqdm
 from tueplots import bundles
-from calendar import monthrange
-from datetime import datetime
 
 # from IPython.display import set_matplotlib_formats
 import matplotlib_inline.backend_inline
@@ -18,9 +17,12 @@ if module_path not in sys.path:
 
 # import own functions
 from src.load_taxi_data import load_taxi_data
-from src.preprocess_data import preprocess_data
-from src.keep_correct_year import keep_correct_year
-from src.remove_routes import remove_routes
+from src.clean_trip_data import clean_trip_data
+from src.trip_cache import has_trip_cache, write_trip_cache, read_trip_cache
+from src.route_index import has_route_index, build_route_index, read_route
+from src.quantile_sketch import quantile_sketch, merge_sketches, iqr_outlier_mask
+from src.temporal_profile import SHAPE as PROFILE_SHAPE, temporal_profile_sketch, profile_table
+from src.map_months import map_reduce_months
 
 # disable_certificate_check
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -30,7 +32,12 @@ matplotlib_inline.backend_inline.set_matplotlib_formats("pdf", "svg")
 
 # variables
 DATA_PATH = '../dat/'
+CACHE_PATH = DATA_PATH + 'trips/'
+ROUTE_INDEX_PATH = DATA_PATH + 'routes/'
 FIG_PATH = '../doc/fig/'
+# months are processed in parallel processes, each with a memory limit in bytes
+MAX_WORKERS = 4
+MEMORY_LIMIT = 8 * 1024**3
 
 
 # function to download all necessary data
@@ -43,24 +50,19 @@ def download_all_taxi_data():
             if not (year == 2021 and month >= 7):
                 # leading zero if number as only one digit
                 month = "%02d" % (month,)
-                if os.path.isfile(DATA_PATH + 'df_taxi_%s_%s.csv'%(year, month)):
-                    print("Dataset %s already downloaded."%'df_taxi_%s_%s.csv'%(year, month))
+                if has_trip_cache(CACHE_PATH, year, month):
+                    print("Dataset %s/%s already downloaded."%(month, year))
                 else:
-                    # download taxi data for given month and year
-                    df_taxi = load_taxi_data(['yellow', 'green', 'fhv', 'fhvhv'], [int(year)], [int(month)])
-                    # save data as csv on disk
-                    df_taxi.to_csv('../dat/df_taxi_%s_%s.csv'%(year, month), encoding='utf-8')
+                    # download taxi data for given month and year (all fleets in parallel)
+                    df_taxi = load_taxi_data(['yellow', 'green', 'fhv', 'fhvhv'], [int(year)], [int(month)], max_workers=4)
+                    # save data as compressed parquet files on disk
+                    write_trip_cache(df_taxi, CACHE_PATH, year, month)
 
 
 # preprocessing of dataset
 def dataset_preprocessing(df, year):
-    # remove nan values
-    df = preprocess_data(df)
-    # remove rides outside nyc
-    df = remove_routes(df)
-    # remove wrong years from data set
-    df = keep_correct_year(df, year)
-    return df
+    # remove nan values, rides outside nyc and wrong years from data set in one pass
+    return clean_trip_data(df, year)
 
 
 # data preparation
@@ -74,21 +76,19 @@ def prepare_data_for_route_between_two_zones(df_taxi):
     df_route_subset = df_taxi[df_taxi["PULocationID"] == pickup_zone]
     df_route_subset = df_route_subset[df_route_subset["DOLocationID"] == dropout_zone]
 
-    # remove outlier
-    Q1 = df_route_subset.quantile(0.25)
-    Q3 = df_route_subset.quantile(0.75)
-    IQR = Q3 - Q1
-    df_route_subset = df_route_subset[
-        ~((df_route_subset < (Q1 - 1.5 * IQR)) | (df_route_subset > (Q3 + 1.5 * IQR))).any(axis=1)]
+    # remove outlier (only numeric columns can contain outliers) => one quantile sketch per column
+    df_numeric = df_route_subset.select_dtypes('number')
+    outliers = np.zeros(len(df_numeric), dtype=bool)
+    for column in df_numeric.columns:
+        sketch = quantile_sketch(df_numeric[column])
+        outliers |= iqr_outlier_mask(sketch, df_numeric[column])
+    df_route_subset = df_route_subset[~outliers]
 
     return df_route_subset
 
 
 # get dataframe with pickup times in bins
-def get_df_with_pickup_times_in_bins(df_route_subset):
-    # convert string into datetime format to only keep date
-    df_route_subset['pickup_datetime'] = pd.to_datetime(df_route_subset['pickup_datetime'], format='%Y-%m-%d')
-
+def get_df_with_pickup_times_in_bins(df_profile, weekday):
     # define the bins
     bins = list(range(0, 24 + 1))
 
@@ -99,111 +99,80 @@ def get_df_with_pickup_times_in_bins(df_route_subset):
             hour = "%02d" % (hour,)
             labels.append("%s:00-%s:59" % (hour, hour))
 
-    # add the bins to the dataframe
-    df_route_subset['time bin'] = pd.cut(df_route_subset.pickup_datetime.dt.hour, bins, labels=labels, right=False)
+    # rows of the weekday => one row per hour bin with count, mean and quartiles
+    df_pickup_times_in_bins = df_profile.loc[weekday]
+    df_pickup_times_in_bins.index = pd.Index(labels, name='time bin')
 
-    # groupby Time Bin and aggregate a list for the observations, and mean
-    df_route_subset = df_route_subset.groupby('time bin', as_index=False)['trip_duration'].agg([list, 'mean'])
+    return df_pickup_times_in_bins
 
-    return df_route_subset
 
+# months of the figure
+def all_months(years):
+    # skip months after june 2021, because data is not available
+    return [(year, month) for year in years for month in range(1, 13) if not (year == 2021 and month >= 7)]
 
-def main():
-    # create a lot of empty data frames
-    df_monday_travel_time = pd.DataFrame()
-    df_tuesday_travel_time = pd.DataFrame()
-    df_wednesday_travel_time = pd.DataFrame()
-    df_thursday_travel_time = pd.DataFrame()
-    df_friday_travel_time = pd.DataFrame()
-    df_saturday_travel_time = pd.DataFrame()
-    df_sunday_travel_time = pd.DataFrame()
 
-    # download data for years between 2015 and 2021
-    for year in range(2019, 2020):
-        # download data for months between 01 and 12
-        for month in tqdm(range(1, 13), desc="Loading data from disk of year: %s" % (year)):
-            # skip months after june 2021, because data is not available
-            if not (year == 2021 and month >= 7):
-                # leading zero if number as only one digit
-                month = "%02d" % (month,)
-                if os.path.isfile('../dat/df_taxi_%s_%s.csv' % (year, month)):
-                    # read dataframe
-                    df_taxi = pd.read_csv("../dat/df_taxi_%s_%s.csv" % (str(year), str(month)))
-                    # dataset preprocessing
-                    df_taxi = dataset_preprocessing(df_taxi, year)
-                    # get trip duration (target variable)
-                    trip_duration = (pd.to_datetime(df_taxi['dropoff_datetime'], format='%Y-%m-%d %H:%M:%S')) - (
-                        pd.to_datetime(df_taxi['pickup_datetime'], format='%Y-%m-%d %H:%M:%S'))
-                    # add trip duration to dataframe
-                    df_taxi.insert(len(df_taxi.columns), 'trip_duration', trip_duration.astype('timedelta64[m]'))
-
-                    # prepare data for route between two zones
-                    df_route_subset = prepare_data_for_route_between_two_zones(df_taxi)
-
-                    # convert string into datetime format to only keep date
-                    df_route_subset['aux_date'] = pd.to_datetime(df_route_subset['pickup_datetime'],
-                                                                 format='%Y-%m-%d').dt.date
-                    # store date as string
-                    df_route_subset['aux_date'] = df_route_subset['aux_date'].astype(str)
-
-                    # convert string into datetime format to only keep date
-                    df_route_subset['aux_time'] = pd.to_datetime(df_route_subset['pickup_datetime'],
-                                                                 format='%Y-%m-%d').dt.date
-                    # store date as string
-                    df_route_subset['aux_time'] = df_route_subset['aux_date'].astype(str)
-
-                    # get amount of days of month X in year Y
-                    days = monthrange(int(year), int(month))[1]
-                    # for every day in the month
-                    for day in range(1, days + 1):
-                        # leading zero if number as only one digit
-                        day = "%02d" % (day,)
-                        # composite date from loop
-                        date = '%s-%s-%s' % (year, month, day)
-
-                        df_day_subset = df_route_subset[df_route_subset['aux_date'] == date]
-
-                        ### get dataframe with pickup times in bins
-                        ###df_pickup_times_in_bins = get_df_with_pickup_times_in_bins(df_route_subset, date)
-                        # get weekday of date
-                        weekday = datetime.strptime(date, '%Y-%m-%d').weekday()
-
-                        if weekday == 0:
-                            df_monday_travel_time = df_monday_travel_time.append(df_day_subset)
-                        elif weekday == 1:
-                            df_tuesday_travel_time = df_tuesday_travel_time.append(df_day_subset)
-                        elif weekday == 2:
-                            df_wednesday_travel_time = df_wednesday_travel_time.append(df_day_subset)
-                        elif weekday == 3:
-                            df_thursday_travel_time = df_thursday_travel_time.append(df_day_subset)
-                        elif weekday == 4:
-                            df_friday_travel_time = df_friday_travel_time.append(df_day_subset)
-                        elif weekday == 5:
-                            df_saturday_travel_time = df_saturday_travel_time.append(df_day_subset)
-                        elif weekday == 6:
-                            df_sunday_travel_time = df_sunday_travel_time.append(df_day_subset)
-                else:
-                    print("File does not exist!")
+# travel time sketch of the rides from JFK Airport to LaGuardia Airport of one month (runs in a worker process)
+def get_route_profile_of_month(year, month):
+    # leading zero if number as only one digit
+    month = "%02d" % (month,)
+    if not has_route_index(ROUTE_INDEX_PATH, year, month) and has_trip_cache(CACHE_PATH, year, month):
+        # dataset preprocessing of the whole month and sorting by route (only once per month)
+        df_taxi = dataset_preprocessing(read_trip_cache(CACHE_PATH, years=[year], months=[month]), year)
+        build_route_index(df_taxi, ROUTE_INDEX_PATH, year, month)
+        del df_taxi
+    if not has_route_index(ROUTE_INDEX_PATH, year, month):
+        print("File does not exist!")
+        return None
+
+    # read preprocessed rides from JFK Airport to LaGuardia Airport => one slice of the route index
+    df_taxi = read_route(ROUTE_INDEX_PATH, year, month, 132, 138)
+    # get trip duration (target variable)
+    trip_duration = df_taxi['dropoff_datetime'] - df_taxi['pickup_datetime']
+    # add trip duration to dataframe
+    df_taxi.insert(len(df_taxi.columns), 'trip_duration', trip_duration.astype('timedelta64[m]'))
+
+    # prepare data for route between two zones
+    df_route_subset = prepare_data_for_route_between_two_zones(df_taxi)
+    # only the small sketch per weekday and hour is sent back
+    return temporal_profile_sketch(df_route_subset)
+
+
+# merge the sketches of two months (months without data are skipped)
+def merge_route_profiles(sketch, other):
+    if sketch is None or other is None:
+        return other if sketch is None else sketch
+    return merge_sketches(sketch, other)
+
+
+def main():
+    # travel time per weekday and hour of 2019 => the months are processed in parallel, only their sketches are merged
+    sketch = map_reduce_months(get_route_profile_of_month, all_months(range(2019, 2020)), merge_route_profiles,
+                               max_workers=MAX_WORKERS, memory_limit=MEMORY_LIMIT)
+    if sketch is None:
+        # no data => empty profile
+        sketch = quantile_sketch([], shape=PROFILE_SHAPE)
+    df_profile = profile_table(sketch)
 
     # edit dataframes
-    df_monday_travel_time = get_df_with_pickup_times_in_bins(df_monday_travel_time)
-    df_tuesday_travel_time = get_df_with_pickup_times_in_bins(df_tuesday_travel_time)
-    df_wednesday_travel_time = get_df_with_pickup_times_in_bins(df_wednesday_travel_time)
-    df_thursday_travel_time = get_df_with_pickup_times_in_bins(df_thursday_travel_time)
-    df_friday_travel_time = get_df_with_pickup_times_in_bins(df_friday_travel_time)
-    df_saturday_travel_time = get_df_with_pickup_times_in_bins(df_saturday_travel_time)
-    df_sunday_travel_time = get_df_with_pickup_times_in_bins(df_sunday_travel_time)
+    df_monday_travel_time = get_df_with_pickup_times_in_bins(df_profile, 0)
+    df_tuesday_travel_time = get_df_with_pickup_times_in_bins(df_profile, 1)
+    df_wednesday_travel_time = get_df_with_pickup_times_in_bins(df_profile, 2)
+    df_thursday_travel_time = get_df_with_pickup_times_in_bins(df_profile, 3)
+    df_friday_travel_time = get_df_with_pickup_times_in_bins(df_profile, 4)
+    df_saturday_travel_time = get_df_with_pickup_times_in_bins(df_profile, 5)
+    df_sunday_travel_time = get_df_with_pickup_times_in_bins(df_profile, 6)
 
     # plotting
     with plt.rc_context(bundles.neurips2021()):
         # initiate plot
-        ax = df_monday_travel_time.plot(label="Monday")
-        df_tuesday_travel_time.plot(ax=ax, label="Tuesday")
-        df_wednesday_travel_time.plot(ax=ax, label="Wednesday")
-        df_thursday_travel_time.plot(ax=ax, label="Thursday")
-        df_friday_travel_time.plot(ax=ax, label="Friday")
-        df_saturday_travel_time.plot(ax=ax, label="Saturday")
-        df_sunday_travel_time.plot(ax=ax, label="Sunday")
+        ax = df_monday_travel_time['mean'].plot(label="Monday")
+        df_tuesday_travel_time['mean'].plot(ax=ax, label="Tuesday")
+        df_wednesday_travel_time['mean'].plot(ax=ax, label="Wednesday")
+        df_thursday_travel_time['mean'].plot(ax=ax, label="Thursday")
+        df_friday_travel_time['mean'].plot(ax=ax, label="Friday")
+        df_saturday_travel_time['mean'].plot(ax=ax, label="Saturday")
+        df_sunday_travel_time['mean'].plot(ax=ax, label="Sunday")
 
         # legend settings
         ax.legend(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"], prop={'size': 9.5},
@@ -0,0 +1,79 @@
+# Package imports
+import numpy as np
+import pandas as pd
+import ssl
+
+# allow import of own scripts
+import sys, os
+module_path = os.path.abspath(os.path.join('..'))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# import own functions
+from src.load_taxi_data import load_taxi_data
+from src.taxi_zones_loader import taxi_zones_loader
+from src.trip_cache import has_trip_cache, write_trip_cache
+from src.trip_pipeline import TripPipeline
+from src.od_matrix import od_matrix, add_od_matrices
+from src.travel_time_predictor import build_travel_time_table, save_travel_time_table, TravelTimePredictor, serve_travel_time_predictor
+
+# disable_certificate_check
+ssl._create_default_https_context = ssl._create_unverified_context
+
+# variables
+FLEETS = ['yellow', 'green', 'fhv', 'fhvhv']
+YEAR = 2019
+MONTHS = [1, 2, 3]
+
+DATA_PATH = '../dat/'
+CACHE_PATH = DATA_PATH + 'trips/'
+DOWNLOAD_PATH = DATA_PATH + 'downloads/'
+TABLE_PATH = DATA_PATH + 'travel_times.npz'
+
+HOST = '127.0.0.1'
+PORT = 8080
+
+
+# OD matrix of the trip duration of one month (trips are downloaded and cached if necessary)
+def get_od_matrix_of_month(month):
+    if not has_trip_cache(CACHE_PATH, YEAR, month):
+        df_taxi = load_taxi_data(FLEETS, [YEAR], [month])
+        write_trip_cache(df_taxi, CACHE_PATH, YEAR, month)
+        del df_taxi
+
+    # cleaned trips with positive trip duration in minutes => only the needed columns are read from the cache
+    pipeline = TripPipeline(FLEETS, [YEAR], [month], cache_path=CACHE_PATH).clean().temporal()
+    df_taxi = pipeline.select(['pickup_datetime', 'PULocationID', 'DOLocationID', 'trip_duration_minutes']).collect()
+    return od_matrix(df_taxi, value='trip_duration_minutes')
+
+
+def build_table():
+    # add the months one by one => only one month of trips is in memory
+    od = None
+    for month in MONTHS:
+        od_month = get_od_matrix_of_month(month)
+        od = od_month if od is None else add_od_matrices(od, od_month)
+
+    # borough of every zone for the fallback of sparse routes
+    df_zones = taxi_zones_loader(cache_dir=DOWNLOAD_PATH)
+    boroughs = None if df_zones is None else df_zones.set_index('LocationID')['Borough']
+
+    table = build_travel_time_table(od, boroughs)
+    save_travel_time_table(TABLE_PATH, table)
+    return table
+
+
+def main():
+    if not os.path.isfile(TABLE_PATH):
+        build_table()
+    predictor = TravelTimePredictor.load(TABLE_PATH)
+
+    # example: JFK Airport (132) to LaGuardia Airport (138) on Mondays
+    minutes, sources = predictor.predict_batch(np.full(24, 132), np.full(24, 138), np.zeros(24), np.arange(24))
+    print(pd.DataFrame({'minutes': minutes, 'source': sources}, index=pd.Index(range(24), name='hour')))
+
+    serve_travel_time_predictor(predictor, HOST, PORT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from src.preprocess_data import valid_rows_mask, location_ids_to_int
+from src.remove_routes import inside_city_mask
+from src.keep_correct_year import correct_year_mask
+from src.keep_correct_month import correct_month_mask
+
+def clean_trip_data(df_taxi_data, year=None, month=None, year_by='both', month_by='both'):
+    '''
+    Preprocess TLC taxi trip data in a single pass: preprocess_data(), remove_routes(), keep_correct_year() and keep_correct_month().
+    -------------------------------------------------------------------------------------------------------------------------------
+    All rules are combined into one boolean mask, so only the remaining rows are copied once (instead of one copy per step).
+    The same percentages as by the individual functions are printed, each relative to the rows left by the previous rules.
+    The unknown drop-off time of old FHV trips (before 2017) is not treated as missing (see unknown_dropoff_mask()).
+    INPUTS:
+
+    df_taxi_data (Pandas dataframe): This data mus have been loaded using load_taxi_data().
+    year (int)                     : None (keep all years) or year to be kept.
+    month (str)                    : None (keep all months) or month to be kept, e.g. '01'.
+    year_by (str)                  : Timestamps that must be in the specified year (see keep_correct_year()).
+    month_by (str)                 : Timestamps that must be in the specified month (see keep_correct_month()).
+
+    OUTPUT:
+
+    df_cleansed (Pandas dataframe): Cleansed dataframe.
+    '''
+    # Number of rows that are left after every rule
+    n_rows = [df_taxi_data.shape[0]]
+
+    # Remove NaN, infinite values and undefined locations
+    mask = valid_rows_mask(df_taxi_data)
+    n_rows.append(np.count_nonzero(mask))
+
+    # Remove locations outside the city (IDs might not be numeric yet)
+    location_ids = pd.DataFrame({column: pd.to_numeric(df_taxi_data[column], errors='coerce') for column in ['PULocationID', 'DOLocationID']})
+    mask &= inside_city_mask(location_ids)
+    n_rows.append(np.count_nonzero(mask))
+
+    # Remove wrong years and months
+    if year is not None:
+        mask &= correct_year_mask(df_taxi_data, year, year_by)
+    n_rows.append(np.count_nonzero(mask))
+    if month is not None:
+        mask &= correct_month_mask(df_taxi_data, month, month_by)
+    n_rows.append(np.count_nonzero(mask))
+
+    # Copy the remaining rows once, without the unnecessary column
+    columns = np.flatnonzero(df_taxi_data.columns != 'Unnamed: 0')
+    df_taxi_data = df_taxi_data.iloc[np.flatnonzero(mask), columns]
+
+    # Some locations are stored as float but we need discrete int values for later grouping
+    location_ids_to_int(df_taxi_data)
+
+    # Show preprocessing result
+    messages = ['About {:.4f}% of the entire data could not be used due to missing information (NaN).',
+                'About {:.4f}% of the entire data could not be used because "PULocationID" or "DOLocationID" are outside the city.',
+                'About {:.4f}% of the entire data could not be used because they contained the wrong year.',
+                'About {:.4f}% of the entire data could not be used because they contained the wrong month.']
+    for i, message in enumerate(messages):
+        if (i == 2 and year is None) or (i == 3 and month is None):
+            continue
+        print(message.format(100*(1-n_rows[i+1]/n_rows[i]) if n_rows[i] > 0 else 0))
+
+    return df_taxi_data
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype, is_timedelta64_dtype
+
+from src.load_taxi_data import FLEETS
+
+# Smallest dtypes that can hold the values of the columns of load_taxi_data() and temporal_preprocessing()
+COMPACT_DTYPES = {'PULocationID'         : 'int16',    # 1 ... 265
+                  'DOLocationID'         : 'int16',
+                  'passenger_count'      : 'float32',  # Contains NaN
+                  'trip_distance'        : 'float32',
+                  'tip_amount'           : 'float32',
+                  'total_amount'         : 'float32',
+                  'trip_duration_minutes': 'float32',
+                  'pickup_month'         : 'int8',     # 1 ... 12
+                  'pickup_day_of_month'  : 'int8',     # 1 ... 31
+                  'pickup_weekday'       : 'int8',     # 0 ... 6
+                  'pickup_hour'          : 'int8',     # 0 ... 23
+                  'pickup_minute'        : 'int8'}     # 0 ... 59
+
+
+def _downcast(values, dtype):
+    '''
+    Convert values to dtype. Integer columns with missing values become nullable integers (e.g. Int16),
+    columns whose values do not fit into dtype are returned unchanged.
+    '''
+    if np.dtype(dtype).kind != 'i':
+        return values.astype(dtype)
+    numbers = pd.to_numeric(values, errors='coerce')
+    if numbers.isna().sum() > values.isna().sum() or not (numbers.dropna() % 1 == 0).all():
+        # Non-numeric or non-integer values
+        return values
+    if numbers.min() < np.iinfo(dtype).min or numbers.max() > np.iinfo(dtype).max:
+        return values
+    if numbers.isna().any():
+        return numbers.astype(dtype.capitalize())
+    return numbers.astype(dtype)
+
+
+def compact_trip_data(df_taxi_data):
+    '''
+    Reduce the memory usage of TLC taxi trip data by downcasting all columns to compact dtypes.
+    -------------------------------------------------------------------------------------------
+        - PULocationID, DOLocationID                          : int16
+        - fleet                                               : category
+        - pickup_month, _day_of_month, _weekday, _hour, _minute: int8
+        - passenger_count, trip_distance, amounts, trip_duration_minutes: float32
+        - trip_duration (timedelta64[ns]) is replaced by trip_duration_seconds (int32).
+    The memory usage of every column before and after is printed.
+    INPUTS:
+
+    df_taxi_data (Pandas dataframe): This data mus have been preprocessed using preprocess_data() or clean_trip_data().
+                                        temporal_preprocessing() might have been applied as well.
+
+    OUTPUT:
+
+    df_compact (Pandas dataframe): Dataframe with the same rows and compact dtypes.
+    '''
+    bytes_before = df_taxi_data.memory_usage(deep=True, index=False)
+
+    columns = {}
+    # Output column of every input column (only trip_duration is renamed)
+    names = {}
+    for column in df_taxi_data.columns:
+        values = df_taxi_data[column]
+        if column == 'trip_duration' and is_timedelta64_dtype(values):
+            # Whole seconds => The TLC timestamps do not contain fractions of seconds
+            names[column] = 'trip_duration_seconds'
+            columns['trip_duration_seconds'] = _downcast(values.dt.total_seconds(), 'int32')
+        elif column == 'fleet':
+            names[column] = column
+            columns[column] = pd.Categorical(values, categories=FLEETS)
+        elif column in COMPACT_DTYPES and (is_integer_dtype(values) or values.dtype.kind == 'f'):
+            names[column] = column
+            columns[column] = _downcast(values, COMPACT_DTYPES[column])
+        else:
+            names[column] = column
+            columns[column] = values
+    df_compact = pd.DataFrame(columns, index=df_taxi_data.index)
+
+    # Show memory usage of every column
+    bytes_after = df_compact.memory_usage(deep=True, index=False)
+    print('{:<36} {:>14} {:>14}'.format('column', 'bytes before', 'bytes after'))
+    for column in df_taxi_data.columns:
+        label = column if names[column] == column else '{} -> {}'.format(column, names[column])
+        print('{:<36} {:>14,} {:>14,}'.format(label, bytes_before[column], bytes_after[names[column]]))
+    print('{:<36} {:>14,} {:>14,}'.format('total', bytes_before.sum(), bytes_after.sum()))
+    print('The compact data needs about {:.2f}% of the memory.'.format(100*bytes_after.sum()/max(bytes_before.sum(), 1)))
+
+    return df_compact
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pandas as pd
+from calendar import monthrange
+
+from src.load_taxi_data import FLEETS
+from src.parse_tlc_datetime import parse_tlc_datetime
+
+
+def daily_fleet_counts(df_taxi_data, year, month):
+    '''
+    Number of trips per day and fleet of one month, counted with one np.bincount over all trips.
+    --------------------------------------------------------------------------------------------
+    Trips are assigned to the day of their pick-up. Only days of the specified month are counted
+    (trips of other months in the file are ignored) and days without trips are included with count 0.
+    INPUTS:
+
+    df_taxi_data (Pandas dataframe): Trips of one month with columns pickup_datetime and fleet,
+                                        e.g. read_trip_cache(..., columns=['pickup_datetime', 'fleet']).
+    year (int)                     : Year of the month.
+    month (int)                    : 1 ... 12
+
+    OUTPUT:
+
+    df_counts (Pandas dataframe): One row per day of the month (index: date), one column per fleet (yellow, green, fhv).
+    '''
+    year, month = int(year), int(month)
+    days = pd.date_range('{}-{:02d}-01'.format(year, month), periods=monthrange(year, month)[1], freq='D', name='date')
+
+    # Day of the month (0 ... days-1) and fleet (0 ... 2) of every pick-up
+    dates = parse_tlc_datetime(df_taxi_data['pickup_datetime']).to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    day_index = (dates - days[0].to_datetime64().astype('datetime64[D]')).astype(np.int64)
+    fleet_index = pd.Categorical(df_taxi_data['fleet'].astype(str).replace('fhvhv', 'fhv'), categories=FLEETS).codes
+    in_month = ~np.isnat(dates) & (day_index >= 0) & (day_index < len(days)) & (fleet_index >= 0)
+
+    # One pass over the month: count (day, fleet) pairs
+    counts = np.bincount(day_index[in_month] * len(FLEETS) + fleet_index[in_month], minlength=len(days) * len(FLEETS))
+    df_counts = pd.DataFrame(counts.reshape(len(days), len(FLEETS)), index=days, columns=FLEETS)
+    return df_counts
+
+
+def read_daily_fleet_counts(summary_path):
+    '''
+    Read the summary table written by update_daily_fleet_counts() (empty table if it does not exist yet).
+    '''
+    if not os.path.isfile(summary_path):
+        return pd.DataFrame(columns=FLEETS, index=pd.DatetimeIndex([], name='date'), dtype=np.int64)
+    return pd.read_csv(summary_path, index_col='date', parse_dates=['date'])
+
+
+def summary_months(df_counts):
+    '''
+    (year, month) of all months contained in a summary table.
+    '''
+    return set(zip(df_counts.index.year, df_counts.index.month))
+
+
+def write_month_counts(summary_path, df_month_counts, year, month):
+    '''
+    Replace the counts of one month in the summary table on disk by df_month_counts (see daily_fleet_counts()).
+    Returns the updated summary table.
+    '''
+    year, month = int(year), int(month)
+    df_counts = read_daily_fleet_counts(summary_path)
+    # Remove old counts of the month
+    df_counts = df_counts[~((df_counts.index.year == year) & (df_counts.index.month == month))]
+    df_counts = pd.concat([df_counts, df_month_counts]).sort_index()
+    df_counts.index.name = 'date'
+
+    # Write to a temporary file first, so that an interrupted write never destroys the table
+    df_counts.to_csv(summary_path + '.tmp', encoding='utf-8', date_format='%Y-%m-%d')
+    os.replace(summary_path + '.tmp', summary_path)
+    return df_counts
+
+
+def update_daily_fleet_counts(summary_path, df_taxi_data, year, month):
+    '''
+    Add the daily trip counts of one month to the summary table on disk.
+    --------------------------------------------------------------------
+    Only the data of this month is processed. Counts of the month that are already in the table are replaced.
+    INPUTS:
+
+    summary_path (str)             : csv file of the summary table, e.g. '../dat/daily_fleet_counts.csv'.
+    df_taxi_data (Pandas dataframe): Trips of the month (see daily_fleet_counts()).
+    year (int)                     : Year of the month.
+    month (int)                    : 1 ... 12
+
+    OUTPUT:
+
+    df_counts (Pandas dataframe): Updated summary table.
+    '''
+    return write_month_counts(summary_path, daily_fleet_counts(df_taxi_data, year, month), year, month)
@@ -0,0 +1,212 @@
+from contextlib import contextmanager
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+import hashlib
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    import msvcrt
+    fcntl = None
+
+# Default number of retries of a failed download.
+RETRIES = 3
+
+# Size of the blocks that are written to disk and hashed.
+BLOCK_SIZE = 1024 * 1024
+
+
+def is_missing(error):
+    '''
+    True if a failed download means that there is no data (instead of a temporary network problem).
+    '''
+    # S3 answers 403/404 for files that do not exist, 5xx are server errors that are worth a retry.
+    if isinstance(error, HTTPError):
+        return error.code < 500
+    # Local directories (file://) that stand in for a server
+    return isinstance(error, URLError) and isinstance(error.reason, FileNotFoundError)
+
+
+@contextmanager
+def _file_lock(path):
+    '''
+    Exclusive lock on path that is shared between processes and threads.
+    '''
+    with open(path, 'a+b') as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_json(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def _write_json(path, content):
+    # Write to a temporary file first, so that a reader never sees a half written file
+    with open(path + '.tmp', 'w') as file:
+        json.dump(content, file, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def _sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _validators(headers):
+    '''
+    Headers of a response that identify the version of a file on the server.
+    '''
+    return {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+
+
+def _download(url, path_data, path_part):
+    '''
+    Download url to path_data. An existing partial download (path_part) is resumed with an HTTP range
+    request if the server still has the same version of the file. Returns the metadata of the file.
+    '''
+    part = _read_json(path_part + '.json')
+    offset = os.path.getsize(path_part) if (part is not None and os.path.isfile(path_part)) else 0
+
+    request = Request(url)
+    if offset > 0:
+        request.add_header('Range', 'bytes={}-'.format(offset))
+        # Only resume if the file on the server has not changed in the meantime
+        if part['etag'] or part['last_modified']:
+            request.add_header('If-Range', part['etag'] or part['last_modified'])
+
+    try:
+        response = urlopen(request)
+    except HTTPError as error:
+        # 416: The partial download cannot be continued => Start again
+        if error.code != 416:
+            raise
+        os.remove(path_part)
+        return _download(url, path_data, path_part)
+
+    with response:
+        # 206: The server continues the partial download, otherwise the whole file is sent
+        resumed = offset > 0 and getattr(response, 'status', None) == 206
+        if resumed:
+            size = int(response.headers['Content-Range'].rsplit('/', 1)[-1])
+        else:
+            offset = 0
+            size = response.headers.get('Content-Length')
+            size = int(size) if size is not None else None
+            part = dict(_validators(response.headers), url=url)
+            _write_json(path_part + '.json', part)
+
+        with open(path_part, 'ab' if resumed else 'wb') as file:
+            for block in iter(lambda: response.read(BLOCK_SIZE), b''):
+                file.write(block)
+
+    # Validation: The partial download is kept and resumed next time if the file is incomplete.
+    if size is not None and os.path.getsize(path_part) != size:
+        raise URLError('Incomplete download of {}: {} of {} bytes'.format(url, os.path.getsize(path_part), size))
+
+    meta = dict(part, size=os.path.getsize(path_part), sha256=_sha256(path_part), downloaded=time.time())
+    os.replace(path_part, path_data)
+    os.remove(path_part + '.json')
+    return meta
+
+
+def _revalidate(url, meta):
+    '''
+    Conditional GET: True if the cached version of url is still up to date.
+    '''
+    request = Request(url)
+    if meta['etag']:
+        request.add_header('If-None-Match', meta['etag'])
+    if meta['last_modified']:
+        request.add_header('If-Modified-Since', meta['last_modified'])
+    try:
+        with urlopen(request) as response:
+            # The body is not read => A changed file is downloaded again with resume support
+            validators = _validators(response.headers)
+    except HTTPError as error:
+        # 304: Not Modified
+        if error.code == 304:
+            return True
+        raise
+    # Servers that ignore the conditional headers (e.g. file://) answer with the whole file
+    if validators['etag'] is None and validators['last_modified'] is None:
+        return False
+    return validators['etag'] == meta['etag'] and validators['last_modified'] == meta['last_modified']
+
+
+def cached_download(url, cache_dir, revalidate=False, verify=False, retries=RETRIES):
+    '''
+    Download a file through a local cache that is keyed by its URL.
+    ---------------------------------------------------------------
+    For every URL, the cache contains the file and its metadata (ETag, Last-Modified, size and SHA-256).
+    A complete cached file is returned without any network I/O unless revalidate is set.
+    Interrupted downloads are resumed with HTTP range requests and failed downloads are retried
+    with exponential backoff. Several processes may use the same cache at once.
+    INPUTS:
+
+    url (str)        : URL of the file (http(s):// or file://).
+    cache_dir (str)  : Directory of the cache, e.g. '../dat/downloads/'.
+    revalidate (bool): Check with a conditional GET whether the cached file is still up to date.
+    verify (bool)    : Recompute the checksum of a cached file before it is returned.
+    retries (int)    : Number of retries of a failed download.
+
+    OUTPUT:
+
+    path_data (str): Path of the cached file.
+
+    Raises HTTPError/URLError if the download fails (see is_missing() for files that do not exist).
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+    path = os.path.join(cache_dir, key + '-' + url.rsplit('/', 1)[-1])
+    path_data, path_meta, path_part = path, path + '.json', path + '.part'
+
+    with _file_lock(path + '.lock'):
+        meta = _read_json(path_meta)
+        # Validate the cached file
+        if meta is not None and os.path.isfile(path_data) and os.path.getsize(path_data) == meta['size']:
+            if verify and _sha256(path_data) != meta['sha256']:
+                print('WARNING: Cached file {} is corrupted and will be downloaded again.'.format(path_data))
+            elif not revalidate or _revalidate(url, meta):
+                return path_data
+
+        # The metadata is written again after a successful download
+        if meta is not None:
+            os.remove(path_meta)
+        for attempt in range(retries + 1):
+            try:
+                meta = _download(url, path_data, path_part)
+                break
+            except (URLError, OSError) as error:
+                if is_missing(error) or attempt == retries:
+                    raise
+                print('WARNING: Download of {} failed ({}), retrying...'.format(url, error))
+                time.sleep(2**attempt)
+        _write_json(path_meta, meta)
+    return path_data
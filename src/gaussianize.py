@@ -0,0 +1,208 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from scipy import optimize, special
+
+# Transforms of the trip features that make them "more gaussian" (see fig_feature_distributions.py).
+# lambda=None: lambda is estimated by maximum likelihood when the transform is fitted.
+TRIP_FEATURE_TRANSFORMS = {'trip_duration_minutes': {'transform': 'boxcox', 'lambda': -0.42},
+                           'pickup_day_of_month'  : {'transform': 'cbrt_yeojohnson', 'lambda': None}}
+
+TRANSFORMS = ['boxcox', 'yeojohnson', 'cbrt_yeojohnson']
+
+VERSION = 1
+
+
+def _yeojohnson(x, lmbda):
+    '''
+    Yeo-Johnson transform of x (same result as scipy.stats.yeojohnson(x, lmbda)).
+    '''
+    x = np.asarray(x, dtype=float)
+    out = np.empty_like(x)
+    positive = x >= 0
+    if abs(lmbda) < np.spacing(1.):
+        out[positive] = np.log1p(x[positive])
+    else:
+        out[positive] = np.expm1(lmbda * np.log1p(x[positive])) / lmbda
+    if abs(lmbda - 2) > np.spacing(1.):
+        out[~positive] = -np.expm1((2 - lmbda) * np.log1p(-x[~positive])) / (2 - lmbda)
+    else:
+        out[~positive] = -np.log1p(-x[~positive])
+    return out
+
+
+def _inv_yeojohnson(y, lmbda):
+    '''
+    Inverse of _yeojohnson().
+    '''
+    y = np.asarray(y, dtype=float)
+    out = np.empty_like(y)
+    positive = y >= 0
+    if abs(lmbda) < np.spacing(1.):
+        out[positive] = np.expm1(y[positive])
+    else:
+        out[positive] = np.expm1(np.log1p(lmbda * y[positive]) / lmbda)
+    if abs(lmbda - 2) > np.spacing(1.):
+        out[~positive] = -np.expm1(np.log1p(-(2 - lmbda) * y[~positive]) / (2 - lmbda))
+    else:
+        out[~positive] = -np.expm1(-y[~positive])
+    return out
+
+
+def _log_likelihood(transform, lmbda, values, counts):
+    '''
+    Log-likelihood of lambda (as scipy.stats.boxcox_llf/yeojohnson_llf) of values that occur counts times.
+    '''
+    n = counts.sum()
+    if transform == 'boxcox':
+        transformed = special.boxcox(values, lmbda)
+        jacobian = (lmbda - 1) * np.sum(counts * np.log(values))
+    else:
+        transformed = _yeojohnson(values, lmbda)
+        jacobian = (lmbda - 1) * np.sum(counts * np.sign(values) * np.log1p(np.abs(values)))
+    mean = np.sum(counts * transformed) / n
+    variance = np.sum(counts * (transformed - mean)**2) / n
+    return jacobian - n / 2 * np.log(variance)
+
+
+class Gaussianizer:
+    '''
+    Fitted, reusable "Gaussianization" of trip feature columns.
+    -----------------------------------------------------------
+    Every column gets one transform: 'boxcox', 'yeojohnson' or 'cbrt_yeojohnson' (Yeo-Johnson of the cube root).
+    Lambdas that are not fixed are estimated once by maximum likelihood (as scipy.stats.boxcox/yeojohnson do) and
+    then reused for every transform and inverse transform, e.g. for the training and the test set. Columns without
+    transform are returned unchanged. Example:
+
+        gaussianizer = Gaussianizer().fit(df_train)                # or partial_fit() chunk by chunk
+        df_gaussian = gaussianizer.transform(df_test)
+        gaussianizer.save('../dat/gaussianizer.json')
+    '''
+
+    def __init__(self, transforms=TRIP_FEATURE_TRANSFORMS):
+        self.transforms = {}
+        for column, spec in transforms.items():
+            if spec['transform'] not in TRANSFORMS:
+                raise ValueError('Unknown transform {} of column {}, expected one of {}'.format(spec['transform'], column, TRANSFORMS))
+            self.transforms[column] = {'transform': spec['transform'], 'lambda': spec.get('lambda')}
+        # Number of occurrences of every distinct value of the columns whose lambda is estimated
+        self._counts = {}
+
+    def _values(self, column, values):
+        # Input of the power transform
+        values = np.asarray(values, dtype=float)
+        return np.cbrt(values) if self.transforms[column]['transform'] == 'cbrt_yeojohnson' else values
+
+    def _free_columns(self):
+        return [column for column, spec in self.transforms.items() if spec['lambda'] is None or column in self._counts]
+
+    def partial_fit(self, df):
+        '''
+        Count the values of one chunk (e.g. one month) of the columns whose lambda is estimated. The values are
+        counted per distinct value (e.g. days of the month), so memory does not grow with the number of rows.
+        Call fit() without data to estimate lambda from all chunks.
+        '''
+        for column in self._free_columns():
+            values = self._values(column, df[column])
+            values, counts = np.unique(values[np.isfinite(values)], return_counts=True)
+            if column in self._counts:
+                old_values, old_counts = self._counts[column]
+                values, inverse = np.unique(np.concatenate([old_values, values]), return_inverse=True)
+                counts = np.bincount(inverse, weights=np.concatenate([old_counts, counts]))
+            self._counts[column] = (values, counts)
+        return self
+
+    def fit(self, df=None):
+        '''
+        Estimate the lambdas that are not fixed from df (or from all chunks of partial_fit()).
+        '''
+        if df is not None:
+            self._counts = {}
+            self.partial_fit(df)
+        for column in self._free_columns():
+            if column not in self._counts:
+                raise ValueError('There is no data to estimate lambda of column {}'.format(column))
+            values, counts = self._counts[column]
+            transform = 'boxcox' if self.transforms[column]['transform'] == 'boxcox' else 'yeojohnson'
+            # Maximum likelihood estimate as in scipy.stats.boxcox_normmax/yeojohnson_normmax
+            lmbda = optimize.brent(lambda lmbda: -_log_likelihood(transform, lmbda, values, counts), brack=(-2.0, 2.0))
+            self.transforms[column]['lambda'] = float(lmbda)
+        self._counts = {}
+        return self
+
+    def _check_fitted(self):
+        unfitted = [column for column, spec in self.transforms.items() if spec['lambda'] is None]
+        if unfitted:
+            raise ValueError('Lambda of {} has not been estimated, call fit() first'.format(unfitted))
+
+    def transform_column(self, column, values):
+        '''
+        Transform the values of one column (numpy array).
+        '''
+        self._check_fitted()
+        spec = self.transforms[column]
+        if spec['transform'] == 'boxcox':
+            return special.boxcox(np.asarray(values, dtype=float), spec['lambda'])
+        return _yeojohnson(self._values(column, values), spec['lambda'])
+
+    def inverse_transform_column(self, column, values):
+        '''
+        Original values of one column from transformed values (numpy array).
+        '''
+        self._check_fitted()
+        spec = self.transforms[column]
+        if spec['transform'] == 'boxcox':
+            return special.inv_boxcox(np.asarray(values, dtype=float), spec['lambda'])
+        values = _inv_yeojohnson(values, spec['lambda'])
+        return values**3 if spec['transform'] == 'cbrt_yeojohnson' else values
+
+    def _apply(self, df, function):
+        df = df.copy() if isinstance(df, pd.DataFrame) else df.to_frame()
+        for column in self.transforms:
+            if column in df.columns:
+                df[column] = function(column, df[column])
+        return df
+
+    def transform(self, df):
+        '''
+        Copy of df (dataframe, one chunk at a time) with all columns of the transforms transformed.
+        '''
+        return self._apply(df, self.transform_column)
+
+    def inverse_transform(self, df):
+        '''
+        Copy of df with the original values of all transformed columns.
+        '''
+        return self._apply(df, self.inverse_transform_column)
+
+    def transform_regression_data(self, X_test, X_train, y_train):
+        '''
+        Inputs of the regression helpers (transformer=...) with the same transforms for training and prediction.
+        X_test and X_train are dataframes, y_train is transformed as well if it is a series named like a transformed
+        column. Returns X_test, X_train, y_train as numpy arrays and a function that transforms predictions back.
+        '''
+        X_test = self.transform(X_test).to_numpy(dtype=float)
+        X_train = self.transform(X_train).to_numpy(dtype=float)
+        target = getattr(y_train, 'name', None)
+        if target in self.transforms:
+            y_train = self.transform_column(target, y_train)
+            return X_test, X_train, y_train, lambda y_pred: self.inverse_transform_column(target, y_pred)
+        return X_test, X_train, np.asarray(y_train, dtype=float), lambda y_pred: y_pred
+
+    def save(self, path):
+        '''
+        Store the fitted lambdas as json file.
+        '''
+        self._check_fitted()
+        with open(path + '.tmp', 'w') as file:
+            json.dump({'version': VERSION, 'transforms': self.transforms}, file, indent=1)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Read a Gaussianizer stored with save().
+        '''
+        with open(path) as file:
+            return cls(json.load(file)['transforms'])
@@ -1,11 +1,24 @@
-def keep_correct_month(df_taxi_data, month):
+from src.year_month_fields import year_month_fields, combine_by
+
+def correct_month_mask(df_taxi_data, month, by='both'):
+    '''
+    Boolean mask of all rows whose timestamps are in the specified month (see keep_correct_month()).
+    Missing or malformed pick-up times are never in the specified month (see combine_by()).
+    '''
+    # '01' and 1 refer to the same month
+    month = int(month)
+    return combine_by(df_taxi_data, lambda timestamps: year_month_fields(timestamps)[1] == month, by)
+
+def keep_correct_month(df_taxi_data, month, by='both'):
     '''
     Preprocess TLC taxi trip data: Only keep rows that contain the correct month.
     ----------------------------------------------------------------------------
     INPUTS:
     
     df_taxi_data (Pandas dataframe): This data mus have been preprocessed using preprocess_data().
-    month   (str)                   : Month to be kept.
+    month   (str)                   : Month to be kept, e.g. '01' or 1.
+    by      (str)                   : Timestamps that must be in the specified month: 'both' (default), 'either',
+                                        'pickup' or 'dropoff' (boundary semantics: see combine_by()).
     
     OUTPUT:
     
@@ -15,12 +28,8 @@ def keep_correct_month(df_taxi_data, month):
     # Remember initial number of trips.
     n_rows_total = df_taxi_data.shape[0]
     
-    # Convert to string to make string parsing possible.
-    month = "-" + str(month) + "-"
-    
     # Remove wrong month form pick-ups and rop-offs, i.e., only keep those of the specified month.
-    # The or "|" is necessary to include fringe cases on new month's.
-    df_taxi_data = df_taxi_data[df_taxi_data['pickup_datetime'].str.contains(month) & df_taxi_data['dropoff_datetime'].str.contains(month)]
+    df_taxi_data = df_taxi_data[correct_month_mask(df_taxi_data, month, by)]
     
     # Show preprocessing result
     print('About {:.4f}% of the entire data could not be used because they contained the wrong month.'.format(100*(1-df_taxi_data.shape[0]/n_rows_total)))
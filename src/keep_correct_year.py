@@ -1,4 +1,14 @@
-def keep_correct_year(df_taxi_data, year):
+from src.year_month_fields import year_month_fields, combine_by
+
+def correct_year_mask(df_taxi_data, year, by='both'):
+    '''
+    Boolean mask of all rows whose timestamps are in the specified year (see keep_correct_year()).
+    Missing or malformed pick-up times are never in the specified year (see combine_by()).
+    '''
+    year = int(year)
+    return combine_by(df_taxi_data, lambda timestamps: year_month_fields(timestamps)[0] == year, by)
+
+def keep_correct_year(df_taxi_data, year, by='both'):
     '''
     Preprocess TLC taxi trip data: Only keep rows that contain the correct year.
     ----------------------------------------------------------------------------
@@ -6,6 +16,8 @@ def keep_correct_year(df_taxi_data, year):
     
     df_taxi_data (Pandas dataframe): This data mus have been preprocessed using preprocess_data().
     year   (int)                   : Year to be kept.
+    by     (str)                   : Timestamps that must be in the specified year: 'both' (default), 'either',
+                                        'pickup' or 'dropoff' (boundary semantics: see combine_by()).
     
     OUTPUT:
     
@@ -15,12 +27,8 @@ def keep_correct_year(df_taxi_data, year):
     # Remember initial number of trips.
     n_rows_total = df_taxi_data.shape[0]
     
-    # Convert to string to make string parsing possible.
-    year = str(year)
-    
     # Remove wrong years form pick-ups and rop-offs, i.e., only keep those of the specified year.
-    # The or "|" is necessary to include fringe cases on new year's.
-    df_taxi_data = df_taxi_data[df_taxi_data['pickup_datetime'].str.contains(year) | df_taxi_data['dropoff_datetime'].str.contains(year)]
+    df_taxi_data = df_taxi_data[correct_year_mask(df_taxi_data, year, by)]
     
     # Show preprocessing result
     print('About {:.4f}% of the entire data could not be used because they contained the wrong year.'.format(100*(1-df_taxi_data.shape[0]/n_rows_total)))
@@ -1,188 +1,317 @@
-from urllib.error import HTTPError
-import pandas as pd
-
-def load_taxi_data(fleets=['yellow'], years=[2021], months=[1]):
-    '''
-    Load TLC Trip Record Data for New York taxis
-    --------------------------------------------
-    INPUTS:
-    
-    fleets (string[]): 'yellow', 'green', 'fhv'
-                           List of taxi companies whose data will be retrieved.
-                           'fhv' = Uber, Lyft, etc.
-    years (int[])    : 2009...2021
-                           Array containing all years to be retrieved.
-    months (int[])   : 1 ... 12
-                           Array containing the months to be retrieved coded as integers.
-    
-    OUTPUT:
-    
-    df_trips: pandas dataframe with columns features_common (see list below).
-    '''
-    url_prefix = 'https://nyc-tlc.s3.amazonaws.com/trip+data/'
-    
-    # A small subset of features is selected when FHV data is requested.
-    if 'fhv' in fleets:
-        features_common = ['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID', 'fleet']
-        # Empty dataframe
-        df_trips = pd.DataFrame(columns=features_common)
-
-        for fleet in fleets:
-            for year in years:
-                for month in months:
-                    # Create file name
-                    if month < 10:
-                        url_data = fleet + '_tripdata_' + str(year) + '-0' + str(month) + '.csv' # Caution: Leading 0
-                    else:
-                        url_data = fleet + '_tripdata_' + str(year) + '-' + str(month) + '.csv'
-                    # Try to download file
-                    try:
-                        print('Will download... ' + url_data) # DEBUG
-                        df = pd.read_csv(url_prefix + url_data, encoding= 'ISO-8859–1', index_col=False, low_memory=False)
-                        # Make sure that all column names are consistant
-                        df.columns = df.columns.str.lower()
-                        # in old datasets there are coordinates instead of zone id's
-                        if ("pickup_longitude" in df.columns) or ("Pickup_longitude" in df.columns):
-                            # placeholder values
-                            df["PULocationID"] = int("-1")
-                            df["DOLocationID"] = int("-1")
-                        # Rename column
-                        df.rename(columns={'pulocationid':'PULocationID'}, inplace=True)
-                        # Rename column
-                        df.rename(columns={'dolocationid':'DOLocationID'}, inplace=True)
-                    except HTTPError:
-                        print('ERROR: There is no data available for fleet={}, years={}, months={}!'.format(fleet, years, months))
-                        continue
-                    # Set Yellow taxi dataframe columns
-                    if fleet == 'yellow':
-                        # Features that all Yellow fleet data sets have in common
-                        features = ['tpep_pickup_datetime', 'tpep_dropoff_datetime', 'PULocationID', 'DOLocationID']
-                    # Set Green taxi dataframe columns
-                    if fleet == 'green':
-                        # Features that all Green fleet data sets have in common
-                        features = ['lpep_pickup_datetime', 'lpep_dropoff_datetime', 'PULocationID', 'DOLocationID']
-                    # Set FHV(HV) dataframe columns
-                    if fleet == 'fhv' or fleet == 'fhvhv':
-                        # rename fhvhv fleet to fhv
-                        fleet = 'fhv'
-                        if ("pickup_date" in df.columns):
-                            # placeholder values
-                            df["dropoff_datetime"] = int("-1")
-                            df["PULocationID"] = int("-1")
-                            df["DOLocationID"] = int("-1")
-                            # rename column
-                            df = df.rename(columns={"pickup_date": "pickup_datetime"})
-                        # Features that all FHV data sets have in common
-                        features = ['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID']
-                    # Create dataframe => Only use relevant features and drop rest
-                    df.drop(columns=df.columns.difference(features), inplace=True)
-                    # Add column to identify fleet
-                    df['fleet'] = fleet
-                    # Standardize pick-up and drop-off columns for all fleets, i.e., rename them
-                    df.columns = features_common
-                    # Aggregate all dataframes
-                    df_trips = pd.concat([df_trips, df], axis=0)
-        return df_trips
-    # If no FHV: Use large set of features.
-    else:
-        features_common = ['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID', 'passenger_count', 'trip_distance', 'tip_amount', 'total_amount', 'fleet']
-        # Empty dataframe
-        df_trips = pd.DataFrame(columns=features_common)
-        
-        for fleet in fleets:
-            for year in years:
-                for month in months:
-                    # Create file name
-                    if month < 10:
-                        url_data = fleet + '_tripdata_' + str(year) + '-0' + str(month) + '.csv' # Caution: Leading 0
-                    else:
-                        url_data = fleet + '_tripdata_' + str(year) + '-' + str(month) + '.csv'
-                    # Try to download file
-                    try:
-                        print('Will download... ' + url_data)
-                        df = pd.read_csv(url_prefix + url_data, encoding= 'ISO-8859–1', low_memory=False)
-                    except HTTPError:
-                        print('ERROR: There is no data available for fleet={}, years={}, months={}!'.format(fleet, years, months))
-                        continue
-                    # Set Yellow taxi dataframe columns
-                    if fleet == 'yellow':
-                        # Features that all Yellow fleet data sets have in common
-                        features = ['tpep_pickup_datetime', 'tpep_dropoff_datetime', 'PULocationID', 'DOLocationID', 'passenger_count', 'trip_distance', 'tip_amount', 'total_amount']
-                    # Set Green taxi dataframe columns
-                    if fleet == 'green':
-                        # Features that all Green fleet data sets have in common
-                        features = ['lpep_pickup_datetime', 'lpep_dropoff_datetime', 'PULocationID', 'DOLocationID', 'passenger_count', 'trip_distance', 'tip_amount', 'total_amount']
-                    # Create dataframe => Only use relevant features and drop rest
-                    df.drop(columns=df.columns.difference(features), inplace=True)
-                    # Add column to identify fleet
-                    df['fleet'] = fleet
-                    # Standardize pick-up and drop-off columns for all fleets, i.e., rename them
-                    df.columns = features_common
-                    # Aggregate all dataframes
-                    df_trips = pd.concat([df_trips, df], axis=0)
-        return df_trips
-
-    '''
-    Load TLC Trip Record Data for New York taxis
-    --------------------------------------------
-    INPUTS:
-    
-    fleets (string[]): 'yellow', 'green', 'fhv'
-                           List of taxi companies whose data will be retrieved.
-                           'fhv' = Uber, Lyft, etc.
-    years (int[])    : 2009...2021
-                           Array containing all years to be retrieved.
-    months (int[])   : 1 ... 12
-                           Array containing the months to be retrieved coded as integers.
-    
-    OUTPUT:
-    
-    df_trips: pandas dataframe with columns features_common (see list below).
-    '''
-    url_prefix = 'https://nyc-tlc.s3.amazonaws.com/trip+data/'
-    features_common = ['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID', 'fleet']
-    # Empty dataframe
-    df_trips = pd.DataFrame(columns=features_common)
-        
-    for fleet in fleets:
-        for year in years:
-            for month in months:
-                # Create file name
-                if month < 10:
-                    url_data = fleet + '_tripdata_' + str(year) + '-0' + str(month) + '.csv' # Caution: Leading 0
-                else:
-                    url_data = fleet + '_tripdata_' + str(year) + '-' + str(month) + '.csv'
-                # Try to download file
-                try:
-                    print('Will download... ' + url_data) # DEBUG
-                    df = pd.read_csv(url_prefix + url_data, encoding= 'ISO-8859–1', low_memory=False)
-                except HTTPError:
-                    print('ERROR: There is no data available for fleet={}, years={}, months={}!'.format(fleet, years, months))
-                    continue
-                # Set Yellow taxi dataframe columns
-                if fleet == 'yellow':
-                    # Features that all Yellow fleet data sets have in common
-                    features = ['tpep_pickup_datetime', 'tpep_dropoff_datetime', 'PULocationID', 'DOLocationID']
-                # Set Green taxi dataframe columns
-                if fleet == 'green':
-                    # Features that all Green fleet data sets have in common
-                    features = ['lpep_pickup_datetime', 'lpep_dropoff_datetime', 'PULocationID', 'DOLocationID']
-                # Set FHV dataframe columns
-                if fleet == 'fhv':
-                    # Make sure that all column names are consistant
-                    df.columns = df.columns.str.lower()
-                    # Rename column
-                    df.rename(columns={'pulocationid':'PULocationID'}, inplace=True)
-                    # Rename column
-                    df.rename(columns={'dolocationid':'DOLocationID'}, inplace=True)
-                    # Features that all FHV data sets have in common
-                    features = ['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID']
-                # Create dataframe => Only use relevant features and drop rest
-                df.drop(columns=df.columns.difference(features), inplace=True)
-                # Add column to identify fleet
-                df['fleet'] = fleet
-                # Standardize pick-up and drop-off columns for all fleets, i.e., rename them
-                df.columns = features_common
-                # Aggregate all dataframes
-                df_trips = pd.concat([df_trips, df], axis=0)
-    return df_trips
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+from urllib.error import URLError
+from urllib.request import urlopen
+import os
+import shutil
+import tempfile
+import pandas as pd
+
+from src.download_cache import RETRIES, cached_download, is_missing
+from src.parse_tlc_datetime import parse_tlc_datetime
+
+# Location of the TLC Trip Record Data.
+URL_PREFIX = 'https://nyc-tlc.s3.amazonaws.com/trip+data/'
+
+# Columns of the returned dataframe when FHV data is requested (small subset of features).
+FEATURES_COMMON_FHV = ['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID', 'fleet']
+# Columns of the returned dataframe when only Yellow and Green data is requested (large set of features).
+FEATURES_COMMON_TAXI = ['pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID', 'passenger_count', 'trip_distance', 'tip_amount', 'total_amount', 'fleet']
+
+# Pick-up and drop-off columns of the raw files of each fleet.
+DATETIME_COLUMNS = {'yellow': ['tpep_pickup_datetime', 'tpep_dropoff_datetime'],
+                    'green' : ['lpep_pickup_datetime', 'lpep_dropoff_datetime'],
+                    'fhv'   : ['pickup_datetime', 'dropoff_datetime'],
+                    'fhvhv' : ['pickup_datetime', 'dropoff_datetime']}
+
+# Default number of rows per chunk in streaming mode.
+CHUNKSIZE = 1000000
+
+# Categories of the fleet column => fhvhv is counted as fhv
+FLEETS = ['yellow', 'green', 'fhv']
+
+
+def _features_common(fleets, columns=None):
+    '''
+    Columns of the returned dataframe: A small subset of features is selected when FHV data is requested.
+    If columns is given, fare features that are not in columns are not read at all.
+    '''
+    features_common = FEATURES_COMMON_FHV if 'fhv' in fleets or 'fhvhv' in fleets else FEATURES_COMMON_TAXI
+    if columns is None:
+        return features_common
+    # Timestamps, zones and fleet are always kept => The schema relies on their positions
+    return features_common[:4] + [feature for feature in features_common[4:-1] if feature in columns] + ['fleet']
+
+
+def _trip_file_name(fleet, year, month):
+    '''
+    Name of the TLC csv file of one fleet and month, e.g. "yellow_tripdata_2019-01.csv".
+    '''
+    # Caution: Leading 0
+    return '{}_tripdata_{}-{:02d}.csv'.format(fleet, year, int(month))
+
+
+def _raw_columns(fleet, features_common):
+    '''
+    Lower case names of all columns of a raw file that are needed to build features_common.
+    Columns that are only used to detect old file layouts are included as well.
+    '''
+    columns = DATETIME_COLUMNS[fleet] + ['pulocationid', 'dolocationid', 'pickup_longitude', 'pickup_date']
+    # Fare features of Yellow and Green taxis
+    columns += [feature.lower() for feature in features_common[4:-1]]
+    return set(columns)
+
+
+def _normalize_trips(df, fleet, features_common):
+    '''
+    Standardize one raw TLC dataframe (or a chunk of it) to the columns features_common.
+    '''
+    # Make sure that all column names are consistant
+    df.columns = df.columns.str.lower()
+    # In old datasets there are coordinates instead of zone id's
+    if 'pickup_longitude' in df.columns:
+        # placeholder values
+        df['pulocationid'] = -1
+        df['dolocationid'] = -1
+    # Old FHV datasets only contain the pick-up date
+    if fleet in ('fhv', 'fhvhv') and 'pickup_date' in df.columns:
+        # placeholder values => The drop-off time is unknown
+        df['dropoff_datetime'] = pd.NaT
+        df['pulocationid'] = -1
+        df['dolocationid'] = -1
+        # rename column
+        df = df.rename(columns={'pickup_date': 'pickup_datetime'})
+    # Standardize pick-up and drop-off columns for all fleets, i.e., rename them
+    df = df.rename(columns={DATETIME_COLUMNS[fleet][0]: 'pickup_datetime',
+                            DATETIME_COLUMNS[fleet][1]: 'dropoff_datetime',
+                            'pulocationid': 'PULocationID',
+                            'dolocationid': 'DOLocationID'})
+    # Add column to identify fleet => fhvhv is counted as fhv
+    df['fleet'] = 'fhv' if fleet == 'fhvhv' else fleet
+    # Only use relevant features and drop rest
+    return _apply_trip_schema(df[features_common])
+
+
+def _apply_trip_schema(df):
+    '''
+    Convert standardized trip data to the output schema of load_taxi_data():
+    datetime64 timestamps, int16 zone IDs (nullable), float64 fare features and categorical fleet.
+    Values that cannot be converted become NaT/NaN.
+    '''
+    columns = {}
+    for feature in ['pickup_datetime', 'dropoff_datetime']:
+        columns[feature] = parse_tlc_datetime(df[feature])
+    for feature in ['PULocationID', 'DOLocationID']:
+        # Identify all non-numeric and non-integer values and convert them to NaN
+        ids = pd.to_numeric(df[feature], errors='coerce')
+        ids = ids.where((ids % 1 == 0) & (ids.abs() <= 32767))
+        columns[feature] = ids.astype('Int16')
+    for feature in df.columns[4:-1]:
+        columns[feature] = pd.to_numeric(df[feature], errors='coerce').astype('float64')
+    columns['fleet'] = pd.Categorical(df['fleet'], categories=FLEETS)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _read_taxi_file(url, fleet, features_common, chunksize=None):
+    '''
+    Read one TLC csv file (URL or local path) and standardize it. If chunksize is given, the file is
+    streamed and a generator of standardized chunks is returned instead of one dataframe.
+    '''
+    raw_columns = _raw_columns(fleet, features_common)
+    # Only parse the columns that are needed later on
+    usecols = lambda column: column.lower() in raw_columns
+    if chunksize is None:
+        df = pd.read_csv(url, encoding='ISO-8859–1', index_col=False, usecols=usecols, low_memory=False)
+        return _normalize_trips(df, fleet, features_common)
+    return _iter_taxi_file(url, fleet, features_common, chunksize, usecols)
+
+
+def _iter_taxi_file(url, fleet, features_common, chunksize, usecols):
+    # pd.read_csv() would download the whole file into memory first => Stream the response instead.
+    with (urlopen(url) if '://' in url else open(url, 'rb')) as response:
+        for chunk in pd.read_csv(response, encoding='ISO-8859–1', index_col=False, usecols=usecols, chunksize=chunksize):
+            yield _normalize_trips(chunk, fleet, features_common)
+
+
+def _parse_taxi_file(path, fleet, features_common, chunksize):
+    '''
+    Parse one downloaded file in a worker process and return a list of standardized dataframes.
+    '''
+    if chunksize is None:
+        return [_read_taxi_file(path, fleet, features_common)]
+    return list(_read_taxi_file(path, fleet, features_common, chunksize))
+
+
+def _fetch_and_parse(url, fleet, features_common, chunksize, directory, keep, processes, retries):
+    '''
+    Download one file in a thread and parse it in the process pool.
+    Returns None if there is no data available.
+    '''
+    try:
+        path = cached_download(url, directory, retries=retries)
+    except URLError as error:
+        if not is_missing(error):
+            raise
+        return None
+    try:
+        return processes.submit(_parse_taxi_file, path, fleet, features_common, chunksize).result()
+    finally:
+        # Temporary downloads are not needed anymore once they are parsed
+        if not keep:
+            for suffix in ['', '.json']:
+                os.remove(path + suffix)
+
+
+def _load_parallel(jobs, features_common, chunksize, max_workers, retries, cache_dir):
+    '''
+    Fetch files in a thread pool and parse them in a process pool.
+    At most 2*max_workers files are downloaded or parsed at the same time and the results are
+    collected in the order of jobs, so the output does not depend on which download finishes first.
+    Without cache_dir, the files are downloaded to a temporary directory that is removed afterwards.
+    '''
+    frames = []
+    directory = cache_dir if cache_dir is not None else tempfile.mkdtemp(prefix='tlc_')
+    try:
+        with ThreadPoolExecutor(max_workers) as threads, ProcessPoolExecutor(max_workers) as processes:
+            pending = deque()
+            jobs = iter(jobs)
+            while True:
+                # Keep the window of files in flight filled
+                for fleet, url in jobs:
+                    print('Will download... ' + url.rsplit('/', 1)[-1])
+                    pending.append((url, threads.submit(_fetch_and_parse, url, fleet, features_common, chunksize, directory, cache_dir is not None, processes, retries)))
+                    if len(pending) >= 2 * max_workers:
+                        break
+                if not pending:
+                    break
+                # Collect the oldest file first => deterministic order
+                url, future = pending.popleft()
+                result = future.result()
+                if result is None:
+                    print('ERROR: There is no data available for {}!'.format(url))
+                else:
+                    frames.extend(result)
+    finally:
+        if cache_dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+    return frames
+
+
+def _source(url, cache_dir, retries):
+    '''
+    Local path of url in the download cache, or url itself if no cache is used.
+    '''
+    if cache_dir is None:
+        return url
+    return cached_download(url, cache_dir, retries=retries)
+
+
+def iter_taxi_data(fleets=['yellow'], years=[2021], months=[1], chunksize=CHUNKSIZE, url_prefix=URL_PREFIX, cache_dir=None, columns=None):
+    '''
+    Stream TLC Trip Record Data for New York taxis chunk by chunk
+    ------------------------------------------------------------
+    Same as load_taxi_data(), but the files are never held in memory as a whole. Every chunk only
+    contains the needed columns and is already standardized, so peak memory is bounded by chunksize.
+    INPUTS:
+
+    fleets (string[]): 'yellow', 'green', 'fhv', 'fhvhv'
+                           List of taxi companies whose data will be retrieved.
+    years (int[])    : 2009...2021
+                           Array containing all years to be retrieved.
+    months (int[])   : 1 ... 12
+                           Array containing the months to be retrieved coded as integers.
+    chunksize (int)  : Maximum number of rows per chunk.
+    url_prefix (str) : Location of the trip data (see load_taxi_data()).
+    cache_dir (str)  : None (default) or directory of the download cache (see load_taxi_data()).
+    columns (str[])  : None (default) or fare features to read (see load_taxi_data()).
+
+    OUTPUT:
+
+    Generator of pandas dataframes with columns features_common (see load_taxi_data()).
+    '''
+    features_common = _features_common(fleets, columns)
+    for fleet in fleets:
+        for year in years:
+            for month in months:
+                # Create file name
+                url_data = _trip_file_name(fleet, year, month)
+                # Try to download file
+                try:
+                    print('Will download... ' + url_data)
+                    yield from _read_taxi_file(_source(url_prefix + url_data, cache_dir, RETRIES), fleet, features_common, chunksize)
+                except URLError as error:
+                    if not is_missing(error):
+                        raise
+                    print('ERROR: There is no data available for fleet={}, years={}, months={}!'.format(fleet, years, months))
+
+
+def load_taxi_data(fleets=['yellow'], years=[2021], months=[1], chunksize=None, max_workers=None, url_prefix=URL_PREFIX, retries=RETRIES, cache_dir=None, columns=None):
+    '''
+    Load TLC Trip Record Data for New York taxis
+    --------------------------------------------
+    INPUTS:
+
+    fleets (string[]): 'yellow', 'green', 'fhv', 'fhvhv'
+                           List of taxi companies whose data will be retrieved.
+                           'fhv' = Uber, Lyft, etc. 'fhvhv' is stored as 'fhv'.
+    years (int[])    : 2009...2021
+                           Array containing all years to be retrieved.
+    months (int[])   : 1 ... 12
+                           Array containing the months to be retrieved coded as integers.
+    chunksize (int)  : None (default) or number of rows.
+                           If set, every file is streamed in chunks of this size (see iter_taxi_data()),
+                           so that no file has to fit into memory with all of its columns.
+    max_workers (int): None (default) or number of workers.
+                           If set, files are downloaded in a thread pool and parsed in a process pool
+                           of this size. The result is the same as with one worker.
+    url_prefix (str) : Location of the trip data, by default the TLC bucket.
+                           Any URL that urllib can open works, e.g. 'file:///data/tlc/' or 'http://localhost:8000/'.
+    retries (int)    : Number of retries of a failed download (used with max_workers or cache_dir).
+    cache_dir (str)  : None (default) or directory of the download cache, e.g. '../dat/downloads/'.
+                           If set, every file is only downloaded once and read from disk afterwards
+                           (see cached_download()).
+    columns (str[])  : None (default) or columns that are needed. Fare features (passenger_count ... total_amount)
+                           that are not in columns are not parsed. Timestamps, zones and fleet are always returned.
+
+    OUTPUT:
+
+    df_trips: pandas dataframe with columns features_common:
+                  - FHV requested: pickup_datetime, dropoff_datetime, PULocationID, DOLocationID, fleet
+                  - Otherwise    : pickup_datetime, dropoff_datetime, PULocationID, DOLocationID,
+                                   passenger_count, trip_distance, tip_amount, total_amount, fleet
+              Types: pickup_datetime, dropoff_datetime (datetime64[ns], NaT if unknown)
+                     PULocationID, DOLocationID        (Int16, -1 for old files without zones)
+                     passenger_count ... total_amount  (float64)
+                     fleet                             (category: 'yellow', 'green', 'fhv')
+    '''
+    features_common = _features_common(fleets, columns)
+    # Standardized dataframes of all files => Concatenated once at the end, so every row is only copied once
+    frames = []
+
+    if max_workers is not None:
+        jobs = [(fleet, url_prefix + _trip_file_name(fleet, year, month)) for fleet in fleets for year in years for month in months]
+        frames = _load_parallel(jobs, features_common, chunksize, max_workers, retries, cache_dir)
+    else:
+        for fleet in fleets:
+            for year in years:
+                for month in months:
+                    # Create file name
+                    url_data = _trip_file_name(fleet, year, month)
+                    # Try to download file
+                    try:
+                        print('Will download... ' + url_data)
+                        source = _source(url_prefix + url_data, cache_dir, retries)
+                        if chunksize is None:
+                            frames.append(_read_taxi_file(source, fleet, features_common))
+                        else:
+                            frames.extend(_read_taxi_file(source, fleet, features_common, chunksize))
+                    except URLError as error:
+                        if not is_missing(error):
+                            raise
+                        print('ERROR: There is no data available for fleet={}, years={}, months={}!'.format(fleet, years, months))
+                        continue
+    # Empty dataframe with the output schema if no data is available
+    if not frames:
+        return _apply_trip_schema(pd.DataFrame(columns=features_common))
+    # Aggregate all dataframes
+    return pd.concat(frames, axis=0, ignore_index=True)
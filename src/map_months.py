@@ -0,0 +1,79 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows => no memory limit
+    resource = None
+
+
+def _limit_memory(memory_limit):
+    '''
+    Limit the address space of a worker process to memory_limit bytes (MemoryError instead of swapping).
+    '''
+    if memory_limit is not None and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (int(memory_limit), int(memory_limit)))
+
+
+def _call_month(function, year, month):
+    '''
+    Apply function to one month and attach the month to errors of the worker.
+    '''
+    try:
+        return function(year, month)
+    except MemoryError as error:
+        raise MemoryError('{}-{:02d}: the memory limit of the worker was exceeded'.format(int(year), int(month))) from error
+
+
+def map_months(function, months, max_workers=None, memory_limit=None):
+    '''
+    Apply a function to every month, in parallel processes if max_workers is given.
+    -------------------------------------------------------------------------------
+    At most 2*max_workers months are processed or waiting at the same time and the results are
+    returned in the order of months, i.e., they do not depend on which worker finishes first.
+    INPUTS:
+
+    function (func)   : function(year, month) processes one month, e.g. loads, cleans and aggregates it.
+                            It must be defined at module level (it is sent to the workers) and should return
+                            a small result (counts, sums, sketches), which is sent back to this process.
+    months (tuple[])  : (year, month) of all months.
+    max_workers (int) : None (serial in this process) or number of worker processes.
+    memory_limit (int): None or maximum memory of every worker process in bytes (not on Windows).
+                            A worker that exceeds it raises a MemoryError.
+
+    OUTPUT:
+
+    Generator of ((year, month), result) in the order of months.
+    '''
+    if max_workers is None:
+        for year, month in months:
+            yield (year, month), function(year, month)
+        return
+
+    with ProcessPoolExecutor(max_workers, initializer=_limit_memory, initargs=(memory_limit,)) as processes:
+        pending = deque()
+        months = iter(months)
+        while True:
+            # Keep the window of months in flight filled
+            for year, month in months:
+                pending.append(((year, month), processes.submit(_call_month, function, year, month)))
+                if len(pending) >= 2 * max_workers:
+                    break
+            if not pending:
+                break
+            # Collect the oldest month first => deterministic order
+            key, future = pending.popleft()
+            yield key, future.result()
+
+
+def map_reduce_months(function, months, reduce, max_workers=None, memory_limit=None):
+    '''
+    Aggregate months in parallel: map every month with function (see map_months()) and merge the results
+    in the order of months with reduce(total, result). The result is identical to the serial run (max_workers=None).
+    Returns None if there are no months.
+    '''
+    total = None
+    for index, (_, result) in enumerate(map_months(function, months, max_workers, memory_limit)):
+        total = result if index == 0 else reduce(total, result)
+    return total
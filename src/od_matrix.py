@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from src.parse_tlc_datetime import parse_tlc_datetime
+
+# Taxi zones 1 ... 265 (264 and 265 are outside the city)
+N_ZONES = 265
+# Dimensions of an OD matrix: origin, destination, pick-up hour, pick-up weekday (Monday=0, ..., Sunday=6)
+AXES = ['origin', 'destination', 'hour', 'weekday']
+SHAPE = (N_ZONES, N_ZONES, 24, 7)
+
+
+def _trip_values(df_taxi_data, value):
+    '''
+    Values whose mean and variance are accumulated: value column or trip duration in minutes if it is missing.
+    '''
+    if value in df_taxi_data.columns:
+        values = df_taxi_data[value]
+        if values.dtype.kind == 'm':
+            # timedelta => minutes
+            return (values / pd.Timedelta(minutes=1)).to_numpy(dtype=float, na_value=np.nan)
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    trip_duration = parse_tlc_datetime(df_taxi_data['dropoff_datetime']) - parse_tlc_datetime(df_taxi_data['pickup_datetime'])
+    return (trip_duration / pd.Timedelta(minutes=1)).to_numpy(dtype=float, na_value=np.nan)
+
+
+def od_matrix(df_taxi_data, value='trip_duration_minutes'):
+    '''
+    Origin-destination matrix of one month of trips, built in a single pass.
+    -----------------------------------------------------------------------
+    For every route (PULocationID, DOLocationID), pick-up hour and pick-up weekday the number of trips,
+    the sum and the sum of squares of value are accumulated with np.bincount. Matrices of several months
+    can be combined with add_od_matrices(). Use od_summary() to query mean, variance and count.
+    INPUTS:
+
+    df_taxi_data (Pandas dataframe): This data mus have been preprocessed using preprocess_data() or clean_trip_data().
+    value (str)                    : Column to aggregate (numeric or timedelta, which is converted to minutes).
+                                        If the column does not exist, the trip duration in minutes is computed
+                                        from pickup_datetime and dropoff_datetime.
+
+    OUTPUT:
+
+    od (dict): 'count' (int64), 'sum' and 'sumsq' (float64) arrays of shape (265, 265, 24, 7).
+                Index i of the first two axes refers to LocationID i+1.
+    '''
+    values = _trip_values(df_taxi_data, value)
+    origins = pd.to_numeric(df_taxi_data['PULocationID'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    destinations = pd.to_numeric(df_taxi_data['DOLocationID'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+    # Hour and weekday of the pick-up (1970-01-01 was a Thursday)
+    pickup = parse_tlc_datetime(df_taxi_data['pickup_datetime']).to_numpy(dtype='datetime64[ns]')
+    seconds = pickup.astype('datetime64[s]').astype(np.int64)
+    hours = (seconds // 3600) % 24
+    weekdays = (seconds // 86400 + 3) % 7
+
+    # Only trips with known zones, pick-up time and value are counted
+    valid = np.isfinite(values) & (origins >= 1) & (origins <= N_ZONES) & (destinations >= 1) & (destinations <= N_ZONES) & ~np.isnat(pickup)
+    cells = np.ravel_multi_index((origins[valid].astype(np.intp) - 1, destinations[valid].astype(np.intp) - 1, hours[valid], weekdays[valid]), SHAPE)
+    values = values[valid]
+
+    size = int(np.prod(SHAPE))
+    return {'count': np.bincount(cells, minlength=size).reshape(SHAPE),
+            'sum'  : np.bincount(cells, weights=values, minlength=size).reshape(SHAPE),
+            'sumsq': np.bincount(cells, weights=values**2, minlength=size).reshape(SHAPE)}
+
+
+def add_od_matrices(*ods):
+    '''
+    Combine OD matrices (e.g. of several months) by adding their counts, sums and sums of squares.
+    '''
+    return {key: sum(od[key] for od in ods) for key in ['count', 'sum', 'sumsq']}
+
+
+def od_summary(od, origin=None, destination=None, hour=None, weekday=None, by=None):
+    '''
+    Count, mean and variance of the trips of any origin, destination or route.
+    --------------------------------------------------------------------------
+    The selected cells of the OD matrix are summed, so no trip data has to be scanned.
+    INPUTS:
+
+    od (dict)                 : OD matrix of od_matrix() or add_od_matrices().
+    origin, destination (int) : None (all zones), LocationID or list of LocationIDs.
+    hour, weekday (int)       : None (all), hour (0 ... 23)/weekday (0 ... 6) or list of them.
+    by (str or string[])      : None or axes that are not summed: 'origin', 'destination', 'hour', 'weekday'.
+
+    OUTPUT:
+
+    df_summary (Pandas dataframe): Columns count, mean and var (unbiased, NaN for fewer than two trips).
+                                    One row per combination of the values of the axes in by
+                                    (a single row with index 'all' if by is None).
+    '''
+    by = [] if by is None else ([by] if isinstance(by, str) else list(by))
+    for axis in by:
+        if axis not in AXES:
+            raise ValueError('by must contain axes of {}, got {!r}'.format(AXES, axis))
+    # The remaining axes keep their order in the OD matrix
+    by = [axis for axis in AXES if axis in by]
+
+    # Select cells => Zones are shifted to their index
+    selection = []
+    for axis, selected in zip(AXES, [origin, destination, hour, weekday]):
+        if selected is None:
+            selection.append(np.arange(SHAPE[AXES.index(axis)]))
+        else:
+            selected = np.atleast_1d(selected).astype(np.intp)
+            selection.append(selected - 1 if axis in ['origin', 'destination'] else selected)
+    index = np.ix_(*selection)
+
+    # Sum over all axes that are not in by
+    summed = tuple(i for i, axis in enumerate(AXES) if axis not in by)
+    count, total, total_squares = [od[key][index].sum(axis=summed) for key in ['count', 'sum', 'sumsq']]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(count > 0, total / count, np.nan)
+        var = np.where(count > 1, (total_squares - count * mean**2) / (count - 1), np.nan)
+    var = np.maximum(var, 0, where=~np.isnan(var), out=var)
+
+    # Labels of the remaining axes
+    if by:
+        labels = [selection[AXES.index(axis)] + (1 if axis in ['origin', 'destination'] else 0) for axis in by]
+        row_index = pd.MultiIndex.from_product(labels, names=by) if len(by) > 1 else pd.Index(labels[0], name=by[0])
+    else:
+        row_index = pd.Index(['all'])
+    return pd.DataFrame({'count': count.ravel(), 'mean': mean.ravel(), 'var': var.ravel()}, index=row_index)
+
+
+def save_od_matrix(path, od):
+    '''
+    Store an OD matrix as compressed npz file.
+    '''
+    np.savez_compressed(path, **od)
+
+
+def load_od_matrix(path):
+    '''
+    Read an OD matrix stored with save_od_matrix().
+    '''
+    with np.load(path) as data:
+        return {key: data[key] for key in ['count', 'sum', 'sumsq']}
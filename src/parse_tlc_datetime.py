@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+
+# Layout of all timestamps in the TLC files
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Positions of the digits and separators in "YYYY-MM-DD HH:MM:SS"
+_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+_SEPARATORS = {4: '-', 7: '-', 10: ' ', 13: ':', 16: ':'}
+
+# Days of every month in a common year
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def parse_tlc_datetime(timestamps):
+    '''
+    Convert TLC timestamps ("YYYY-MM-DD HH:MM:SS") to datetime64[ns].
+    ------------------------------------------------------------------
+    Same result as pd.to_datetime(timestamps, format='%Y-%m-%d %H:%M:%S', errors='coerce'), but much faster:
+    All strings are read as fixed-width bytes and converted with vectorized integer arithmetic.
+    Only strings that do not follow the fixed-width layout exactly (e.g. "2019-1-5 7:00:00") are passed
+    to pd.to_datetime(). Columns that already contain timestamps are returned unchanged.
+    INPUTS:
+
+    timestamps (Pandas series): pickup_datetime or dropoff_datetime column.
+
+    OUTPUT:
+
+    timestamps (Pandas series): datetime64[ns] series with the same index, NaT for missing or invalid values.
+    '''
+    if is_datetime64_any_dtype(timestamps):
+        return timestamps
+
+    values = timestamps.to_numpy(dtype=object)
+    try:
+        # 20 bytes: A 20th character means that the string is too long
+        raw = values.astype('S20')
+    except (UnicodeEncodeError, TypeError, ValueError):
+        # Non-ASCII content or objects that are not strings
+        return pd.to_datetime(timestamps, format=DATETIME_FORMAT, errors='coerce')
+    # One row of bytes per character position => Every position is contiguous in memory
+    characters = np.ascontiguousarray(raw.view(np.uint8).reshape(-1, 20).T)
+
+    # Check the layout => Bytes below '0' wrap around and are larger than 9 as well
+    digits = characters[_DIGITS] - np.uint8(ord('0'))
+    conforming = (digits <= 9).all(axis=0) & (characters[19] == 0)
+    for position, separator in _SEPARATORS.items():
+        conforming &= characters[position] == ord(separator)
+
+    # Combine the digits to the fields of the timestamps (two digits per field fit into one byte)
+    fields = digits[0::2] * np.uint8(10) + digits[1::2]
+    year = fields[0].astype(np.int32) * 100 + fields[1]
+    month, day, hour, minute, second = [field.astype(np.int32) for field in fields[2:]]
+    # Leap seconds are left to pandas
+    conforming &= second != 60
+
+    # Validate the fields (years outside the range of datetime64[ns] cannot be represented)
+    leap_year = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days_in_month = _DAYS_IN_MONTH[np.clip(month, 1, 12) - 1] + (leap_year & (month == 2))
+    valid = conforming & (year > 1677) & (year < 2262) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= days_in_month) & \
+            (hour < 24) & (minute < 60) & (second < 60)
+
+    # Days since 1970-01-01 (proleptic Gregorian calendar, years start in March to move the leap day to the end)
+    year_march = year - (month <= 2)
+    era = year_march // 400
+    year_of_era = year_march - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    days = era * 146097 + year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year - 719468
+
+    seconds = days.astype(np.int64) * 86400 + (hour * 3600 + minute * 60 + second)
+    result = np.where(valid, seconds * 1000000000, np.iinfo(np.int64).min).view('datetime64[ns]')
+
+    # Strings in another layout are parsed by pandas (missing values stay NaT)
+    fallback = np.flatnonzero(~conforming)
+    fallback = fallback[pd.notna(values[fallback])]
+    if len(fallback) > 0:
+        result[fallback] = pd.to_datetime(pd.Series(values[fallback]), format=DATETIME_FORMAT, errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+    return pd.Series(result, index=timestamps.index, name=timestamps.name)
@@ -1,5 +1,69 @@
 import pandas as pd
 import numpy as np
+from pandas.api.types import is_extension_array_dtype, is_float_dtype, is_object_dtype
+
+def unknown_dropoff_mask(df_taxi_data):
+    '''
+    Boolean mask of the trips of old FHV files (before 2017) that only contain the pick-up date.
+    Their drop-off time is unknown (NaT) and their locations are the placeholder -1 (see load_taxi_data()).
+    '''
+    if not {'dropoff_datetime', 'PULocationID', 'DOLocationID'} <= set(df_taxi_data.columns):
+        return np.zeros(df_taxi_data.shape[0], dtype=bool)
+    mask = np.array(df_taxi_data['dropoff_datetime'].isna(), dtype=bool)
+    for column in ['PULocationID', 'DOLocationID']:
+        mask &= (pd.to_numeric(df_taxi_data[column], errors='coerce') == -1).to_numpy(dtype=bool, na_value=False)
+    if 'fleet' in df_taxi_data.columns:
+        mask &= (df_taxi_data['fleet'] == 'fhv').to_numpy(dtype=bool, na_value=False)
+    return mask
+
+def valid_rows_mask(df_taxi_data):
+    '''
+    Boolean mask of all rows that preprocess_data() keeps, i.e., rows without NaN or infinite values
+    whose locations are numeric and defined (LocationID 0 is an undefined location).
+    The unknown drop-off time of old FHV trips is not treated as missing (see unknown_dropoff_mask()).
+    ------------------------------------------------------------------------------------------------
+    INPUTS:
+    
+    df_taxi_data (Pandas dataframe): This data mus have been loaded using load_taxi_data().
+    
+    OUTPUT:
+    
+    mask (numpy array of bool): True for rows that can be used.
+    '''
+    mask = np.ones(df_taxi_data.shape[0], dtype=bool)
+    unknown_dropoff = unknown_dropoff_mask(df_taxi_data)
+    
+    for column in df_taxi_data.columns.drop('Unnamed: 0', errors='ignore'):
+        values = df_taxi_data[column]
+        if column in ['PULocationID', 'DOLocationID']:
+            # Identify all non-numeric values and treat them as NaN
+            values = pd.to_numeric(values, errors='coerce')
+            # LocationID 0 => This is an undefined location!
+            mask &= (values != 0).to_numpy(dtype=bool, na_value=False)
+        if is_float_dtype(values):
+            # NaN and infinite values
+            valid = np.isfinite(values.to_numpy(dtype=float, na_value=np.nan))
+        elif is_object_dtype(values):
+            valid = values.notna().to_numpy() & ~values.isin([np.inf, -np.inf]).to_numpy()
+        else:
+            valid = values.notna().to_numpy()
+        if column == 'dropoff_datetime':
+            # Old FHV files have no drop-off time at all => These trips are kept
+            valid = valid | unknown_dropoff
+        mask &= valid
+    
+    return mask
+
+def location_ids_to_int(df_taxi_data):
+    '''
+    Some locations are stored as float (or string) but we need discrete int values for later grouping.
+    Nullable integers from load_taxi_data() (Int16) keep their width. The dataframe is modified in place.
+    '''
+    for column in ['PULocationID', 'DOLocationID']:
+        if is_extension_array_dtype(df_taxi_data[column]):
+            df_taxi_data[column] = df_taxi_data[column].astype(df_taxi_data[column].dtype.numpy_dtype)
+        else:
+            df_taxi_data[column] = pd.to_numeric(df_taxi_data[column]).astype(int)
 
 def preprocess_data(df_taxi_data):
     '''
@@ -19,32 +83,11 @@ def preprocess_data(df_taxi_data):
     if 'Unnamed: 0' in df_taxi_data.columns:
         df_taxi_data.drop(columns='Unnamed: 0', inplace=True) # inplace=True modifies the dataframe itself, so no copying is necessary
     
-    # Get names of indexes for which column LocationID has value 0 => This is an undefined location!
-    indexNames = df_taxi_data[ (df_taxi_data['PULocationID'] == 0) | (df_taxi_data['DOLocationID'] == 0) ].index
-    
-    # Delete these row indexes from taxi trip data
-    df_taxi_data.drop(indexNames , inplace=True)
-    
-    '''DEBUG - uncomment for state of preprocessing'''
-    # print('There are {} rows with undefined location (i.e., DOLocationID = 0 or PULocationID = 0).'.format(df_taxi_data[df_taxi_data['DOLocationID'] == 0]
-    
-    # Identify all non-numeric values and convert them to NaN
-    df_taxi_data['PULocationID'] = pd.to_numeric(df_taxi_data['PULocationID'], errors='coerce')
-    df_taxi_data['DOLocationID'] = pd.to_numeric(df_taxi_data['DOLocationID'], errors='coerce')
-    
-    # Replace infinite values with the NaN values
-    df_taxi_data.replace([np.inf, -np.inf], np.nan, inplace=True)
-    
-    # Drop all rows with NaN
-    df_taxi_data.dropna(axis=0, inplace=True)
+    # Drop all rows with NaN, infinite values or undefined locations => One copy of the remaining rows
+    df_taxi_data = df_taxi_data.take(np.flatnonzero(valid_rows_mask(df_taxi_data)))
     
     # Some locations are stored as float but we need discrete int values for later grouping
-    df_taxi_data['PULocationID'] = df_taxi_data['PULocationID'].astype(int)
-    df_taxi_data['DOLocationID'] = df_taxi_data['DOLocationID'].astype(int)
-    
-    # Test: Are any NaN left?
-    '''DEBUG - uncomment for state of preprocessing'''
-    # print('There are {} rows with NaN values left.'.format(df_taxi_data[df_taxi_data['PULocationID'].isnull()].shape[0]))
+    location_ids_to_int(df_taxi_data)
     
     # Show preprocessing result
     print('About {:.4f}% of the entire data could not be used due to missing information (NaN).'.format(100*(1-df_taxi_data.shape[0]/n_rows_total)))
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import time
+
+from src.map_months import map_months
+
+
+def _month_key(year, month):
+    return '{:04d}-{:02d}'.format(int(year), int(month))
+
+
+def inputs_hash(paths):
+    '''
+    Fingerprint of input files from their paths, sizes and modification times (the contents are not read).
+    '''
+    sha256 = hashlib.sha256()
+    for path in sorted(os.path.normpath(path) for path in paths):
+        stat = os.stat(path)
+        sha256.update('{}\0{}\0{}\n'.format(path, stat.st_size, stat.st_mtime_ns).encode('utf-8'))
+    return sha256.hexdigest()
+
+
+def read_month_manifest(manifest_path):
+    '''
+    Read the manifest written by process_months() (empty manifest if it does not exist yet).
+    '''
+    if not os.path.isfile(manifest_path):
+        return {'months': {}}
+    with open(manifest_path) as file:
+        return json.load(file)
+
+
+def _write_month_manifest(manifest_path, manifest):
+    # Write to a temporary file first => The manifest is replaced atomically
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def month_status(manifest, year, month, input_files, version=1):
+    '''
+    State of one month in a manifest of process_months().
+    -----------------------------------------------------
+    INPUTS:
+
+    manifest (dict)      : Manifest of read_month_manifest().
+    year (int)           : Year of the month.
+    month (int)          : 1 ... 12
+    input_files (str[])  : Current input files of the month (empty if they are not available).
+    version (int)        : Version of the processing => Months processed with another version are stale.
+
+    OUTPUT:
+
+    'new'  : The month has not been processed yet.
+    'stale': The inputs, the version or the output of the month have changed since it was processed.
+    'done' : The month is up to date (also if its inputs have been deleted after processing).
+    '''
+    record = manifest['months'].get(_month_key(year, month))
+    if record is None:
+        return 'new'
+    if record['version'] != version or not os.path.exists(record['output']):
+        return 'stale'
+    if input_files and record['inputs_hash'] != inputs_hash(input_files):
+        return 'stale'
+    return 'done'
+
+
+def pending_months(manifest_path, months, input_files, version=1):
+    '''
+    Months (year, month) that are not up to date, i.e., that process_months() would process.
+    input_files(year, month) returns the current input files of a month.
+    '''
+    manifest = read_month_manifest(manifest_path)
+    return [(year, month) for year, month in months
+            if month_status(manifest, year, month, input_files(year, month), version) != 'done']
+
+
+def process_months(manifest_path, months, input_files, process, version=1, commit=None, max_workers=None, memory_limit=None):
+    '''
+    Process months incrementally: skip months that are up to date and checkpoint every processed month.
+    -----------------------------------------------------------------------------------------------------
+    For every processed month the manifest records the fingerprint of its input files (see inputs_hash()),
+    the output artifact and the row counts. The manifest is written after every month, so an interrupted
+    run resumes after the last finished month. Adding a month (or changing the inputs of a month) only
+    processes this month.
+    INPUTS:
+
+    manifest_path (str)  : json file of the manifest, e.g. '../dat/daily_fleet_counts.json'.
+    months (tuple[])     : (year, month) of all months.
+    input_files (func)   : input_files(year, month) returns the input files of a month (empty if they are missing).
+    process (func)       : process(year, month) processes a month and stores its result.
+                            Returns a dict with 'output' (path of the stored result), 'rows_in' and 'rows_out'.
+    version (int)        : Version of process => Increase it to recompute all months after changes of process.
+    commit (func)        : None or commit(year, month, result) stores the result of process(year, month) and returns
+                            the dict described above. Required with max_workers: process then runs in worker
+                            processes (see map_months()) and only returns a partial result, commit runs
+                            in this process in the order of months.
+    max_workers (int)    : None (serial) or number of worker processes.
+    memory_limit (int)   : None or maximum memory of every worker process in bytes.
+
+    OUTPUT:
+
+    manifest (dict): Updated manifest, key 'months' contains one record per processed month ('YYYY-MM').
+    '''
+    if max_workers is not None and commit is None:
+        raise ValueError('process_months() needs commit to store the results of worker processes')
+    manifest = read_month_manifest(manifest_path)
+    n_done, n_processed, missing = 0, 0, []
+    # Fingerprints before processing => Inputs that change during processing make the month stale
+    fingerprints = {}
+    for year, month in months:
+        files = input_files(year, month)
+        if month_status(manifest, year, month, files, version) == 'done':
+            n_done += 1
+        elif not files:
+            missing.append(_month_key(year, month))
+        else:
+            fingerprints[(year, month)] = inputs_hash(files)
+
+    for (year, month), result in map_months(process, list(fingerprints), max_workers, memory_limit):
+        if commit is not None:
+            result = commit(year, month, result)
+        manifest['months'][_month_key(year, month)] = {'version': version,
+                                                       'inputs_hash': fingerprints[(year, month)],
+                                                       'output': result['output'],
+                                                       'rows_in': int(result['rows_in']),
+                                                       'rows_out': int(result['rows_out']),
+                                                       'finished': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        # Checkpoint
+        _write_month_manifest(manifest_path, manifest)
+        n_processed += 1
+
+    print('{} months were up to date, {} months were processed.'.format(n_done, n_processed))
+    if missing:
+        print('The input data of {} months is missing: {}'.format(len(missing), ', '.join(missing)))
+    return manifest
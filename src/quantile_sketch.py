@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+# Default relative accuracy: every quantile is within 1% of the value of the exact quantile
+RELATIVE_ACCURACY = 0.01
+# Absolute values below MIN_VALUE are counted as 0, values above MAX_VALUE as MAX_VALUE
+MIN_VALUE = 1e-2
+MAX_VALUE = 1e6
+
+
+def _layout(relative_accuracy, min_value, max_value):
+    '''
+    Base gamma of the logarithmic buckets and number of buckets per sign.
+    '''
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    n_buckets = int(np.ceil(np.log(max_value / min_value) / np.log(gamma))) + 1
+    return gamma, n_buckets
+
+
+def _as_float(values):
+    '''
+    Values as float64 array (timedelta => minutes, missing values => NaN).
+    '''
+    if isinstance(values, (pd.Series, pd.Index)):
+        if values.dtype.kind == 'm':
+            return (values / pd.Timedelta(minutes=1)).to_numpy(dtype=float, na_value=np.nan)
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    return np.asarray(values, dtype=float)
+
+
+def _buckets(sketch, values):
+    '''
+    Bucket of every value: negative values 0 ... n-1, zero n, positive values n+1 ... 2n.
+    '''
+    gamma, n_buckets = _layout(sketch['relative_accuracy'], sketch['min_value'], sketch['max_value'])
+    magnitudes = np.clip(np.abs(values), sketch['min_value'], sketch['max_value'])
+    with np.errstate(invalid='ignore'):
+        k = np.clip(np.ceil(np.log(magnitudes / sketch['min_value']) / np.log(gamma) - 1e-9), 0, n_buckets - 1)
+    k = np.nan_to_num(k).astype(np.intp)
+    return np.where(np.abs(values) < sketch['min_value'], n_buckets, np.where(values > 0, n_buckets + 1 + k, n_buckets - 1 - k))
+
+
+def _bucket_values(sketch):
+    '''
+    Value that represents every bucket, i.e., that is returned as quantile.
+    '''
+    gamma, n_buckets = _layout(sketch['relative_accuracy'], sketch['min_value'], sketch['max_value'])
+    # Bucket k contains (min_value * gamma^(k-1), min_value * gamma^k] => relative error of 2/(gamma+1) * upper bound <= relative accuracy
+    magnitudes = sketch['min_value'] * gamma**np.arange(n_buckets) * 2 / (gamma + 1)
+    magnitudes[0] = sketch['min_value']
+    return np.concatenate([-magnitudes[::-1], [0], magnitudes])
+
+
+def quantile_sketch(values, cells=None, shape=(), relative_accuracy=RELATIVE_ACCURACY, min_value=MIN_VALUE, max_value=MAX_VALUE):
+    '''
+    Mergeable quantile sketch of values, one per cell (e.g. per hour and weekday), built in a single pass.
+    --------------------------------------------------------------------------------------------------------
+    Values are counted in logarithmic buckets (DDSketch): every quantile returned by sketch_quantile() is within
+    relative_accuracy of the exact quantile, e.g. 30 min +- 0.3 min for 1%. Absolute values below min_value
+    are counted as 0 and values above max_value as max_value. The memory per cell is fixed
+    (1847 buckets for the defaults) and independent of the number of values. Sketches of several months
+    can be combined with merge_sketches().
+    INPUTS:
+
+    values (array or Pandas series): Numeric values, timedeltas are converted to minutes. NaN values are ignored.
+    cells (int array)              : None (one sketch) or flat index of the cell of every value
+                                        (e.g. np.ravel_multi_index((hours, weekdays), (24, 7))).
+    shape (tuple)                  : Shape of the cells, e.g. (24, 7).
+    relative_accuracy (float)      : Relative error of the quantiles, 0 < relative_accuracy < 1.
+    min_value, max_value (float)   : Range of absolute values that are resolved.
+
+    OUTPUT:
+
+    sketch (dict): 'counts' (int64, shape + (buckets,)), 'sum' (float64, shape) and the parameters.
+    '''
+    if not 0 < relative_accuracy < 1:
+        raise ValueError('relative_accuracy must be between 0 and 1, got {}'.format(relative_accuracy))
+    shape = tuple(shape)
+    sketch = {'relative_accuracy': float(relative_accuracy), 'min_value': float(min_value), 'max_value': float(max_value)}
+    n_buckets = 2 * _layout(relative_accuracy, min_value, max_value)[1] + 1
+
+    values = _as_float(values).ravel()
+    cells = np.zeros(len(values), dtype=np.intp) if cells is None else np.asarray(cells, dtype=np.intp).ravel()
+    valid = ~np.isnan(values)
+    values, cells = values[valid], cells[valid]
+
+    # One bincount over (cell, bucket) pairs
+    size = int(np.prod(shape))
+    counts = np.bincount(cells * n_buckets + _buckets(sketch, values), minlength=size * n_buckets)
+    sketch['counts'] = counts.reshape(shape + (n_buckets,))
+    sketch['sum'] = np.bincount(cells, weights=values, minlength=size).reshape(shape)
+    return sketch
+
+
+def merge_sketches(*sketches):
+    '''
+    Combine sketches with the same parameters and shape (e.g. of several months) by adding their counts.
+    '''
+    parameters = ['relative_accuracy', 'min_value', 'max_value']
+    for sketch in sketches[1:]:
+        if [sketch[key] for key in parameters] != [sketches[0][key] for key in parameters] or sketch['counts'].shape != sketches[0]['counts'].shape:
+            raise ValueError('Only sketches with the same parameters and shape can be merged')
+    merged = {key: sketches[0][key] for key in parameters}
+    merged['counts'] = sum(sketch['counts'] for sketch in sketches)
+    merged['sum'] = sum(sketch['sum'] for sketch in sketches)
+    return merged
+
+
+def sketch_count(sketch):
+    '''
+    Number of values of every cell.
+    '''
+    return sketch['counts'].sum(axis=-1)
+
+
+def sketch_mean(sketch):
+    '''
+    Exact mean of the values of every cell (NaN for empty cells).
+    '''
+    count = sketch_count(sketch)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, sketch['sum'] / count, np.nan)
+
+
+def sketch_quantile(sketch, q):
+    '''
+    Quantiles of every cell of a sketch.
+    ------------------------------------
+    The quantile is the value of rank floor(q * (count - 1)), i.e., the lower value if the exact quantile
+    lies between two values (DataFrame.quantile() interpolates linearly between them). The result is within
+    the relative accuracy of this value.
+    INPUTS:
+
+    sketch (dict)      : Sketch of quantile_sketch() or merge_sketches().
+    q (float or list)  : Quantile(s), 0 <= q <= 1.
+
+    OUTPUT:
+
+    quantiles (array): Shape of the cells (+ (len(q),) if q is a list). NaN for empty cells.
+    '''
+    quantiles = np.atleast_1d(np.asarray(q, dtype=float))
+    if ((quantiles < 0) | (quantiles > 1)).any():
+        raise ValueError('Quantiles must be between 0 and 1, got {}'.format(q))
+    cumulative = np.cumsum(sketch['counts'], axis=-1)
+    count = cumulative[..., -1]
+    # Rank of the quantile => first bucket whose cumulative count exceeds it
+    ranks = np.floor(quantiles * np.maximum(count - 1, 0)[..., None])
+    buckets = np.stack([(cumulative <= ranks[..., [i]]).sum(axis=-1) for i in range(len(quantiles))], axis=-1)
+    bucket_values = _bucket_values(sketch)
+    result = np.where(count[..., None] > 0, bucket_values[np.minimum(buckets, len(bucket_values) - 1)], np.nan)
+    return result if np.ndim(q) else result[..., 0]
+
+
+def iqr_bounds(sketch, factor=1.5):
+    '''
+    Outlier bounds Q1 - factor * IQR and Q3 + factor * IQR of every cell.
+    '''
+    q1, q3 = np.moveaxis(sketch_quantile(sketch, [0.25, 0.75]), -1, 0)
+    return q1 - factor * (q3 - q1), q3 + factor * (q3 - q1)
+
+
+def iqr_outlier_mask(sketch, values, cells=None, factor=1.5):
+    '''
+    Outliers of values according to the IQR bounds of their cell.
+    -------------------------------------------------------------
+    Values are compared at the resolution of the sketch (by the value of their bucket), so values
+    within the relative accuracy of a bound are never outliers, e.g. if the IQR of a cell is 0.
+    INPUTS:
+
+    sketch (dict)                  : Sketch of the values (see quantile_sketch()).
+    values (array or Pandas series): Values to test.
+    cells (int array)              : None or flat index of the cell of every value.
+    factor (float)                 : Width of the bounds in IQRs.
+
+    OUTPUT:
+
+    outliers (bool array): True for values outside of the bounds (NaN values are no outliers).
+    '''
+    values = _as_float(values).ravel()
+    lower, upper = [bound.ravel() for bound in iqr_bounds(sketch, factor)]
+    cells = np.zeros(len(values), dtype=np.intp) if cells is None else np.asarray(cells, dtype=np.intp).ravel()
+    rounded = _bucket_values(sketch)[_buckets(sketch, values)]
+    tolerance = sketch['relative_accuracy'] * np.abs(rounded)
+    return ~np.isnan(values) & ((rounded + tolerance < lower[cells]) | (rounded - tolerance > upper[cells]))
+
+
+def save_sketch(path, sketch):
+    '''
+    Store a sketch as compressed npz file.
+    '''
+    np.savez_compressed(path, **sketch)
+
+
+def load_sketch(path):
+    '''
+    Read a sketch stored with save_sketch().
+    '''
+    with np.load(path) as data:
+        sketch = {key: float(data[key]) for key in ['relative_accuracy', 'min_value', 'max_value']}
+        sketch['counts'], sketch['sum'] = data['counts'], data['sum']
+    return sketch
@@ -1,3 +1,14 @@
+def inside_city_mask(df_taxi_data):
+    '''
+    Boolean mask of all rows whose pick-up and drop-off IDs are within the city (see remove_routes()).
+    '''
+    
+    # IDs that refer to locations outside the city.
+    idx_outside = [264, 265]
+    
+    return ((df_taxi_data['PULocationID'] != idx_outside[0]) & (df_taxi_data['DOLocationID'] != idx_outside[0]) & \
+            (df_taxi_data['PULocationID'] != idx_outside[1]) & (df_taxi_data['DOLocationID'] != idx_outside[1])).to_numpy(dtype=bool, na_value=False)
+
 def remove_routes(df_taxi_data):
     '''
     IDs 264 and 265 refer to locations outside the city.
@@ -15,12 +26,8 @@ def remove_routes(df_taxi_data):
     # Remember initial number of trips.
     n_rows_total = df_taxi_data.shape[0]
     
-    # IDs that refer to locations outside the city.
-    idx_outside = [264, 265]
-    
     # Only keep rows that contain trips coming from or going to locations within the city.
-    df_taxi_data = df_taxi_data[(df_taxi_data['PULocationID'] != idx_outside[0]) & (df_taxi_data['DOLocationID'] != idx_outside[0]) & \
-                                (df_taxi_data['PULocationID'] != idx_outside[1]) & (df_taxi_data['DOLocationID'] != idx_outside[1])]
+    df_taxi_data = df_taxi_data[inside_city_mask(df_taxi_data)]
     
     # Show preprocessing result
     print('About {:.4f}% of the entire data could not be used because "PULocationID" or "DOLocationID" are outside the city.'.format(100*(1-df_taxi_data.shape[0]/n_rows_total)))
@@ -0,0 +1,125 @@
+from math import comb
+import numpy as np
+
+from src.streaming_regression import polynomial_features, regression_statistics, merge_regression_statistics, solve_regression
+
+# Default grid of regularization strengths
+ALPHAS = np.logspace(-3, 3, 13)
+
+
+def n_polynomial_features(n_features, deg):
+    '''Number of columns of polynomial_features() (including the offset column) => Basis functions of a lower degree
+       are the leading columns of those of a higher degree.
+    '''
+    return comb(n_features + deg, deg)
+
+
+def _svd_path(P_centered, y_centered, alphas):
+    '''Weights (n_alphas, n_columns) of all alphas and the shrinkage factors s^2/(s^2 + alpha) (n_components, n_alphas)
+       from one SVD of the centered basis functions. Vanishing singular values (e.g. of the offset column) are ignored,
+       which gives the minimum norm solution for alpha=0.
+    '''
+    U, s, Vt = np.linalg.svd(P_centered, full_matrices=False)
+    keep = s > s.max(initial=0) * max(P_centered.shape) * np.finfo(float).eps
+    U, s, Vt = U[:, keep], s[keep], Vt[keep]
+    shrinkage = s[:, None]**2 / (s[:, None]**2 + alphas[None, :])
+    weights = (Vt.T @ (shrinkage / s[:, None] * (U.T @ y_centered)[:, None])).T
+    return weights, U, shrinkage
+
+
+def _loo_mse(U, shrinkage, residuals):
+    '''Exact leave-one-out mean squared error of all alphas from the diagonal of the hat matrix:
+       residual_i / (1 - h_ii), where h_ii = 1/n + sum_j U_ij^2 s_j^2/(s_j^2 + alpha) (unregularized offset).
+    '''
+    hat_diagonal = 1 / len(U) + (U**2) @ shrinkage
+    return np.mean((residuals / (1 - hat_diagonal))**2, axis=0)
+
+
+def _kfold_mse(P_train, y_train, fold_stats, folds, alphas):
+    '''Mean squared error of k-fold cross-validation (consecutive folds as in sklearn's KFold) of all alphas.
+       The statistics of every fold are computed once, the training statistics of a split are merged from them and
+       every alpha only needs a solve of size n_columns.
+    '''
+    squared_errors = np.zeros(len(alphas))
+    for i, fold in enumerate(folds):
+        stats = merge_regression_statistics(*[fold_stats[j] for j in range(len(folds)) if j != i])
+        for a, alpha in enumerate(alphas):
+            weights, offset = solve_regression(stats, alpha)
+            squared_errors[a] += np.sum((P_train[fold] @ weights + offset - y_train[fold])**2)
+    return squared_errors / len(y_train)
+
+
+def _leading_columns(stats, n_columns):
+    '''Statistics of the leading n_columns of the design matrix (basis functions of a lower degree).'''
+    return {'n': stats['n'], 'deg': None, 'mean_x': stats['mean_x'][:n_columns], 'mean_y': stats['mean_y'],
+            'sxx': stats['sxx'][:n_columns, :n_columns], 'sxy': stats['sxy'][:n_columns]}
+
+
+def ridge_path_degrees(X_test, X_train, y_train, degrees=[1, 2, 3], alphas=ALPHAS, cv='loo'):
+    '''Computes ridge_path() for several degrees of basis functions. The basis functions (and the statistics of the
+       folds) are only computed once for the highest degree, those of lower degrees are their leading columns
+       (see n_polynomial_features()).
+
+       Outputs:
+         paths: dict, one result of ridge_path() per degree
+    '''
+    X_train = np.asarray(X_train, dtype=float)
+    X_train = X_train[:, None] if X_train.ndim == 1 else X_train
+    y_train = np.asarray(y_train, dtype=float).ravel()
+    alphas = np.atleast_1d(np.asarray(alphas, dtype=float))
+    P_train_all = polynomial_features(X_train, max(degrees))
+    P_test_all = polynomial_features(X_test, max(degrees))
+    mean_x = P_train_all.mean(axis=0)
+    mean_y = y_train.mean()
+    P_centered_all = P_train_all - mean_x
+    if cv is not None and cv != 'loo':
+        # X^T X of every fold for the highest degree => X^T X of a lower degree is its leading block
+        folds = np.array_split(np.arange(len(y_train)), int(cv))
+        fold_stats_all = [regression_statistics(P_train_all[fold], y_train[fold]) for fold in folds]
+
+    paths = {}
+    for deg in degrees:
+        n_columns = n_polynomial_features(X_train.shape[1], deg)
+        weights, U, shrinkage = _svd_path(P_centered_all[:, :n_columns], y_train - mean_y, alphas)
+        offsets = mean_y - weights @ mean_x[:n_columns]
+        path = {'alphas': alphas, 'weights': weights, 'offsets': offsets,
+                'y_pred': weights @ P_test_all[:, :n_columns].T + offsets[:, None]}
+        if cv == 'loo':
+            residuals = y_train[:, None] - (P_train_all[:, :n_columns] @ weights.T + offsets)
+            path['cv_mse'] = _loo_mse(U, shrinkage, residuals)
+        elif cv is not None:
+            fold_stats = [_leading_columns(stats, n_columns) for stats in fold_stats_all]
+            path['cv_mse'] = _kfold_mse(P_train_all[:, :n_columns], y_train, fold_stats, folds, alphas)
+        if 'cv_mse' in path:
+            path['best_alpha'] = alphas[np.argmin(path['cv_mse'])]
+        paths[deg] = path
+    return paths
+
+
+def ridge_path(X_test, X_train, y_train, deg=2, alphas=ALPHAS, cv='loo'):
+    '''Computes linear regression with basis functions and regularization for a whole grid of regularization
+       strengths and returns weights, testset predictions and the cross-validation error of every alpha.
+       The centered basis functions are decomposed once (SVD), every alpha then only rescales the singular values,
+       so the path costs about as much as a single fit of ridge_regression_bf().
+
+       Inputs:
+         X_test: (n_observations, n_features), numpy array with predictor values of the test set
+         X_train: (n_observations, n_features), numpy array with predictor values of the training set
+         y_train: (n_observations,) numpy array with true target values for the training set
+         deg: int, degree of basis function polynomial
+         alphas: (n_alphas,) numpy array with regularization strengths (0: no regularization)
+         cv: 'loo' (exact leave-one-out error from the hat matrix), int k (k-fold) or None (no cross-validation)
+
+       Outputs:
+         path: dict with
+           'alphas': (n_alphas,) regularization strengths
+           'weights': (n_alphas, n_columns) weight vectors, row i equals the weights of ridge_regression_bf(..., deg, alphas[i])
+           'offsets': (n_alphas,) offsets of the models
+           'y_pred': (n_alphas, n_test_observations) predictions on the TEST set
+           'cv_mse': (n_alphas,) mean squared cross-validation error (not with cv=None)
+           'best_alpha': alpha with the smallest cross-validation error (not with cv=None)
+
+       Note:
+         As in sklearn, the offset is not part of the weights and it is not regularized.
+    '''
+    return ridge_path_degrees(X_test, X_train, y_train, [deg], alphas, cv)[deg]
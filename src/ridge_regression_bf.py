@@ -2,7 +2,7 @@ from sklearn.pipeline import Pipeline
 from sklearn import linear_model
 from sklearn import preprocessing
 
-def ridge_regression_bf(X_test, X_train, y_train, deg=2, alpha=1):
+def ridge_regression_bf(X_test, X_train, y_train, deg=2, alpha=1, transformer=None):
     '''Computes linear regression with basis functions but WITH regularization using the sklearn library
        on the training set and returns weights and testset predictions.
     
@@ -12,6 +12,9 @@ def ridge_regression_bf(X_test, X_train, y_train, deg=2, alpha=1):
          y_train: (n_observations,) numpy array with true target values for the training set
          deg: int, degree of basis function polynomial
          alpha: float, Regularization strength
+         transformer: None or fitted Gaussianizer (see gaussianize.py) that is applied to X_test and X_train
+                      (then dataframes) and to y_train if it is a series named like a transformed column
+                      (then y_pred is transformed back)
          
        Outputs:
          weights: The weight vector for the regerssion model including the offset
@@ -21,6 +24,10 @@ def ridge_regression_bf(X_test, X_train, y_train, deg=2, alpha=1):
          The sklearn library automatically takes care of adding a column for the offset.
     '''
     
+    # Same transforms for training and prediction
+    if transformer is not None:
+        X_test, X_train, y_train, inverse_transform = transformer.transform_regression_data(X_test, X_train, y_train)
+    
     # Set up pipiline
     model = Pipeline([('poly', preprocessing.PolynomialFeatures(degree=deg)),
                       ('linear', linear_model.Ridge(alpha))])
@@ -33,5 +40,7 @@ def ridge_regression_bf(X_test, X_train, y_train, deg=2, alpha=1):
     
     # Make prediction using the trained model
     y_pred = model.predict(X_test)
+    if transformer is not None:
+        y_pred = inverse_transform(y_pred)
     
     return weights, y_pred
\ No newline at end of file
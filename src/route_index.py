@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+from src.parse_tlc_datetime import parse_tlc_datetime
+from src.trip_store import column_to_numpy
+
+# LocationIDs 0 ... 265 => Key of a route: PULocationID * N_LOCATIONS + DOLocationID
+N_LOCATIONS = 266
+
+# Version of the layout of the index
+VERSION = 1
+
+
+def _month_path(index_path, year, month):
+    return os.path.join(index_path, '{:04d}-{:02d}'.format(int(year), int(month)))
+
+
+def has_route_index(index_path, year, month):
+    '''
+    Check if the route index of one month has been built with build_route_index().
+    '''
+    return os.path.isfile(os.path.join(_month_path(index_path, year, month), 'manifest.json'))
+
+
+def build_route_index(df_taxi_data, index_path, year, month):
+    '''
+    Store the trips of one month sorted by route and pick-up time, so that single routes can be read instantly.
+    -------------------------------------------------------------------------------------------------------------
+    Every column is written as .npy file in the order (PULocationID, DOLocationID, pickup_datetime).
+    offsets.npy contains the first row of every route, i.e., the trips of a route are one contiguous slice
+    (see read_route()). Existing data of the month is replaced.
+    INPUTS:
+
+    df_taxi_data (Pandas dataframe): This data mus have been preprocessed using preprocess_data() or clean_trip_data().
+    index_path (str)               : Root directory of the index, e.g. '../dat/routes/'.
+    year (int)                     : Year of the month.
+    month (int)                    : 1 ... 12
+
+    OUTPUT:
+
+    None
+    '''
+    os.makedirs(index_path, exist_ok=True)
+    pickup = parse_tlc_datetime(df_taxi_data['pickup_datetime']).to_numpy(dtype='datetime64[ns]')
+    origins = df_taxi_data['PULocationID'].to_numpy(dtype=np.int64)
+    destinations = df_taxi_data['DOLocationID'].to_numpy(dtype=np.int64)
+    if len(origins) > 0 and (min(origins.min(), destinations.min()) < 0 or max(origins.max(), destinations.max()) >= N_LOCATIONS):
+        raise ValueError('LocationIDs must be between 0 and {}'.format(N_LOCATIONS - 1))
+
+    # Sort by route and pick-up time (lexsort: last key is the primary key)
+    order = np.lexsort((pickup, destinations, origins))
+    routes = origins[order] * N_LOCATIONS + destinations[order]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(routes, minlength=N_LOCATIONS**2))]).astype(np.int64)
+
+    # Write to a temporary directory first, so that an interrupted build never leaves a half written month behind
+    directory = tempfile.mkdtemp(prefix='.tmp_', dir=index_path)
+    try:
+        columns = []
+        for column in df_taxi_data.columns:
+            if column == 'pickup_datetime':
+                values, categories = pickup, None
+            else:
+                values, categories = column_to_numpy(df_taxi_data[column])
+            np.save(os.path.join(directory, column + '.npy'), values[order])
+            columns.append({'name': column, 'dtype': str(values.dtype), 'categories': categories})
+        np.save(os.path.join(directory, 'offsets.npy'), offsets)
+        manifest = {'version': VERSION, 'year': int(year), 'month': int(month), 'n_rows': int(len(order)), 'columns': columns}
+        with open(os.path.join(directory, 'manifest.json'), 'w') as file:
+            json.dump(manifest, file, indent=1)
+
+        # Replace old data of the month
+        target = _month_path(index_path, year, month)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(directory, target)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def read_route(index_path, year, month, pickup_id, dropoff_id, start=None, end=None, columns=None):
+    '''
+    Read the trips of one route from the route index of one month.
+    --------------------------------------------------------------
+    The column files are memory-mapped and only the slice of the route is read. A time range is found
+    by binary search on the pick-up times within the route.
+    INPUTS:
+
+    index_path (str)   : Root directory of the index.
+    year (int)         : Year of the month.
+    month (int)        : 1 ... 12
+    pickup_id (int)    : PULocationID of the route.
+    dropoff_id (int)   : DOLocationID of the route.
+    start, end (str)   : None or pick-up time range [start, end), e.g. '2019-01-07', '2019-01-14 06:00'.
+    columns (string[]) : None (all) or columns to read.
+
+    OUTPUT:
+
+    df_route (Pandas dataframe): Trips of the route sorted by pick-up time.
+    '''
+    path = _month_path(index_path, year, month)
+    with open(os.path.join(path, 'manifest.json')) as file:
+        manifest = json.load(file)
+    offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+
+    route = int(pickup_id) * N_LOCATIONS + int(dropoff_id)
+    first, last = int(offsets[route]), int(offsets[route + 1])
+
+    # Binary search of the time range => The trips of a route are sorted by pick-up time
+    if start is not None or end is not None:
+        pickup = np.load(os.path.join(path, 'pickup_datetime.npy'), mmap_mode='r')[first:last]
+        lower = 0 if start is None else int(np.searchsorted(pickup, pd.Timestamp(start).to_datetime64(), side='left'))
+        upper = len(pickup) if end is None else int(np.searchsorted(pickup, pd.Timestamp(end).to_datetime64(), side='left'))
+        first, last = first + lower, first + max(lower, upper)
+
+    df_route = {}
+    for column in manifest['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        values = np.array(np.load(os.path.join(path, column['name'] + '.npy'), mmap_mode='r')[first:last])
+        if column['categories'] is not None:
+            values = pd.Categorical.from_codes(values, categories=column['categories'])
+        df_route[column['name']] = values
+    return pd.DataFrame(df_route)
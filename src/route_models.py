@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+
+from src.od_matrix import N_ZONES
+from src.streaming_regression import polynomial_features, polynomial_feature_names
+
+
+def _route_codes(df_taxi_data):
+    '''
+    Route of every trip as one integer (PULocationID-1)*265 + (DOLocationID-1), -1 for unknown zones.
+    '''
+    origins = pd.to_numeric(df_taxi_data['PULocationID'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    destinations = pd.to_numeric(df_taxi_data['DOLocationID'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    valid = (origins >= 1) & (origins <= N_ZONES) & (destinations >= 1) & (destinations <= N_ZONES)
+    return np.where(valid, (np.nan_to_num(origins) - 1) * N_ZONES + np.nan_to_num(destinations) - 1, -1).astype(np.int64)
+
+
+def _design(df_taxi_data, features, deg):
+    '''
+    Predictors of features as float array, with polynomial basis functions if deg is given.
+    '''
+    X = np.column_stack([df_taxi_data[feature].to_numpy(dtype=float, na_value=np.nan) for feature in features])
+    return X if deg is None else polynomial_features(X, deg)
+
+
+def route_regression_statistics(df_taxi_data, features, target='trip_duration_minutes', deg=None):
+    '''
+    Sufficient statistics of a linear regression per route, computed for all routes at once.
+    -----------------------------------------------------------------------------------------
+    Every entry of the centered X^T X and X^T y of all routes is accumulated with one np.bincount over the trips,
+    so there is no loop over routes. Statistics of several chunks or months are combined with
+    merge_route_statistics(), the models are solved with solve_route_models().
+    INPUTS:
+
+    df_taxi_data (Pandas dataframe): Trips with PULocationID, DOLocationID, the features and the target,
+                                        e.g. after clean_trip_data() and temporal_preprocessing().
+    features (string[])            : Predictor columns, e.g. ['pickup_hour', 'pickup_weekday'].
+    target (str)                   : Target column.
+    deg (int)                      : None (features as they are, see sklearn_regression())
+                                        or degree of the basis functions (see sklearn_regression_bf()).
+
+    OUTPUT:
+
+    stats (dict): 'routes' (codes of the routes, see _route_codes()), 'n' (trips per route), 'mean_x', 'mean_y',
+                    'sxx' (n_routes, n_columns, n_columns), 'sxy' (n_routes, n_columns), 'deg' and 'features'.
+    '''
+    X = _design(df_taxi_data, features, deg)
+    y = df_taxi_data[target].to_numpy(dtype=float, na_value=np.nan)
+    codes = _route_codes(df_taxi_data)
+
+    # Only trips with known route, features and target
+    valid = (codes >= 0) & np.isfinite(y) & np.isfinite(X).all(axis=1)
+    routes, index = np.unique(codes[valid], return_inverse=True)
+    X, y = X[valid], y[valid]
+    n_routes, n_columns = len(routes), X.shape[1]
+
+    # Means per route => center every trip by the means of its route
+    n = np.bincount(index, minlength=n_routes)
+    mean_x = np.column_stack([np.bincount(index, weights=X[:, j], minlength=n_routes) for j in range(n_columns)]) / n[:, None] if n_routes else np.zeros((0, n_columns))
+    mean_y = np.bincount(index, weights=y, minlength=n_routes) / np.maximum(n, 1)
+    X = X - mean_x[index]
+    y = y - mean_y[index]
+
+    # Upper triangle of the centered X^T X and X^T y of all routes
+    sxx = np.zeros((n_routes, n_columns, n_columns))
+    sxy = np.zeros((n_routes, n_columns))
+    for j in range(n_columns):
+        sxy[:, j] = np.bincount(index, weights=X[:, j] * y, minlength=n_routes)
+        for k in range(j, n_columns):
+            sxx[:, j, k] = sxx[:, k, j] = np.bincount(index, weights=X[:, j] * X[:, k], minlength=n_routes)
+    return {'routes': routes, 'n': n, 'mean_x': mean_x, 'mean_y': mean_y, 'sxx': sxx, 'sxy': sxy,
+            'deg': deg, 'features': list(features)}
+
+
+def merge_route_statistics(*stats):
+    '''
+    Combine route statistics of several chunks or months (pairwise update of Chan et al., vectorized over the routes).
+    '''
+    merged = stats[0]
+    for other in stats[1:]:
+        if merged['deg'] != other['deg'] or merged['features'] != other['features']:
+            raise ValueError('Route statistics with different features or basis functions cannot be merged')
+        routes = np.union1d(merged['routes'], other['routes'])
+        # Statistics of both on the union of routes (zero for routes without trips)
+        aligned = []
+        for part in [merged, other]:
+            position = np.searchsorted(routes, part['routes'])
+            full = {}
+            for key in ['n', 'mean_x', 'mean_y', 'sxx', 'sxy']:
+                full[key] = np.zeros((len(routes),) + part[key].shape[1:], dtype=part[key].dtype)
+                full[key][position] = part[key]
+            aligned.append(full)
+        a, b = aligned
+
+        n = a['n'] + b['n']
+        weight = b['n'] / n
+        factor = a['n'] * b['n'] / n
+        delta_x = b['mean_x'] - a['mean_x']
+        delta_y = b['mean_y'] - a['mean_y']
+        merged = {'routes': routes, 'n': n,
+                  'mean_x': a['mean_x'] + delta_x * weight[:, None],
+                  'mean_y': a['mean_y'] + delta_y * weight,
+                  'sxx': a['sxx'] + b['sxx'] + factor[:, None, None] * delta_x[:, :, None] * delta_x[:, None, :],
+                  'sxy': a['sxy'] + b['sxy'] + factor[:, None] * delta_x * delta_y[:, None],
+                  'deg': merged['deg'], 'features': merged['features']}
+    return merged
+
+
+def solve_route_models(stats, alpha=0, min_trips=None):
+    '''
+    Weight table of the models of all routes from route statistics (one batched solve, see fit_route_models()).
+    '''
+    if min_trips is None:
+        # More trips than weights and offset => Otherwise the model interpolates the trips (and its weights are not unique)
+        min_trips = stats['sxx'].shape[-1] + 2
+    keep = stats['n'] >= min_trips
+    sxx, sxy = stats['sxx'][keep], stats['sxy'][keep]
+
+    # D X^T X D with D = 1/sqrt(diag(X^T X)) per route (see solve_regression()), columns without variance get weight 0
+    variance = np.diagonal(sxx, axis1=1, axis2=2)
+    active = variance > 0
+    scale = np.where(active, 1 / np.sqrt(np.where(active, variance, 1)), 0)
+    sxx_scaled = sxx * scale[:, :, None] * scale[:, None, :]
+    sxy_scaled = sxy * scale
+    if alpha > 0:
+        # Ridge: (X^T X + alpha I) w = X^T y with w = D v, the offset is not regularized
+        # (1 on the diagonal of columns without variance => their weight is 0)
+        diagonal = np.where(active, alpha * scale**2, 1)
+        weights_scaled = np.linalg.solve(sxx_scaled + diagonal[:, :, None] * np.eye(sxx.shape[-1]), sxy_scaled[:, :, None])[:, :, 0]
+    elif len(sxx):
+        # OLS: eigenvalues below the relative tolerance of every route are dropped (minimum norm solution)
+        eigenvalues, eigenvectors = np.linalg.eigh(sxx_scaled)
+        tolerance = active.sum(axis=1) * np.finfo(float).eps * eigenvalues.max(axis=1)
+        keep_eigen = eigenvalues > tolerance[:, None]
+        inverse = np.divide(1, eigenvalues, out=np.zeros_like(eigenvalues), where=keep_eigen)
+        weights_scaled = np.einsum('rij,rj->ri', eigenvectors, np.einsum('rji,rj->ri', eigenvectors, sxy_scaled) * inverse)
+    else:
+        weights_scaled = np.zeros(sxy.shape)
+    weights = weights_scaled * scale
+    offsets = stats['mean_y'][keep] - np.einsum('ij,ij->i', stats['mean_x'][keep], weights)
+
+    routes = stats['routes'][keep]
+    index = pd.MultiIndex.from_arrays([routes // N_ZONES + 1, routes % N_ZONES + 1], names=['PULocationID', 'DOLocationID'])
+    names = stats['features'] if stats['deg'] is None else polynomial_feature_names(stats['features'], stats['deg'])
+    df_models = pd.DataFrame(weights, index=index, columns=names)
+    df_models.insert(0, 'offset', offsets)
+    df_models.insert(0, 'n_trips', stats['n'][keep])
+    return df_models
+
+
+def fit_route_models(frames, features, target='trip_duration_minutes', deg=None, alpha=0, min_trips=None):
+    '''
+    Fit one linear regression model per route (PULocationID, DOLocationID) for all routes at once.
+    -----------------------------------------------------------------------------------------------
+    The statistics of all routes are accumulated with np.bincount (see route_regression_statistics()) and all
+    small least-squares problems are solved in one batched numpy call. The model of a route has the same weights as
+    sklearn_regression() (deg=None), sklearn_regression_bf() (alpha=0) or ridge_regression_bf() fitted to the trips
+    of this route only. frames can be a generator of months, only the statistics of all routes are kept.
+    INPUTS:
+
+    frames (Pandas dataframe or iterable): One dataframe or iterable of dataframes of trips (see route_regression_statistics()).
+    features (string[])                  : Predictor columns, e.g. ['pickup_hour', 'pickup_weekday'].
+    target (str)                         : Target column.
+    deg (int)                            : None (no basis functions) or degree of the basis function polynomial.
+    alpha (float)                        : Regularization strength (0: no regularization).
+    min_trips (int)                      : Routes with fewer trips get no model. By default the number of columns of the
+                                            design matrix + 2, i.e., every model is fitted to more trips than it has weights.
+
+    OUTPUT:
+
+    df_models (Pandas dataframe): One row per route (index: PULocationID, DOLocationID), columns n_trips, offset and
+                                    one weight per column of the design matrix (features or basis functions as named
+                                    by sklearn, e.g. '1', 'pickup_hour', 'pickup_hour^2', 'pickup_hour pickup_weekday').
+    '''
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    stats = None
+    for df_taxi_data in frames:
+        # Merge immediately => frames of previous months can be freed
+        chunk_stats = route_regression_statistics(df_taxi_data, features, target, deg)
+        stats = chunk_stats if stats is None else merge_route_statistics(stats, chunk_stats)
+    if stats is None:
+        raise ValueError('There are no trips to fit the route models to')
+    return solve_route_models(stats, alpha, min_trips)
+
+
+def predict_route_models(df_models, df_taxi_data, features, deg=None):
+    '''
+    Predictions of the models of fit_route_models() for trips (NaN for routes without model).
+    '''
+    # Row of the model of every route (-1: no model)
+    model_codes = (df_models.index.get_level_values('PULocationID').to_numpy(dtype=np.int64) - 1) * N_ZONES + \
+                  (df_models.index.get_level_values('DOLocationID').to_numpy(dtype=np.int64) - 1)
+    lookup = np.full(N_ZONES * N_ZONES, -1)
+    lookup[model_codes] = np.arange(len(model_codes))
+    codes = _route_codes(df_taxi_data)
+    rows = np.where(codes >= 0, lookup[np.maximum(codes, 0)], -1)
+    found = rows >= 0
+
+    X = _design(df_taxi_data, features, deg)
+    weights = df_models.iloc[:, 2:].to_numpy(dtype=float)
+    offsets = df_models['offset'].to_numpy(dtype=float)
+    y_pred = np.full(len(df_taxi_data), np.nan)
+    y_pred[found] = np.einsum('ij,ij->i', X[found], weights[rows[found]]) + offsets[rows[found]]
+    return y_pred
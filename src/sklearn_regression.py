@@ -1,6 +1,6 @@
 from sklearn import linear_model
 
-def sklearn_regression(X_test, X_train, y_train):
+def sklearn_regression(X_test, X_train, y_train, transformer=None):
     '''Computes OLS weights for linear regression without regularization using the sklearn library on the training set and 
        returns weights and testset predictions.
     
@@ -8,6 +8,9 @@ def sklearn_regression(X_test, X_train, y_train):
          X_test: (n_observations, n_features), numpy array with predictor values of the test set 
          X_train: (n_observations, n_features), numpy array with predictor values of the training set
          y_train: (n_observations,) numpy array with true target values for the training set
+         transformer: None or fitted Gaussianizer (see gaussianize.py) that is applied to X_test and X_train
+                      (then dataframes) and to y_train if it is a series named like a transformed column
+                      (then y_pred is transformed back)
          
        Outputs:
          weights: The weight vector for the regerssion model including the offset
@@ -19,6 +22,10 @@ def sklearn_regression(X_test, X_train, y_train):
     
     '''
     
+    # Same transforms for training and prediction
+    if transformer is not None:
+        X_test, X_train, y_train, inverse_transform = transformer.transform_regression_data(X_test, X_train, y_train)
+    
     # Instantiate LinearRegression object
     lm = linear_model.LinearRegression()
     # Fit linear model to the training data
@@ -29,5 +36,7 @@ def sklearn_regression(X_test, X_train, y_train):
     
     # Make prediction using the trained model
     y_pred = lm.predict(X_test)
+    if transformer is not None:
+        y_pred = inverse_transform(y_pred)
     
     return weights, y_pred
@@ -2,7 +2,7 @@ from sklearn.pipeline import Pipeline
 from sklearn import linear_model
 from sklearn import preprocessing
 
-def sklearn_regression_bf(X_test, X_train, y_train, deg=2):
+def sklearn_regression_bf(X_test, X_train, y_train, deg=2, transformer=None):
     '''Computes linear regression with basis functions but without regularization using the sklearn library
        on the training set and returns weights and testset predictions.
     
@@ -11,6 +11,9 @@ def sklearn_regression_bf(X_test, X_train, y_train, deg=2):
          X_train: (n_observations, n_features), numpy array with predictor values of the training set
          y_train: (n_observations,) numpy array with true target values for the training set
          deg: int, degree of basis function polynomial
+         transformer: None or fitted Gaussianizer (see gaussianize.py) that is applied to X_test and X_train
+                      (then dataframes) and to y_train if it is a series named like a transformed column
+                      (then y_pred is transformed back)
          
        Outputs:
          weights: The weight vector for the regerssion model including the offset
@@ -20,6 +23,10 @@ def sklearn_regression_bf(X_test, X_train, y_train, deg=2):
          The sklearn library automatically takes care of adding a column for the offset.
     '''
     
+    # Same transforms for training and prediction
+    if transformer is not None:
+        X_test, X_train, y_train, inverse_transform = transformer.transform_regression_data(X_test, X_train, y_train)
+    
     # Set up pipiline
     model = Pipeline([('poly', preprocessing.PolynomialFeatures(degree=deg)),
                       ('linear', linear_model.LinearRegression())])
@@ -32,5 +39,7 @@ def sklearn_regression_bf(X_test, X_train, y_train, deg=2):
     
     # Make prediction using the trained model
     y_pred = model.predict(X_test)
+    if transformer is not None:
+        y_pred = inverse_transform(y_pred)
     
     return weights, y_pred
@@ -0,0 +1,164 @@
+from itertools import combinations_with_replacement
+import numpy as np
+
+def polynomial_features(X, deg):
+    '''Polynomial basis functions of X with the same columns (and order) as sklearn's PolynomialFeatures(degree=deg):
+       the offset column of ones, all features, all products of two features, ... up to degree deg.
+    '''
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 1:
+        X = X[:, None]
+    columns = [np.ones(len(X))]
+    for d in range(1, deg + 1):
+        for combination in combinations_with_replacement(range(X.shape[1]), d):
+            columns.append(np.prod(X[:, combination], axis=1))
+    return np.column_stack(columns)
+
+
+def polynomial_feature_names(features, deg):
+    '''Names of the columns of polynomial_features() as in sklearn, e.g. ['1', 'a', 'b', 'a^2', 'a b', 'b^2'].'''
+    names = ['1']
+    for d in range(1, deg + 1):
+        for combination in combinations_with_replacement(range(len(features)), d):
+            powers = [(features[i], combination.count(i)) for i in sorted(set(combination))]
+            names.append(' '.join(name if power == 1 else '{}^{}'.format(name, power) for name, power in powers))
+    return names
+
+
+def _design_matrix(X, deg):
+    '''X itself (deg=None) or its polynomial basis functions as float array of shape (n_observations, n_columns).'''
+    if deg is not None:
+        return polynomial_features(X, deg)
+    X = np.asarray(X, dtype=float)
+    return X[:, None] if X.ndim == 1 else X
+
+
+def regression_statistics(X, y, deg=None):
+    '''Sufficient statistics of linear regression of one chunk of observations: number of observations, means of the
+       columns of the design matrix and of y, and the centered scatter matrices X^T X and X^T y.
+       Centering keeps the statistics accurate and makes the offset unregularized, as in sklearn.
+
+       Inputs:
+         X: (n_observations, n_features), numpy array with predictor values
+         y: (n_observations,) numpy array with target values
+         deg: None (features as they are) or int, degree of the basis function polynomial (applied to this chunk only)
+
+       Outputs:
+         stats: dict with 'n', 'deg', 'mean_x', 'mean_y', 'sxx' (n_columns, n_columns) and 'sxy' (n_columns,)
+    '''
+    X = _design_matrix(X, deg)
+    y = np.asarray(y, dtype=float).ravel()
+    n = len(y)
+    mean_x = X.mean(axis=0) if n > 0 else np.zeros(X.shape[1])
+    mean_y = y.mean() if n > 0 else 0.0
+    X_centered = X - mean_x
+    return {'n': n, 'deg': deg, 'mean_x': mean_x, 'mean_y': mean_y,
+            'sxx': X_centered.T @ X_centered, 'sxy': X_centered.T @ (y - mean_y)}
+
+
+def merge_regression_statistics(*stats):
+    '''Combine the statistics of several chunks (e.g. months) as if they had been computed on all observations at once.
+       The scatter matrices are merged with the pairwise update of Chan et al., i.e., without cancellation of large sums.
+    '''
+    merged = stats[0]
+    for other in stats[1:]:
+        if merged['deg'] != other['deg']:
+            raise ValueError('Statistics with different basis functions cannot be merged: deg={} and deg={}'.format(merged['deg'], other['deg']))
+        n = merged['n'] + other['n']
+        if other['n'] == 0:
+            continue
+        if merged['n'] == 0:
+            merged = other
+            continue
+        delta_x = other['mean_x'] - merged['mean_x']
+        delta_y = other['mean_y'] - merged['mean_y']
+        factor = merged['n'] * other['n'] / n
+        merged = {'n': n, 'deg': merged['deg'],
+                  'mean_x': merged['mean_x'] + delta_x * other['n'] / n,
+                  'mean_y': merged['mean_y'] + delta_y * other['n'] / n,
+                  'sxx': merged['sxx'] + other['sxx'] + factor * np.outer(delta_x, delta_x),
+                  'sxy': merged['sxy'] + other['sxy'] + factor * delta_x * delta_y}
+    return merged
+
+
+def accumulate_regression_statistics(chunks, deg=None):
+    '''Statistics of all chunks, an iterable of (X, y) that can be a generator (e.g. one chunk per month).
+       Only the statistics and one chunk are held in memory.
+    '''
+    stats = None
+    for X, y in chunks:
+        chunk_stats = regression_statistics(X, y, deg)
+        stats = chunk_stats if stats is None else merge_regression_statistics(stats, chunk_stats)
+    if stats is None:
+        raise ValueError('There are no chunks to fit the regression model to')
+    return stats
+
+
+def solve_regression(stats, alpha=0):
+    '''Weights and offset of the regression model from accumulated statistics.
+
+       Inputs:
+         stats: dict of regression_statistics(), merge_regression_statistics() or accumulate_regression_statistics()
+         alpha: float, Regularization strength (0: OLS as sklearn's LinearRegression, > 0: sklearn's Ridge(alpha))
+
+       Outputs:
+         weights: The weight vector for the regression model without the offset
+         offset: The offset (intercept) of the regression model
+
+       Note:
+         The columns are scaled to unit variance before solving, so the condition number of X^T X does not depend on
+         the ranges of the features (e.g. minute^4 next to weekday). Columns without variance (e.g. the offset column
+         of the basis functions) get the weight 0, like sklearn does. Without regularization, directions whose
+         eigenvalue is below the relative tolerance of the scaled X^T X are dropped (minimum norm solution).
+    '''
+    sxx, sxy = stats['sxx'], stats['sxy']
+    weights = np.zeros(len(sxy))
+    variance = np.diag(sxx)
+    active = variance > 0
+    if np.any(active):
+        # D X^T X D with D = 1/sqrt(diag(X^T X)) of the columns with variance
+        scale = 1 / np.sqrt(variance[active])
+        sxx_scaled = sxx[np.ix_(active, active)] * scale[:, None] * scale[None, :]
+        sxy_scaled = sxy[active] * scale
+        if alpha > 0:
+            # (X^T X + alpha I) w = X^T y with w = D v => the regularization is the same as without scaling
+            weights_scaled = np.linalg.solve(sxx_scaled + alpha * np.diag(scale**2), sxy_scaled)
+        else:
+            eigenvalues, eigenvectors = np.linalg.eigh(sxx_scaled)
+            keep = eigenvalues > len(eigenvalues) * np.finfo(float).eps * eigenvalues.max()
+            eigenvectors = eigenvectors[:, keep]
+            weights_scaled = eigenvectors @ (eigenvectors.T @ sxy_scaled / eigenvalues[keep])
+        weights[active] = weights_scaled * scale
+    offset = stats['mean_y'] - stats['mean_x'] @ weights
+    return weights, offset
+
+
+def predict_regression(X, weights, offset, deg=None):
+    '''Predictions of a model of solve_regression() for X (the basis functions are applied if deg is given).'''
+    return _design_matrix(X, deg) @ weights + offset
+
+
+def streaming_regression(X_test, chunks, deg=None, alpha=0):
+    '''Computes linear regression (optionally with basis functions and regularization) from training data that is
+       streamed chunk by chunk and returns weights and testset predictions.
+       X^T X and X^T y are accumulated over the chunks, so memory does not grow with the number of observations.
+
+       Inputs:
+         X_test: (n_observations, n_features), numpy array with predictor values of the test set
+         chunks: iterable of (X_train, y_train) chunks, e.g. one per month:
+                   ((X, y) for X, y in ...) or [(X_train, y_train)] for data that is in memory
+         deg: None (no basis functions) or int, degree of basis function polynomial
+         alpha: float, Regularization strength (0: no regularization)
+
+       Outputs:
+         weights: The weight vector for the regression model (same as the weights of sklearn_regression() for
+                  deg=None and alpha=0, sklearn_regression_bf() for alpha=0 and ridge_regression_bf() otherwise)
+         y_pred: The predictions on the TEST set
+
+       Note:
+         As with sklearn, the offset is not part of the weights and it is not regularized.
+    '''
+    stats = accumulate_regression_statistics(chunks, deg)
+    weights, offset = solve_regression(stats, alpha)
+    y_pred = predict_regression(X_test, weights, offset, deg)
+    return weights, y_pred
@@ -0,0 +1,179 @@
+import os
+import numpy as np
+import pandas as pd
+from calendar import monthrange
+
+from src.load_taxi_data import CHUNKSIZE, DATETIME_COLUMNS, _apply_trip_schema, _features_common, _normalize_trips, _trip_file_name
+
+# Share of rows with dirty values, roughly as in the TLC files of 2019
+MISSING_RATE = 0.0005      # NaN zones and passenger counts
+OUTSIDE_RATE = 0.007       # Zones 264 and 265 (outside the city), per zone column
+OTHER_MONTH_RATE = 0.001   # Pick-up in the previous or next month (or year)
+NEGATIVE_RATE = 0.0005     # Drop-off before pick-up
+
+# Relative number of pick-ups per hour of the day (0 ... 23)
+HOURLY_PROFILE = np.array([3.0, 2.2, 1.6, 1.2, 1.0, 1.2, 2.4, 4.0, 5.0, 5.0, 4.8, 5.0,
+                           5.2, 5.2, 5.4, 5.6, 5.6, 6.2, 6.8, 6.6, 6.0, 5.6, 5.2, 4.2])
+HOURLY_PROFILE = HOURLY_PROFILE / HOURLY_PROFILE.sum()
+
+# Zones 1 ... 263 within the city, popularity of a zone ~ 1/rank => JFK (132) and LaGuardia (138) are among the busiest
+_ZONE_RANKS = np.random.default_rng(0).permutation(263)
+ZONE_WEIGHTS = 1 / (_ZONE_RANKS + 10.0)
+ZONE_WEIGHTS[[131, 137]] = ZONE_WEIGHTS.max()
+ZONE_WEIGHTS = ZONE_WEIGHTS / ZONE_WEIGHTS.sum()
+
+
+def raw_layout(fleet, year, month):
+    '''
+    Layout of the raw TLC file of one fleet and month:
+        'zones'      : Pick-up and drop-off zone IDs (yellow and green since 2016-07, fhv since 2017, fhvhv).
+        'coordinates': Longitude/latitude instead of zone IDs (yellow and green before 2016-07).
+        'pickup_date': Only the pick-up time and zone (fhv before 2017).
+    '''
+    if fleet in ('yellow', 'green') and (int(year), int(month)) < (2016, 7):
+        return 'coordinates'
+    if fleet == 'fhv' and int(year) < 2017:
+        return 'pickup_date'
+    return 'zones'
+
+
+def synthetic_raw_trips(fleet, year, month, n_rows, seed=0):
+    '''
+    Deterministic synthetic trips of one fleet and month in the layout of the raw TLC csv files.
+    --------------------------------------------------------------------------------------------
+    The column names follow the files of the fleet and month (see raw_layout()), so the result can be written
+    with to_csv() and read by load_taxi_data(). Pick-ups follow a daily profile, zones are more or less popular,
+    and a small share of the rows is dirty (missing values, zones outside the city, other months, negative
+    trip durations) so the cleaning functions have something to remove.
+    INPUTS:
+
+    fleet (str)         : 'yellow', 'green', 'fhv', 'fhvhv'
+    year (int)          : Year of the month.
+    month (int)         : 1 ... 12
+    n_rows (int)        : Number of trips.
+    seed (int or int[]) : Seed of the random numbers. Same seed, fleet and month => same trips.
+
+    OUTPUT:
+
+    df_raw (Pandas dataframe): Trips with the columns of the raw file, timestamps as datetime64[ns].
+    '''
+    rng = np.random.default_rng(list(np.atleast_1d(seed)) + [list(DATETIME_COLUMNS).index(fleet), int(year), int(month)])
+    year, month = int(year), int(month)
+    days = monthrange(year, month)[1]
+
+    # Pick-up times in whole seconds
+    seconds = rng.integers(0, days, n_rows) * 86400 + rng.choice(24, n_rows, p=HOURLY_PROFILE) * 3600 + rng.integers(0, 3600, n_rows)
+    other_month = rng.random(n_rows) < OTHER_MONTH_RATE
+    seconds[other_month] += np.where(rng.random(np.count_nonzero(other_month)) < 0.5, -1, 1) * days * 86400
+    pickup = (np.datetime64('{}-{:02d}-01'.format(year, month), 's') + seconds.astype('timedelta64[s]')).astype('datetime64[ns]')
+
+    # Log-normal trip durations (minutes) and distances
+    minutes = np.exp(rng.normal(2.6, 0.55, n_rows))
+    distance = np.round(minutes * rng.gamma(4.0, 3.0, n_rows) / 60, 2)
+    duration = np.round(minutes * 60).astype(np.int64).astype('timedelta64[s]')
+    dropoff = np.where(rng.random(n_rows) < NEGATIVE_RATE, pickup - duration, pickup + duration)
+
+    # Zones within the city, some outside of it and some unknown
+    zones = rng.choice(np.arange(1, 264), (2, n_rows), p=ZONE_WEIGHTS).astype(float)
+    zones[rng.random((2, n_rows)) < OUTSIDE_RATE] = rng.choice([264, 265])
+    zones[rng.random((2, n_rows)) < MISSING_RATE] = np.nan
+
+    layout = raw_layout(fleet, year, month)
+    columns = {}
+    if fleet in ('fhv', 'fhvhv'):
+        if fleet == 'fhvhv':
+            columns['hvfhs_license_num'] = rng.choice(['HV0002', 'HV0003', 'HV0004', 'HV0005'], n_rows)
+        columns['dispatching_base_num'] = rng.choice(['B02510', 'B02764', 'B02800', 'B02875'], n_rows)
+        if layout == 'pickup_date':
+            columns['Pickup_date'] = pickup
+            columns['locationID'] = zones[0]
+        else:
+            columns['pickup_datetime'] = pickup
+            columns['dropoff_datetime'] = dropoff
+            columns['PULocationID'] = zones[0]
+            columns['DOLocationID'] = zones[1]
+            columns['SR_Flag'] = np.where(rng.random(n_rows) < 0.1, 1.0, np.nan)
+        return pd.DataFrame(columns)
+
+    prefix = 'tpep' if fleet == 'yellow' else 'lpep'
+    columns['VendorID'] = rng.integers(1, 3, n_rows)
+    columns[prefix + '_pickup_datetime'] = pickup
+    columns[prefix + '_dropoff_datetime'] = dropoff
+    passengers = rng.choice(np.arange(1, 7), n_rows, p=[0.70, 0.14, 0.05, 0.02, 0.06, 0.03]).astype(float)
+    passengers[rng.random(n_rows) < MISSING_RATE] = np.nan
+    columns['passenger_count'] = passengers
+    columns['trip_distance'] = distance
+    if layout == 'coordinates':
+        # Around Manhattan, a few rows without GPS fix
+        no_fix = rng.random(n_rows) < 0.01
+        for end in ['pickup', 'dropoff']:
+            columns[end + '_longitude'] = np.where(no_fix, 0.0, np.round(rng.normal(-73.97, 0.04, n_rows), 6))
+            columns[end + '_latitude'] = np.where(no_fix, 0.0, np.round(rng.normal(40.75, 0.03, n_rows), 6))
+    else:
+        columns['PULocationID'] = zones[0]
+        columns['DOLocationID'] = zones[1]
+    columns['RatecodeID'] = np.where(rng.random(n_rows) < 0.97, 1, 2)
+    card = rng.random(n_rows) < 0.7
+    columns['payment_type'] = np.where(card, 1, 2)
+    fare = np.round(2.5 + 2.5 * distance + 0.35 * minutes, 2)
+    tip = np.where(card, np.round(fare * rng.uniform(0.1, 0.25, n_rows), 2), 0.0)
+    columns['fare_amount'] = fare
+    columns['tip_amount'] = tip
+    columns['total_amount'] = np.round(fare + tip + 0.8, 2)
+    return pd.DataFrame(columns)
+
+
+def iter_synthetic_trips(fleets=['yellow'], year=2019, month=1, n_rows=CHUNKSIZE, chunksize=CHUNKSIZE, seed=0):
+    '''
+    Stream synthetic trips in the output schema of load_taxi_data() chunk by chunk (see synthetic_trips()).
+    The rows are split evenly between the fleets, every chunk has its own seed.
+    '''
+    features_common = _features_common(fleets)
+    for fleet_index, fleet in enumerate(fleets):
+        n_fleet = n_rows // len(fleets) + (1 if fleet_index < n_rows % len(fleets) else 0)
+        for chunk, start in enumerate(range(0, n_fleet, chunksize)):
+            df_raw = synthetic_raw_trips(fleet, year, month, min(chunksize, n_fleet - start), [seed, chunk])
+            # Same standardization as for the downloaded files
+            yield _normalize_trips(df_raw, fleet, features_common)
+
+
+def synthetic_trips(fleets=['yellow'], year=2019, month=1, n_rows=CHUNKSIZE, chunksize=CHUNKSIZE, seed=0):
+    '''
+    Synthetic TLC-like trip data for benchmarks and experiments without downloads.
+    ------------------------------------------------------------------------------
+    The trips are generated in the raw layout of every fleet and month (see synthetic_raw_trips()) and standardized
+    like the downloaded files, so the result looks like the output of load_taxi_data(). Chunks of chunksize rows are
+    generated one after another, which keeps the overhead low for 10^8 rows. The result only depends on the inputs.
+    INPUTS:
+
+    fleets (string[]) : 'yellow', 'green', 'fhv', 'fhvhv'
+    year (int)        : Year of the trips => Old years have old layouts (no zones, see raw_layout()).
+    month (int)       : 1 ... 12
+    n_rows (int)      : Total number of trips of all fleets.
+    chunksize (int)   : Number of rows that are generated at a time.
+    seed (int)        : Seed of the random numbers.
+
+    OUTPUT:
+
+    df_trips (Pandas dataframe): Columns and types of load_taxi_data().
+    '''
+    frames = list(iter_synthetic_trips(fleets, year, month, n_rows, chunksize, seed))
+    # Empty dataframe with the output schema if no rows are requested
+    if not frames:
+        return _apply_trip_schema(pd.DataFrame(columns=_features_common(fleets)))
+    return pd.concat(frames, axis=0, ignore_index=True)
+
+
+def write_synthetic_tlc_files(directory, fleets=['yellow'], years=[2019], months=[1], n_rows=100000, seed=0):
+    '''
+    Write synthetic raw TLC csv files (one per fleet and month, see synthetic_raw_trips()) to directory.
+    Returns the url_prefix that makes load_taxi_data() read them, e.g. load_taxi_data(..., url_prefix=url_prefix).
+    '''
+    os.makedirs(directory, exist_ok=True)
+    for fleet in fleets:
+        for year in years:
+            for month in months:
+                # Same trips as synthetic_trips([fleet], year, month, n_rows) with one chunk
+                df_raw = synthetic_raw_trips(fleet, year, month, n_rows, [seed, 0])
+                df_raw.to_csv(os.path.join(directory, _trip_file_name(fleet, year, month)), index=False, date_format='%Y-%m-%d %H:%M:%S')
+    return 'file://' + os.path.abspath(directory) + '/'
@@ -1,14 +1,17 @@
 from urllib.error import HTTPError
 import pandas as pd
 
-def taxi_zones_loader():
+from src.download_cache import cached_download
+
+def taxi_zones_loader(cache_dir=None):
     '''
     Try to download taxi zones meta data from TLC website.
+    If cache_dir is given, the file is only downloaded once (see cached_download()).
     '''
     
     url = 'https://s3.amazonaws.com/nyc-tlc/misc/taxi+_zone_lookup.csv'
     try:
-        df_zones_info = pd.read_csv(url, low_memory=False)
+        df_zones_info = pd.read_csv(url if cache_dir is None else cached_download(url, cache_dir), low_memory=False)
         # Drop unnecessary column and return resulting dataframe.
         df_zones_info.drop(columns='service_zone', inplace=True)
         return df_zones_info
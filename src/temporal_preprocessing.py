@@ -1,6 +1,18 @@
+import numpy as np
 import pandas as pd
 
-def temporal_preprocessing(df_taxi_data):
+from src.parse_tlc_datetime import parse_tlc_datetime
+
+# Columns added by temporal_preprocessing() and how they are computed from the pick-up and drop-off times
+TEMPORAL_COLUMNS = {'trip_duration'        : lambda pickup, dropoff: dropoff - pickup,
+                    'trip_duration_minutes': lambda pickup, dropoff: (dropoff - pickup) / pd.Timedelta(minutes=1),
+                    'pickup_month'         : lambda pickup, dropoff: pickup.dt.month,
+                    'pickup_day_of_month'  : lambda pickup, dropoff: pickup.dt.day,
+                    'pickup_weekday'       : lambda pickup, dropoff: pickup.dt.dayofweek,
+                    'pickup_hour'          : lambda pickup, dropoff: pickup.dt.hour,
+                    'pickup_minute'        : lambda pickup, dropoff: pickup.dt.minute}
+
+def temporal_preprocessing(df_taxi_data, columns=None):
     '''
     Add temporal information to the dataset:
         - Convert columns pickup_datetime, dropoff_datetime to type datetime64[ns].
@@ -12,44 +24,45 @@ def temporal_preprocessing(df_taxi_data):
         - Add column pickup_day_of_month (int, 1 ... 31) : The day of the month the passenger was picked up.
         - Add column pickup_weekday      (int, 0 ... 6)  : The day of the week the passenger was picket up. Monday=0, ..., Sunday=6. Seven days in total.
     -----------------------------------------------------------------------------------------------------------------------------------------------------
+    The input dataframe is not modified (it might be a view of another dataframe), the remaining rows are copied once.
     INPUTS:
-    
+
     df_taxi_data (Pandas dataframe): This data mus have been loaded using load_taxi_data().
-    
+    columns (string[])             : None (all) or temporal columns to add, e.g. ['trip_duration_minutes', 'pickup_hour'].
+
     OUTPUT:
-    
+
     df_enhanced (Pandas dataframe): Original dataframe with temporal information added.
     '''
-    
-    # Conversion to datetime64
-    df_taxi_data['pickup_datetime'] = pd.to_datetime(df_taxi_data['pickup_datetime'], format='%Y-%m-%d %H:%M:%S')
-    df_taxi_data['dropoff_datetime'] = pd.to_datetime(df_taxi_data['dropoff_datetime'], format='%Y-%m-%d %H:%M:%S')
-    
-    # Calculate trip duration
-    df_taxi_data['trip_duration'] = df_taxi_data['dropoff_datetime'] - df_taxi_data['pickup_datetime']
-    
-    # Trip duration in minutes
-    df_taxi_data['trip_duration_minutes'] = df_taxi_data['trip_duration'] / pd.Timedelta(minutes=1)
-    
-    # Extract month from timestamp
-    df_taxi_data['pickup_month'] = df_taxi_data['pickup_datetime'].dt.month
-    
-    # Extract day of month from timestamp
-    df_taxi_data['pickup_day_of_month'] = df_taxi_data['pickup_datetime'].dt.day
-    
-    # Extract day of week from timestamp => Monday=0, ..., Sunday=6 (i.e., 7 days in total)
-    df_taxi_data['pickup_weekday'] = df_taxi_data['pickup_datetime'].dt.dayofweek
-    
-    # Extract hour from timestamp
-    df_taxi_data['pickup_hour'] = df_taxi_data['pickup_datetime'].dt.hour
-    
-    # Extract minute from timestamp
-    df_taxi_data['pickup_minute'] = df_taxi_data['pickup_datetime'].dt.minute
-    
-    # Remove negative trip duration
-    df_taxi_data = df_taxi_data[df_taxi_data['trip_duration_minutes'] > 0]
-    
+    columns = list(TEMPORAL_COLUMNS) if columns is None else list(columns)
+    for column in columns:
+        if column not in TEMPORAL_COLUMNS:
+            raise ValueError('Unknown temporal column {}, expected one of {}'.format(column, list(TEMPORAL_COLUMNS)))
+
+    # Conversion to datetime64 (no-op for data from load_taxi_data(), whose timestamps are parsed already)
+    pickup = parse_tlc_datetime(df_taxi_data['pickup_datetime'])
+    dropoff = parse_tlc_datetime(df_taxi_data['dropoff_datetime'])
+
+    # Remove negative trip duration (and unknown timestamps)
+    rows = np.flatnonzero(((dropoff - pickup) > pd.Timedelta(0)).to_numpy())
+    pickup, dropoff = pickup.iloc[rows], dropoff.iloc[rows]
+
+    # Remaining rows of the original columns with converted timestamps
+    df_enhanced = {}
+    for column in df_taxi_data.columns:
+        if column == 'pickup_datetime':
+            df_enhanced[column] = pickup
+        elif column == 'dropoff_datetime':
+            df_enhanced[column] = dropoff
+        else:
+            df_enhanced[column] = df_taxi_data[column].iloc[rows]
+
+    # Only the requested temporal columns are computed
+    for column in columns:
+        df_enhanced[column] = TEMPORAL_COLUMNS[column](pickup, dropoff)
+    df_enhanced = pd.DataFrame(df_enhanced, index=df_taxi_data.index[rows])
+
     # DEBUG: Check data types after all conversions.
-    #df_taxi_data.info()
-    
-    return df_taxi_data
+    #df_enhanced.info()
+
+    return df_enhanced
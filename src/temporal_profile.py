@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from src.parse_tlc_datetime import parse_tlc_datetime
+from src.quantile_sketch import quantile_sketch, merge_sketches, sketch_count, sketch_mean, sketch_quantile
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+# Cells of the profile: pick-up weekday (Monday=0, ..., Sunday=6) and pick-up hour
+SHAPE = (7, 24)
+
+
+def temporal_profile_sketch(df_taxi_data, value='trip_duration', pickup_id=None, dropoff_id=None):
+    '''
+    Quantile sketch of value per pick-up weekday and hour of the trips of one dataframe (see temporal_profile()).
+    Sketches of several months can be combined with merge_sketches() and turned into a profile with profile_table().
+    '''
+    route = np.ones(len(df_taxi_data), dtype=bool)
+    if pickup_id is not None:
+        route &= (df_taxi_data['PULocationID'] == pickup_id).to_numpy(dtype=bool, na_value=False)
+    if dropoff_id is not None:
+        route &= (df_taxi_data['DOLocationID'] == dropoff_id).to_numpy(dtype=bool, na_value=False)
+    df_route = df_taxi_data[route]
+
+    if value in df_route.columns:
+        values = df_route[value]
+    else:
+        # Trip duration (timedelta => minutes in quantile_sketch())
+        values = parse_tlc_datetime(df_route['dropoff_datetime']) - parse_tlc_datetime(df_route['pickup_datetime'])
+
+    # Weekday and hour of the pick-up (1970-01-01 was a Thursday)
+    pickup = parse_tlc_datetime(df_route['pickup_datetime']).to_numpy(dtype='datetime64[ns]')
+    seconds = pickup.astype('datetime64[s]').astype(np.int64)
+    cells = np.ravel_multi_index(((seconds // 86400 + 3) % 7, (seconds // 3600) % 24), SHAPE)
+    # Trips without pick-up time are ignored (NaN values are ignored by the sketch)
+    values = np.where(np.isnat(pickup), np.nan, values.to_numpy(dtype=float, na_value=np.nan) if values.dtype.kind != 'm'
+                      else (values / pd.Timedelta(minutes=1)).to_numpy(dtype=float, na_value=np.nan))
+    return quantile_sketch(values, cells, SHAPE)
+
+
+def temporal_profile(frames, value='trip_duration', pickup_id=None, dropoff_id=None, quantiles=[0.25, 0.5, 0.75]):
+    '''
+    Count, mean and quantiles of a trip value per pick-up weekday and hour.
+    ------------------------------------------------------------------------
+    Every dataframe is binned in one vectorized pass into a quantile sketch of shape (7, 24) (see quantile_sketch()),
+    which is merged into the profile. Only the merged sketch is kept, i.e., frames can be a generator of
+    monthly dataframes and a profile over several years needs the memory of one month. Quantiles are within
+    the relative accuracy of the sketch (1%), means and counts are exact.
+    INPUTS:
+
+    frames (Pandas dataframe or iterable): One dataframe or iterable of dataframes (e.g. one per month)
+                                            with column pickup_datetime.
+    value (str)                          : Column to profile (numeric or timedelta, which is converted to minutes).
+                                            If the column does not exist, the trip duration in minutes is computed
+                                            from pickup_datetime and dropoff_datetime.
+    pickup_id, dropoff_id (int)          : None (all trips) or LocationID of the route to profile.
+    quantiles (float[])                  : Quantiles of the profile.
+
+    OUTPUT:
+
+    df_profile (Pandas dataframe): One row per weekday (0: Monday, ..., 6: Sunday) and hour (0 ... 23),
+                                    columns count, mean and one column per quantile (e.g. 0.5).
+    '''
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+
+    sketch = quantile_sketch([], shape=SHAPE)
+    for df_taxi_data in frames:
+        # Merge immediately => frames of previous months can be freed
+        sketch = merge_sketches(sketch, temporal_profile_sketch(df_taxi_data, value, pickup_id, dropoff_id))
+    return profile_table(sketch, quantiles)
+
+
+def profile_table(sketch, quantiles=[0.25, 0.5, 0.75]):
+    '''
+    Table of temporal_profile() from a (merged) sketch of temporal_profile_sketch().
+    '''
+    index = pd.MultiIndex.from_product([range(SHAPE[0]), range(SHAPE[1])], names=['weekday', 'hour'])
+    df_profile = pd.DataFrame({'count': sketch_count(sketch).ravel(), 'mean': sketch_mean(sketch).ravel()}, index=index)
+    if len(quantiles):
+        values = sketch_quantile(sketch, list(quantiles)).reshape(-1, len(quantiles))
+        for i, q in enumerate(quantiles):
+            df_profile[q] = values[:, i]
+    return df_profile
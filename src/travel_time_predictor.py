@@ -0,0 +1,211 @@
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import json
+import numpy as np
+import pandas as pd
+
+from src.od_matrix import N_ZONES, SHAPE
+
+# Sources of a prediction, from the most to the least specific one:
+#   route_hour  : trips of the route at this hour and weekday
+#   route       : trips of the route at any time
+#   zone_hour   : trips from the pick-up zone to the borough of the drop-off zone at this hour and weekday
+#   borough_hour: trips between the two boroughs at this hour and weekday
+#   borough     : trips between the two boroughs at any time
+#   city        : all trips at this hour and weekday
+LEVELS = ['route_hour', 'route', 'zone_hour', 'borough_hour', 'borough', 'city']
+
+# Minimum number of trips of a cell => Sparse cells fall back to the next level
+MIN_TRIPS = 5
+# Number of single queries whose answers are kept (hot routes)
+CACHE_SIZE = 65536
+
+
+def _borough_codes(boroughs):
+    '''
+    Borough of every zone as integer code (265,) and number of boroughs (boroughs: Series LocationID => Borough).
+    '''
+    names = pd.Series(boroughs).reindex(range(1, N_ZONES + 1)).fillna('Unknown').astype(str).to_numpy()
+    categories, codes = np.unique(names, return_inverse=True)
+    return codes, len(categories)
+
+
+def build_travel_time_table(od, boroughs=None, min_trips=MIN_TRIPS):
+    '''
+    Precompute the expected travel time of every route, hour and weekday.
+    ---------------------------------------------------------------------
+    Cells of the OD matrix with at least min_trips trips predict the mean of their trips. Sparse cells use the
+    mean of the next level with enough trips (see LEVELS), so every query is answered by one array lookup.
+    INPUTS:
+
+    od (dict)          : OD matrix of the travel time, e.g. od_matrix(df_taxi, value='trip_duration_minutes')
+                            after temporal_preprocessing() or add_od_matrices() of several months.
+    boroughs (Series)  : None or borough of every zone (index: LocationID), e.g.
+                            taxi_zones_loader().set_index('LocationID')['Borough']. Without it, the zone and
+                            borough levels are skipped.
+    min_trips (int)    : Minimum number of trips of a cell.
+
+    OUTPUT:
+
+    table (dict): 'mean' (float32) and 'level' (int8, index of LEVELS) of shape (265, 265, 24, 7) like od,
+                    NaN (level -1) if there are no trips at this hour and weekday at all.
+    '''
+    count, total = od['count'].astype(float), od['sum']
+    # Statistics of every level in the shape of od (summed axes are kept with length 1 => broadcasting)
+    levels = [(count, total), (count.sum(axis=(2, 3), keepdims=True), total.sum(axis=(2, 3), keepdims=True))]
+    if boroughs is not None:
+        codes, n_boroughs = _borough_codes(boroughs)
+        one_hot = np.eye(n_boroughs)[codes]
+        # Pick-up zone => drop-off borough, borough => borough, and back to the shape of od
+        zone = [np.einsum('odhw,db->obhw', values, one_hot) for values in (count, total)]
+        borough = [np.einsum('obhw,oa->abhw', values, one_hot) for values in zone]
+        levels += [tuple(values[:, codes] for values in zone),
+                   tuple(values[codes][:, codes] for values in borough),
+                   tuple(values.sum(axis=(2, 3), keepdims=True)[codes][:, codes] for values in borough)]
+    else:
+        levels += [None, None, None]
+    levels.append((count.sum(axis=(0, 1), keepdims=True), total.sum(axis=(0, 1), keepdims=True)))
+
+    # From the coarsest to the finest level => The finest level with enough trips wins
+    mean = np.full(SHAPE, np.nan, dtype=np.float32)
+    level = np.full(SHAPE, -1, dtype=np.int8)
+    for i in reversed(range(len(LEVELS))):
+        if levels[i] is None:
+            continue
+        level_count, level_total = levels[i]
+        enough = np.broadcast_to(level_count >= (min_trips if i < len(LEVELS) - 1 else 1), SHAPE)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean[enough] = np.broadcast_to(level_total / level_count, SHAPE)[enough]
+        level[enough] = i
+    return {'mean': mean, 'level': level}
+
+
+def save_travel_time_table(path, table):
+    '''
+    Store a table of build_travel_time_table() as compressed npz file.
+    '''
+    np.savez_compressed(path, **table)
+
+
+def load_travel_time_table(path):
+    '''
+    Read a table stored with save_travel_time_table().
+    '''
+    with np.load(path) as data:
+        return {key: data[key] for key in ['mean', 'level']}
+
+
+class TravelTimePredictor:
+    '''
+    Expected travel time (minutes) from zone A to zone B at weekday W (0: Monday, ..., 6: Sunday) and hour H.
+    -------------------------------------------------------------------------------------------------------
+    Answers are read from a table of build_travel_time_table(), i.e., a single query is one array lookup and
+    answers of hot routes are kept in an LRU cache. Batched queries are answered with one vectorized lookup.
+    Example:
+
+        predictor = TravelTimePredictor.load('../dat/travel_times.npz')
+        minutes, source = predictor.predict(132, 138, weekday=0, hour=8)
+        minutes, sources = predictor.predict_batch([132, 138], [138, 132], [0, 0], [8, 18])
+    '''
+
+    def __init__(self, table, cache_size=CACHE_SIZE):
+        self.mean = table['mean']
+        self.level = table['level']
+        self._predict = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def load(cls, path, cache_size=CACHE_SIZE):
+        return cls(load_travel_time_table(path), cache_size)
+
+    def _lookup(self, origin, destination, weekday, hour):
+        if not (1 <= origin <= N_ZONES and 1 <= destination <= N_ZONES and 0 <= weekday <= 6 and 0 <= hour <= 23):
+            raise ValueError('Expected zones 1 ... {}, weekday 0 ... 6 and hour 0 ... 23, got {}'.format(N_ZONES, (origin, destination, weekday, hour)))
+        cell = (origin - 1, destination - 1, hour, weekday)
+        level = int(self.level[cell])
+        return float(self.mean[cell]), LEVELS[level] if level >= 0 else None
+
+    def predict(self, origin, destination, weekday, hour):
+        '''
+        Expected travel time in minutes (NaN if unknown) and its source (see LEVELS) of one query.
+        '''
+        return self._predict(int(origin), int(destination), int(weekday), int(hour))
+
+    def predict_batch(self, origins, destinations, weekdays, hours):
+        '''
+        Expected travel times in minutes (numpy array) and their sources of many queries.
+        '''
+        origins, destinations, weekdays, hours = [np.asarray(values, dtype=np.int64) for values in (origins, destinations, weekdays, hours)]
+        valid = (origins >= 1) & (origins <= N_ZONES) & (destinations >= 1) & (destinations <= N_ZONES) & \
+                (weekdays >= 0) & (weekdays <= 6) & (hours >= 0) & (hours <= 23)
+        if not np.all(valid):
+            raise ValueError('Expected zones 1 ... {}, weekday 0 ... 6 and hour 0 ... 23 in all queries'.format(N_ZONES))
+        cells = (origins - 1, destinations - 1, hours, weekdays)
+        sources = np.array(LEVELS + [None], dtype=object)[self.level[cells]]
+        return self.mean[cells].astype(float), sources
+
+    def cache_info(self):
+        return self._predict.cache_info()
+
+
+def _json_minutes(minutes):
+    # NaN is not valid JSON
+    return None if np.isnan(minutes) else round(float(minutes), 3)
+
+
+def serve_travel_time_predictor(predictor, host='127.0.0.1', port=8080):
+    '''
+    Serve a TravelTimePredictor over HTTP until the process is interrupted.
+    ------------------------------------------------------------------------
+    GET  /travel_time?origin=132&destination=138&weekday=0&hour=8
+         => {"minutes": 23.1, "source": "route_hour"}
+    POST /travel_time with {"origin": [...], "destination": [...], "weekday": [...], "hour": [...]}
+         => {"minutes": [...], "source": [...]}
+    Invalid queries are answered with status 400 and {"error": "..."}.
+    INPUTS:
+
+    predictor (TravelTimePredictor): Predictor that answers the queries.
+    host (str)                     : Address to listen on, by default only local connections.
+    port (int)                     : Port to listen on.
+    '''
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/travel_time':
+                return self._reply(404, {'error': 'Unknown path {}'.format(url.path)})
+            query = parse_qs(url.query)
+            try:
+                minutes, source = predictor.predict(*[int(query[key][0]) for key in ['origin', 'destination', 'weekday', 'hour']])
+            except (KeyError, ValueError) as error:
+                return self._reply(400, {'error': 'Invalid query: {}'.format(error)})
+            self._reply(200, {'minutes': _json_minutes(minutes), 'source': source})
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/travel_time':
+                return self._reply(404, {'error': 'Unknown path {}'.format(self.path)})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                minutes, sources = predictor.predict_batch(*[body[key] for key in ['origin', 'destination', 'weekday', 'hour']])
+            except (KeyError, TypeError, ValueError) as error:
+                return self._reply(400, {'error': 'Invalid query: {}'.format(error)})
+            self._reply(200, {'minutes': [_json_minutes(value) for value in minutes], 'source': sources.tolist()})
+
+        def log_message(self, format, *args):
+            # Queries are not logged
+            pass
+
+    with ThreadingHTTPServer((host, port), Handler) as server:
+        print('Serving travel times on http://{}:{}/travel_time'.format(host, port))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
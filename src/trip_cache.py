@@ -0,0 +1,217 @@
+import glob
+import os
+import shutil
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.load_taxi_data import FLEETS
+from src.temporal_preprocessing import temporal_preprocessing
+
+# Rows per row group => The min/max statistics of every row group allow to skip it when reading with filters.
+ROW_GROUP_SIZE = 100000
+
+# Partition columns of the cache
+PARTITION_COLUMNS = ['fleet', 'year', 'month']
+
+
+def _month_marker(cache_path, year, month):
+    '''
+    Path of the file which marks a month as completely written.
+    '''
+    return os.path.join(cache_path, '_complete_{}-{:02d}'.format(int(year), int(month)))
+
+
+def _month_partitions(cache_path, year, month):
+    '''
+    Partition directories of all fleets of one month.
+    '''
+    return glob.glob(os.path.join(cache_path, 'fleet=*', 'year={}'.format(int(year)), 'month={}'.format(int(month))))
+
+
+def has_trip_cache(cache_path, year, month):
+    '''
+    Check if the trip data of one month has completely been written to the cache.
+    -----------------------------------------------------------------------------
+    INPUTS:
+
+    cache_path (str): Root directory of the cache.
+    year (int)      : Year of the month.
+    month (int)     : 1 ... 12
+
+    OUTPUT:
+
+    True if write_trip_cache() has finished for this month.
+    '''
+    return os.path.isfile(_month_marker(cache_path, year, month))
+
+
+def trip_cache_files(cache_path, year, month):
+    '''
+    Parquet files of one month (all fleets), e.g. to detect if the cached data of the month has changed.
+    '''
+    return sorted(path for partition in _month_partitions(cache_path, year, month) for path in glob.glob(os.path.join(partition, '*.parquet')))
+
+
+def write_trip_cache(df_taxi_data, cache_path, year, month):
+    '''
+    Store the trip data of one month as compressed Parquet files partitioned by fleet/year/month.
+    ---------------------------------------------------------------------------------------------
+    Existing data of the month is replaced. Rows are sorted by PULocationID and DOLocationID, so that
+    filters on the zones only have to read few row groups (see read_trip_cache()).
+    INPUTS:
+
+    df_taxi_data (Pandas dataframe): This data mus have been loaded using load_taxi_data().
+    cache_path (str)               : Root directory of the cache, e.g. '../dat/trips/'.
+    year (int)                     : Year of the month the data was loaded for.
+    month (int)                    : Month the data was loaded for, 1 ... 12.
+
+    OUTPUT:
+
+    None
+    '''
+    write_trip_cache_chunks([df_taxi_data], cache_path, year, month)
+
+
+def write_trip_cache_chunks(chunks, cache_path, year, month):
+    '''
+    Store the trip data of one month chunk by chunk (see write_trip_cache()).
+    Every chunk is sorted by zones and written to its own files, so only one chunk is held in memory.
+    Existing data of the month is replaced once all chunks are written. Returns the number of written rows.
+    '''
+    year, month = int(year), int(month)
+    os.makedirs(cache_path, exist_ok=True)
+
+    # Write to a temporary directory first, so that an interrupted write never leaves a half written month behind
+    directory = tempfile.mkdtemp(prefix='.tmp_', dir=cache_path)
+    n_rows = 0
+    try:
+        for df_chunk in chunks:
+            # Sort by zones to make the row group statistics selective
+            df_chunk = df_chunk.sort_values(['PULocationID', 'DOLocationID'], kind='stable')
+            table = pa.Table.from_pandas(df_chunk, preserve_index=False)
+            table = table.append_column('year', pa.array([year] * table.num_rows, pa.int16()))
+            table = table.append_column('month', pa.array([month] * table.num_rows, pa.int8()))
+            pq.write_to_dataset(table, directory, partition_cols=PARTITION_COLUMNS, compression='zstd', row_group_size=ROW_GROUP_SIZE)
+            n_rows += table.num_rows
+        # Replace old data of the month
+        if os.path.exists(_month_marker(cache_path, year, month)):
+            os.remove(_month_marker(cache_path, year, month))
+        for partition in _month_partitions(cache_path, year, month):
+            shutil.rmtree(partition)
+        for partition in _month_partitions(directory, year, month):
+            target = os.path.join(cache_path, os.path.relpath(partition, directory))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(partition, target)
+        open(_month_marker(cache_path, year, month), 'w').close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return n_rows
+
+
+def read_trip_cache(cache_path, fleets=None, years=None, months=None, columns=None, filters=None):
+    '''
+    Read trip data from the Parquet cache written by write_trip_cache().
+    --------------------------------------------------------------------
+    Only the requested partitions and columns are read. Further filters are pushed down to the
+    Parquet reader, i.e., row groups that cannot contain matching rows are skipped.
+    INPUTS:
+
+    cache_path (str)  : Root directory of the cache.
+    fleets (string[]) : None (all) or fleets to read: 'yellow', 'green', 'fhv'.
+    years (int[])     : None (all) or years to read.
+    months (int[])    : None (all) or months to read, 1 ... 12.
+    columns (string[]): None (all columns of load_taxi_data()) or columns to read.
+                            'year' and 'month' (the month the data was loaded for) can be requested as well.
+    filters (tuple[]) : None or list of (column, op, value) tuples which are combined with "and",
+                            e.g. [('PULocationID', '==', 132), ('DOLocationID', '==', 138)].
+
+    OUTPUT:
+
+    df_trips: pandas dataframe with the schema of load_taxi_data().
+    '''
+    # Select partitions
+    partition_filters = []
+    if fleets is not None:
+        partition_filters.append(('fleet', 'in', ['fhv' if fleet == 'fhvhv' else fleet for fleet in fleets]))
+    if years is not None:
+        partition_filters.append(('year', 'in', [int(year) for year in years]))
+    if months is not None:
+        partition_filters.append(('month', 'in', [int(month) for month in months]))
+    filters = partition_filters + list(filters or [])
+
+    table = pq.read_table(cache_path, columns=columns, filters=filters or None)
+    df_trips = table.to_pandas()
+
+    # Partition columns are only returned on request
+    if columns is None:
+        df_trips = df_trips.drop(columns=['year', 'month'])
+    # The fleet partition is read as a category of the available fleets only
+    if 'fleet' in df_trips.columns:
+        df_trips['fleet'] = pd.Categorical(df_trips['fleet'].astype(str), categories=FLEETS)
+    return df_trips
+
+
+def _partition_expression(fleets, years, months):
+    '''
+    Dataset expression that selects the requested partitions (None: all).
+    '''
+    expression = None
+    for column, values in [('fleet', None if fleets is None else ['fhv' if fleet == 'fhvhv' else fleet for fleet in fleets]),
+                           ('year', None if years is None else [int(year) for year in years]),
+                           ('month', None if months is None else [int(month) for month in months])]:
+        if values is not None:
+            condition = ds.field(column).isin(values)
+            expression = condition if expression is None else expression & condition
+    return expression
+
+
+def count_trip_cache_rows(cache_path, fleets=None, years=None, months=None):
+    '''
+    Number of trips of the requested partitions (see read_trip_cache()), read from the Parquet metadata only.
+    '''
+    dataset = ds.dataset(cache_path, format='parquet', partitioning='hive')
+    return dataset.count_rows(filter=_partition_expression(fleets, years, months))
+
+
+def iter_trip_cache(cache_path, fleets=None, years=None, months=None, columns=None, chunksize=ROW_GROUP_SIZE):
+    '''
+    Read trip data from the cache chunk by chunk (see read_trip_cache()).
+    Generator of dataframes with at most chunksize rows, so the selected months never have to fit into memory.
+    '''
+    dataset = ds.dataset(cache_path, format='parquet', partitioning='hive')
+    for batch in dataset.to_batches(columns=columns, filter=_partition_expression(fleets, years, months), batch_size=chunksize):
+        df_chunk = batch.to_pandas()
+        # Partition columns are only returned on request
+        if columns is None:
+            df_chunk = df_chunk.drop(columns=['year', 'month'])
+        if 'fleet' in df_chunk.columns:
+            df_chunk['fleet'] = pd.Categorical(df_chunk['fleet'].astype(str), categories=FLEETS)
+        yield df_chunk
+
+
+def write_temporal_cache(chunks, cache_path, year, month, columns=None):
+    '''
+    Out-of-core temporal_preprocessing(): enrich chunks of trips one by one and write them to a trip cache.
+    --------------------------------------------------------------------------------------------------------
+    Only one chunk and its temporal columns are held in memory at a time. The month is replaced atomically
+    in the cache when all chunks are written (see write_trip_cache_chunks()). Example:
+
+        chunks = (clean_trip_data(chunk, 2019, '01') for chunk in iter_taxi_data(['yellow', 'green'], [2019], [1]))
+        write_temporal_cache(chunks, '../dat/trips_temporal/', 2019, 1, columns=['trip_duration_minutes', 'pickup_hour'])
+
+    INPUTS:
+
+    chunks (iterable)  : Dataframes of one month, e.g. iter_taxi_data() or iter_trip_cache() chunks.
+    cache_path (str)   : Root directory of the cache of the enriched trips (read it with read_trip_cache()).
+    year (int)         : Year of the month.
+    month (int)        : 1 ... 12
+    columns (string[]) : None (all) or temporal columns to add (see temporal_preprocessing()).
+
+    OUTPUT:
+
+    n_rows (int): Number of written rows.
+    '''
+    return write_trip_cache_chunks((temporal_preprocessing(chunk, columns) for chunk in chunks), cache_path, year, month)
@@ -0,0 +1,272 @@
+import copy
+import numpy as np
+import pandas as pd
+
+from src.load_taxi_data import CHUNKSIZE, URL_PREFIX, _features_common, iter_taxi_data
+from src.trip_cache import has_trip_cache, read_trip_cache, count_trip_cache_rows
+from src.parse_tlc_datetime import parse_tlc_datetime
+from src.preprocess_data import valid_rows_mask, location_ids_to_int
+from src.remove_routes import inside_city_mask
+from src.keep_correct_year import correct_year_mask
+from src.keep_correct_month import correct_month_mask
+from src.temporal_preprocessing import TEMPORAL_COLUMNS
+
+# Columns that the rules need
+ROUTE_COLUMNS = ['PULocationID', 'DOLocationID']
+TIME_COLUMNS = ['pickup_datetime', 'dropoff_datetime']
+
+
+class TripPipeline:
+    '''
+    Lazy pipeline of load_taxi_data(), clean_trip_data(), temporal_preprocessing(), a route/time filter and a projection.
+    ----------------------------------------------------------------------------------------------------------------------
+    Every method only records a step and returns a new pipeline. collect() optimizes the plan and executes it:
+        - Only the columns that are needed by the rules or the result are read (fare features are not parsed,
+          the trip cache only reads the requested Parquet columns).
+        - Route and time filters are pushed down into the trip cache (row groups are skipped). The rows they remove
+          are counted from the Parquet metadata of the selected months.
+        - All rules are fused into one mask per chunk, so only the remaining rows are copied once.
+        - Only the temporal columns that are selected are computed.
+    explain() shows the optimized plan. Example:
+
+        pipeline = TripPipeline(['yellow', 'green', 'fhv'], [2019], [1], cache_path='../dat/trips/')
+        df_route = pipeline.route(132, 138).clean().temporal().select(['pickup_hour', 'trip_duration_minutes']).collect()
+
+    Differences to the eager functions: The rules of clean() check missing values only in the timestamps, zones and
+    the columns that are read. Filters do not depend on the order of the steps (they are all combined with "and").
+    INPUTS:
+
+    fleets (string[])  : 'yellow', 'green', 'fhv', 'fhvhv' (see load_taxi_data()).
+    years (int[])      : Years to load.
+    months (int[])     : Months to load, 1 ... 12.
+    cache_path (str)   : None or root directory of the trip cache. If all months are cached, they are read from it
+                            (see read_trip_cache()), otherwise the csv files are streamed (see iter_taxi_data()).
+    url_prefix (str)   : Location of the trip data (see load_taxi_data()).
+    cache_dir (str)    : None or directory of the download cache (see load_taxi_data()).
+    chunksize (int)    : Number of rows per chunk when the csv files are streamed.
+    '''
+
+    def __init__(self, fleets=['yellow'], years=[2021], months=[1], cache_path=None, url_prefix=URL_PREFIX, cache_dir=None, chunksize=CHUNKSIZE):
+        self.fleets = list(fleets)
+        self.years = [int(year) for year in years]
+        self.months = [int(month) for month in months]
+        self.cache_path = cache_path
+        self.url_prefix = url_prefix
+        self.cache_dir = cache_dir
+        self.chunksize = chunksize
+        self.steps = []
+
+    def _add(self, step, **parameters):
+        pipeline = copy.copy(self)
+        pipeline.steps = self.steps + [(step, parameters)]
+        return pipeline
+
+    def route(self, pickup_id=None, dropoff_id=None):
+        '''
+        Keep only trips from pickup_id and/or to dropoff_id (LocationIDs, None: any zone).
+        '''
+        return self._add('route', pickup_id=pickup_id, dropoff_id=dropoff_id)
+
+    def between(self, start=None, end=None):
+        '''
+        Keep only trips picked up in [start, end), e.g. '2019-01-07', '2019-01-14 06:00' (None: open end).
+        '''
+        return self._add('between', start=None if start is None else pd.Timestamp(start), end=None if end is None else pd.Timestamp(end))
+
+    def clean(self, year_by='both', month_by=None):
+        '''
+        Rules of clean_trip_data(): remove missing values, zones outside the city and trips outside the years
+        of the pipeline (see keep_correct_year()). month_by: None (keep all months) or timestamps that must be
+        in the months of the pipeline (see keep_correct_month()).
+        '''
+        return self._add('clean', year_by=year_by, month_by=month_by)
+
+    def temporal(self):
+        '''
+        Rules and columns of temporal_preprocessing(): remove trips with a duration <= 0 and add the temporal columns.
+        '''
+        return self._add('temporal')
+
+    def select(self, columns):
+        '''
+        Columns of the result (the last selection counts).
+        '''
+        return self._add('select', columns=list(columns))
+
+    def _plan(self):
+        '''
+        Optimized plan: source, columns to read, pushed down filters, fused rules, derived columns and projection.
+        '''
+        steps = {}
+        for step, parameters in self.steps:
+            steps.setdefault(step, []).append(parameters)
+
+        available = _features_common(self.fleets)
+        temporal = 'temporal' in steps
+        output = steps['select'][-1]['columns'] if 'select' in steps else available + (list(TEMPORAL_COLUMNS) if temporal else [])
+        for column in output:
+            if column not in available and not (temporal and column in TEMPORAL_COLUMNS):
+                raise ValueError('Column {} is not available, the pipeline provides {}'.format(
+                    column, available + (list(TEMPORAL_COLUMNS) if temporal else [])))
+
+        # Route and time range: all filters are combined
+        pickup_ids = {parameters['pickup_id'] for parameters in steps.get('route', []) if parameters['pickup_id'] is not None}
+        dropoff_ids = {parameters['dropoff_id'] for parameters in steps.get('route', []) if parameters['dropoff_id'] is not None}
+        starts = [parameters['start'] for parameters in steps.get('between', []) if parameters['start'] is not None]
+        ends = [parameters['end'] for parameters in steps.get('between', []) if parameters['end'] is not None]
+        clean = steps['clean'][-1] if 'clean' in steps else None
+
+        # Columns to read
+        needed = [column for column in output if column in available]
+        if pickup_ids or dropoff_ids or clean is not None:
+            needed += ROUTE_COLUMNS
+        if clean is not None:
+            # The drop-off time of old FHV trips is unknown (see unknown_dropoff_mask())
+            needed += ['fleet']
+        if starts or ends:
+            needed += ['pickup_datetime']
+        if temporal or clean is not None:
+            needed += TIME_COLUMNS
+        needed = [column for column in available if column in needed]
+
+        # Filters that are pushed down into the trip cache
+        filters = [('PULocationID', '==', pickup_id) for pickup_id in sorted(pickup_ids)]
+        filters += [('DOLocationID', '==', dropoff_id) for dropoff_id in sorted(dropoff_ids)]
+        filters += [('pickup_datetime', '>=', max(starts))] if starts else []
+        filters += [('pickup_datetime', '<', min(ends))] if ends else []
+
+        cached = self.cache_path is not None and all(has_trip_cache(self.cache_path, year, month) for year in self.years for month in self.months)
+        # Rules that the trip cache applies while reading => They are not part of the fused mask
+        pushed_down = [rule for rule, pushed in [('route', pickup_ids or dropoff_ids), ('time range', starts or ends)] if cached and pushed]
+        return {'cached': cached, 'columns': needed, 'filters': filters, 'pushed_down': pushed_down,
+                'pickup_ids': pickup_ids, 'dropoff_ids': dropoff_ids,
+                'start': max(starts) if starts else None, 'end': min(ends) if ends else None,
+                'clean': clean, 'temporal': temporal,
+                'derived': [column for column in output if column not in available],
+                'output': output}
+
+    def explain(self):
+        '''
+        Optimized plan of the pipeline as text.
+        '''
+        plan = self._plan()
+        rules = []
+        if (plan['pickup_ids'] or plan['dropoff_ids']) and 'route' not in plan['pushed_down']:
+            rules.append('route (PULocationID in {}, DOLocationID in {})'.format(sorted(plan['pickup_ids']) or 'any', sorted(plan['dropoff_ids']) or 'any'))
+        if (plan['start'] is not None or plan['end'] is not None) and 'time range' not in plan['pushed_down']:
+            rules.append('pickup_datetime in [{}, {})'.format(plan['start'], plan['end']))
+        if plan['clean'] is not None:
+            rules.append('valid rows (no missing values in {})'.format(plan['columns']))
+            rules.append('inside city')
+            rules.append('year in {} (by {})'.format(self.years, plan['clean']['year_by']))
+            if plan['clean']['month_by'] is not None:
+                rules.append('month in {} (by {})'.format(self.months, plan['clean']['month_by']))
+        if plan['temporal']:
+            rules.append('trip_duration_minutes > 0')
+
+        if plan['cached']:
+            source = 'trip cache {} (fleets={}, years={}, months={})'.format(self.cache_path, self.fleets, self.years, self.months)
+        else:
+            source = 'csv files in chunks of {} rows (fleets={}, years={}, months={})'.format(self.chunksize, self.fleets, self.years, self.months)
+        lines = ['TripPipeline',
+                 '  scan    : ' + source,
+                 '            columns: {}'.format(plan['columns']),
+                 '            pushed down filters: {}'.format(plan['filters'] if plan['cached'] else 'none (csv)'),
+                 '  filter  : one fused mask per chunk: ' + (' & '.join(rules) if rules else 'none'),
+                 '  derive  : {}'.format(plan['derived'] if plan['derived'] else 'none'),
+                 '  project : {}'.format(plan['output'])]
+        return '\n'.join(lines)
+
+    def _rules(self, df_chunk, plan):
+        '''
+        Masks of all rules of the plan for one chunk (in the order they are applied).
+        '''
+        rules = []
+        if (plan['pickup_ids'] or plan['dropoff_ids']) and 'route' not in plan['pushed_down']:
+            mask = np.ones(len(df_chunk), dtype=bool)
+            for column, ids in [('PULocationID', plan['pickup_ids']), ('DOLocationID', plan['dropoff_ids'])]:
+                for location_id in ids:
+                    mask &= (df_chunk[column] == location_id).to_numpy(dtype=bool, na_value=False)
+            rules.append(('route', mask))
+        if (plan['start'] is not None or plan['end'] is not None) and 'time range' not in plan['pushed_down']:
+            pickup = parse_tlc_datetime(df_chunk['pickup_datetime'])
+            mask = pickup.notna().to_numpy()
+            if plan['start'] is not None:
+                mask = mask & (pickup >= plan['start']).to_numpy()
+            if plan['end'] is not None:
+                mask = mask & (pickup < plan['end']).to_numpy()
+            rules.append(('time range', mask))
+        if plan['clean'] is not None:
+            rules.append(('missing values', valid_rows_mask(df_chunk[plan['columns']])))
+            location_ids = pd.DataFrame({column: pd.to_numeric(df_chunk[column], errors='coerce') for column in ROUTE_COLUMNS})
+            rules.append(('outside the city', inside_city_mask(location_ids)))
+            rules.append(('wrong year', np.logical_or.reduce([correct_year_mask(df_chunk, year, plan['clean']['year_by']) for year in self.years])))
+            if plan['clean']['month_by'] is not None:
+                rules.append(('wrong month', np.logical_or.reduce([correct_month_mask(df_chunk, month, plan['clean']['month_by']) for month in self.months])))
+        if plan['temporal']:
+            duration = parse_tlc_datetime(df_chunk['dropoff_datetime']) - parse_tlc_datetime(df_chunk['pickup_datetime'])
+            rules.append(('trip duration <= 0', (duration > pd.Timedelta(0)).to_numpy()))
+        return rules
+
+    def _chunks(self, plan):
+        '''
+        Scan of the plan: chunks with the columns of the plan.
+        '''
+        if plan['cached']:
+            yield read_trip_cache(self.cache_path, fleets=self.fleets, years=self.years, months=self.months,
+                                  columns=plan['columns'], filters=plan['filters'] or None)
+        else:
+            for df_chunk in iter_taxi_data(self.fleets, self.years, self.months, self.chunksize, self.url_prefix, self.cache_dir, columns=plan['columns']):
+                yield df_chunk[plan['columns']]
+
+    def collect(self):
+        '''
+        Execute the optimized plan.
+        ---------------------------
+        For every chunk the fused mask of all rules is computed, the remaining rows of the output columns are
+        copied once and the selected temporal columns are added. The number of rows removed by every rule is printed.
+        OUTPUT:
+
+        df_trips (Pandas dataframe): Columns of select() (or all columns), one row per remaining trip.
+        '''
+        plan = self._plan()
+        frames = []
+        n_scanned = 0
+        n_removed = {}
+        for df_chunk in self._chunks(plan):
+            n_scanned += len(df_chunk)
+            mask = np.ones(len(df_chunk), dtype=bool)
+            for rule, rule_mask in self._rules(df_chunk, plan):
+                n_removed[rule] = n_removed.get(rule, 0) + np.count_nonzero(mask & ~rule_mask)
+                mask &= rule_mask
+            rows = np.flatnonzero(mask)
+
+            # Copy the remaining rows once
+            columns = [column for column in plan['output'] if column in df_chunk.columns]
+            df_rows = df_chunk.iloc[rows, [df_chunk.columns.get_loc(column) for column in columns]]
+            if plan['clean'] is not None and {'PULocationID', 'DOLocationID'} <= set(columns):
+                # Discrete zones for later grouping
+                location_ids_to_int(df_rows)
+            if plan['derived']:
+                pickup = parse_tlc_datetime(df_chunk['pickup_datetime'].iloc[rows])
+                dropoff = parse_tlc_datetime(df_chunk['dropoff_datetime'].iloc[rows])
+                derived = pd.DataFrame({column: TEMPORAL_COLUMNS[column](pickup, dropoff) for column in plan['derived']}, index=df_rows.index)
+                df_rows = pd.concat([df_rows, derived], axis=1)
+            frames.append(df_rows[plan['output']])
+
+        # Show how many rows every rule removed
+        n_total = n_scanned
+        if plan['pushed_down']:
+            # Rows of the selected months before the pushed down filters (Parquet metadata, nothing is read)
+            n_total = count_trip_cache_rows(self.cache_path, self.fleets, self.years, self.months)
+            print('About {:.4f}% of the data was removed by the pushed down rules: {}.'.format(
+                100*(n_total-n_scanned)/n_total if n_total > 0 else 0, ', '.join(plan['pushed_down'])))
+        n_rows = n_scanned
+        for rule, n in n_removed.items():
+            print('About {:.4f}% of the data was removed by the rule: {}.'.format(100*n/n_rows if n_rows > 0 else 0, rule))
+            n_rows -= n
+        print('{:,} of {:,} rows are left ({:,} rows were scanned).'.format(n_rows, n_total, n_scanned))
+
+        if not frames:
+            return pd.DataFrame(columns=plan['output'])
+        return pd.concat(frames, ignore_index=True)
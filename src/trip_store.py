@@ -0,0 +1,161 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_extension_array_dtype
+
+from src.parse_tlc_datetime import parse_tlc_datetime
+
+# Version of the layout of the store
+VERSION = 1
+
+
+def column_to_numpy(values):
+    '''
+    Fixed-width numpy representation of a trip data column.
+    Timestamps become datetime64[ns], categories their codes (-1: missing) and nullable numbers
+    plain numbers (float64 with NaN if values are missing). Returns the array and the categories (or None).
+    '''
+    if is_datetime64_any_dtype(values) or values.dtype == object and values.name in ['pickup_datetime', 'dropoff_datetime']:
+        return parse_tlc_datetime(values).to_numpy(dtype='datetime64[ns]'), None
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), [str(category) for category in values.cat.categories]
+    if is_extension_array_dtype(values) and values.dtype.kind in 'iuf':
+        if values.isna().any():
+            return values.to_numpy(dtype=float, na_value=np.nan), None
+        return values.to_numpy(dtype=values.dtype.numpy_dtype), None
+    if values.dtype.kind in 'iufbm':
+        return values.to_numpy(), None
+    raise ValueError('Column {} of type {} has no fixed width'.format(values.name, values.dtype))
+
+
+def _read_manifest(store_path):
+    path = os.path.join(store_path, 'manifest.json')
+    if not os.path.isfile(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def _write_manifest(store_path, manifest):
+    # Write to a temporary file first => The manifest is replaced atomically
+    path = os.path.join(store_path, 'manifest.json')
+    with open(path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def has_trip_store_month(store_path, year, month):
+    '''
+    Check if the trips of one month have been appended to the store with append_trip_store().
+    '''
+    manifest = _read_manifest(store_path)
+    return manifest is not None and any(partition['year'] == int(year) and partition['month'] == int(month)
+                                        for partition in manifest['partitions'])
+
+
+def append_trip_store(df_taxi_data, store_path, year, month):
+    '''
+    Append the trips of one month to a columnar trip store.
+    -------------------------------------------------------
+    Every column is a file of fixed-width values (<column>.bin) that only grows at the end. manifest.json
+    contains the dtype of every column and the row range of every month. The manifest is written after
+    the data, i.e., rows of an interrupted append are not part of the store and are overwritten next time.
+    INPUTS:
+
+    df_taxi_data (Pandas dataframe): Trips of the month, e.g. from load_taxi_data() or clean_trip_data().
+                                        All months of a store must have the same columns.
+    store_path (str)               : Directory of the store, e.g. '../dat/store/'.
+    year (int)                     : Year of the month.
+    month (int)                    : 1 ... 12
+
+    OUTPUT:
+
+    None
+    '''
+    year, month = int(year), int(month)
+    os.makedirs(store_path, exist_ok=True)
+    manifest = _read_manifest(store_path)
+    if manifest is None:
+        manifest = {'version': VERSION, 'n_rows': 0, 'columns': None, 'partitions': []}
+    if has_trip_store_month(store_path, year, month):
+        raise ValueError('{}-{:02d} is already part of the trip store {}'.format(year, month, store_path))
+
+    arrays = {}
+    columns = []
+    for column in df_taxi_data.columns:
+        arrays[column], categories = column_to_numpy(df_taxi_data[column])
+        columns.append({'name': column, 'dtype': arrays[column].dtype.str, 'categories': categories})
+    if manifest['columns'] is not None and columns != manifest['columns']:
+        raise ValueError('The columns of {}-{:02d} do not match the columns of the trip store {}'.format(year, month, store_path))
+
+    start = manifest['n_rows']
+    for column in columns:
+        with open(os.path.join(store_path, column['name'] + '.bin'), 'ab') as file:
+            # Remove rows of an interrupted append
+            file.truncate(start * np.dtype(column['dtype']).itemsize)
+            arrays[column['name']].tofile(file)
+
+    manifest['columns'] = columns
+    manifest['n_rows'] = start + len(df_taxi_data)
+    manifest['partitions'].append({'year': year, 'month': month, 'start': start, 'stop': manifest['n_rows']})
+    _write_manifest(store_path, manifest)
+
+
+def read_trip_store(store_path, columns=None, years=None, months=None, as_frame=True):
+    '''
+    Open columns of the trip store without reading them.
+    ----------------------------------------------------
+    The column files are memory-mapped, so only the pages that are actually used are read from disk.
+    If the selected months are stored next to each other (e.g. all months of a year that were appended
+    in order), no data is copied. Otherwise the row ranges of the months are concatenated.
+    INPUTS:
+
+    store_path (str)  : Directory of the store.
+    columns (string[]): None (all) or columns to open.
+    years (int[])     : None (all) or years to open.
+    months (int[])    : None (all) or months to open, 1 ... 12.
+    as_frame (bool)   : Return a pandas dataframe (True) or a dict of numpy arrays (False).
+                            Categories (fleet) are decoded for the dataframe only.
+
+    OUTPUT:
+
+    df_trips: pandas dataframe or dict of numpy arrays (read-only).
+    '''
+    manifest = _read_manifest(store_path)
+    if manifest is None:
+        raise FileNotFoundError('There is no trip store in {}'.format(store_path))
+
+    # Row ranges of the selected months in the order they are stored
+    ranges = [(partition['start'], partition['stop']) for partition in sorted(manifest['partitions'], key=lambda partition: partition['start'])
+              if (years is None or partition['year'] in [int(year) for year in years]) and
+                 (months is None or partition['month'] in [int(month) for month in months])]
+    contiguous = all(stop == next_start for (_, stop), (next_start, _) in zip(ranges, ranges[1:]))
+
+    arrays = {}
+    for column in manifest['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        dtype = np.dtype(column['dtype'])
+        if manifest['n_rows'] == 0 or not ranges:
+            values = np.empty(0, dtype=dtype)
+        else:
+            values = np.memmap(os.path.join(store_path, column['name'] + '.bin'), dtype=dtype, mode='r', shape=(manifest['n_rows'],))
+            if contiguous:
+                values = values[ranges[0][0]:ranges[-1][1]]
+            else:
+                values = np.concatenate([values[start:stop] for start, stop in ranges])
+        arrays[column['name']] = values
+    if not as_frame:
+        return arrays
+
+    # Zero-copy dataframe => copy=False keeps every column as its own (memory-mapped) block
+    index = pd.RangeIndex(len(next(iter(arrays.values())))) if arrays else None
+    series = {}
+    for column in manifest['columns']:
+        if column['name'] in arrays:
+            values = arrays[column['name']]
+            if column['categories'] is not None:
+                values = pd.Categorical.from_codes(values, categories=column['categories'])
+            series[column['name']] = pd.Series(values, index=index, copy=False)
+    return pd.DataFrame(series, index=index, copy=False)
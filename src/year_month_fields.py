@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+
+# Ways to combine a rule on the pick-up and the drop-off timestamp of a trip
+BY = ['pickup', 'dropoff', 'both', 'either']
+
+
+def year_month_fields(timestamps):
+    '''
+    Year and month of timestamps without any string search.
+    -------------------------------------------------------
+    datetime64 columns (load_taxi_data()) are converted arithmetically. Strings in the ISO layout of the
+    TLC files ("YYYY-MM-DD HH:MM:SS") are not parsed at all: The first seven bytes of every string are
+    read as digits in one vectorized operation. Other strings are parsed by pd.to_datetime().
+    INPUTS:
+
+    timestamps (Pandas series): pickup_datetime or dropoff_datetime column.
+
+    OUTPUT:
+
+    years (numpy array of int) : Year of every row, -1 for missing or malformed timestamps.
+    months (numpy array of int): Month of every row (1 ... 12), -1 for missing or malformed timestamps.
+    '''
+    if not is_datetime64_any_dtype(timestamps):
+        try:
+            # "YYYY-MM" as fixed-width bytes => Missing values become "nan"/"None" and fail the validation below
+            digits = timestamps.to_numpy(dtype=object).astype('S7').view(np.uint8).reshape(-1, 7).astype(np.int16) - ord('0')
+        except (UnicodeEncodeError, TypeError, ValueError):
+            # Non-ASCII content or objects that are not strings
+            timestamps = pd.to_datetime(timestamps, errors='coerce')
+        else:
+            years = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+            months = digits[:, 5] * 10 + digits[:, 6]
+            valid = ((digits[:, [0, 1, 2, 3, 5, 6]] >= 0) & (digits[:, [0, 1, 2, 3, 5, 6]] <= 9)).all(axis=1)
+            valid &= (digits[:, 4] == ord('-') - ord('0')) & (months >= 1) & (months <= 12)
+            return np.where(valid, years, -1), np.where(valid, months, -1)
+
+    # Months since 1970-01 (timezones are ignored, i.e., local times are used)
+    if getattr(timestamps.dt, 'tz', None) is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    values = timestamps.to_numpy(dtype='datetime64[ns]')
+    months_since_epoch = values.astype('datetime64[M]').astype(np.int64)
+    missing = np.isnat(values)
+    years = np.where(missing, -1, months_since_epoch // 12 + 1970)
+    months = np.where(missing, -1, months_since_epoch % 12 + 1)
+    return years, months
+
+
+def combine_by(df_taxi_data, rule, by):
+    '''
+    Apply rule (function: timestamps => boolean numpy array) to the pick-up and/or drop-off timestamps.
+    ---------------------------------------------------------------------------------------------------
+    Boundary semantics of the year and month filters (keep_correct_year(), keep_correct_month()):
+        'both'            : pick-up and drop-off must fulfill the rule => Trips across the boundary (e.g. new year's eve
+                            or the end of the month) are removed. Default of both filters.
+        'either'          : pick-up or drop-off => Trips across the boundary are kept in both periods.
+        'pickup'/'dropoff': Only this timestamp is checked => Every trip belongs to exactly one period.
+    A missing drop-off time (old FHV files have none, see unknown_dropoff_mask()) is replaced by the pick-up time.
+    Missing or malformed pick-up times never fulfill the rule.
+    '''
+    if by not in BY:
+        raise ValueError('by must be one of {}, got {!r}'.format(BY, by))
+    if by == 'pickup':
+        return rule(df_taxi_data['pickup_datetime'])
+    pickup = rule(df_taxi_data['pickup_datetime'])
+    # Unknown drop-off time => The pick-up time decides
+    dropoff = np.where(df_taxi_data['dropoff_datetime'].isna().to_numpy(), pickup, rule(df_taxi_data['dropoff_datetime']))
+    if by == 'dropoff':
+        return dropoff
+    if by == 'both':
+        return pickup & dropoff
+    return pickup | dropoff